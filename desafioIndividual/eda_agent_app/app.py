@@ -1,15 +1,27 @@
-import os, io, hashlib
+import os
 import streamlit as st
 import pandas as pd
 from dotenv import load_dotenv
 
-from src.eda_agent.state import dataset_id_from_bytes, DatasetMemory
-from src.eda_agent.agents.codegen_agent import generate_and_execute, build_schema_hint, _format_history
-from src.eda_agent.agents.critic_agent import run_critic
+from src.eda_agent.state import DatasetMemory
+from src.eda_agent.pipeline import PipelineRun
 from src.eda_agent.agents.summary_agent import summarize_memory
+from src.eda_agent.answer_cache import get_answer_cache
+from src.eda_agent.worker_pool import EXEC_MODE
+from src.eda_agent.executor import execution_cache_stats
+from src.eda_agent.shared_frames import DatasetLease
+from src.eda_agent.profile import get_profile
+from src.eda_agent.metrics import METRICS_ENABLED, summarize_spans
+from src.eda_agent.vectorize import format_audit
+from src.eda_agent.ingest import STREAMING_THRESHOLD_MB, ingest_upload
+from src.eda_agent.dataset_registry import get_registry
 
 load_dotenv()
 
+# frames podem vir mapeados em memória (somente leitura) e são compartilhados entre
+# execuções; com copy-on-write, mutações feitas pelo código gerado ficam locais
+pd.set_option("mode.copy_on_write", True)
+
 st.set_page_config(page_title="EDA Agent – Explore seus dados", layout="wide")
 st.title("📊 EDA Agent – Explore seus dados")
 
@@ -40,52 +52,40 @@ with st.sidebar:
     )
     st.divider()
     st.caption("Modelo: OpenAI gpt-4o-mini (temperatura 0.0)")
+    cache_stats = get_answer_cache().stats()
+    st.caption(
+        f"Cache de respostas: {cache_stats['hits']} acerto(s) • {cache_stats['misses']} falha(s) • "
+        f"{cache_stats['entries']} entrada(s) ({cache_stats['bytes'] / 1e6:.1f} MB)"
+    )
+    exec_stats = execution_cache_stats()
+    st.caption(
+        f"Execução: {exec_stats['memo_hits']} resultado(s) memorizado(s) reaproveitado(s) • "
+        f"{exec_stats['results']} em memória ({exec_stats['results_bytes'] / 1e6:.1f} MB) • "
+        f"{exec_stats['compile_hits']} compilação(ões) evitada(s)"
+    )
+    if METRICS_ENABLED and st.toggle("📈 Métricas por etapa", value=False):
+        rows = summarize_spans()
+        if rows:
+            st.dataframe(pd.DataFrame(rows).set_index("etapa"), use_container_width=True)
+        else:
+            st.caption("Nenhuma métrica registrada ainda.")
+    if st.toggle("🗄️ Datasets em memória", value=False):
+        reg_stats = get_registry().stats()
+        st.caption(
+            f"{reg_stats['total_mb']:,.1f} de {reg_stats['budget_mb']:,.0f} MB em uso (todas as sessões) • "
+            f"{reg_stats['spilled']} descartado(s) para o disco • "
+            f"{reg_stats['dropped']} descartado(s) sem cópia em disco"
+        )
+        if reg_stats["datasets"]:
+            st.dataframe(pd.DataFrame(reg_stats["datasets"]).set_index("dataset_id"), use_container_width=True)
 
 # =========================
 # Estado
 # =========================
+# a sessão guarda só o dataset_id: o frame vive no registro do processo (compartilhado entre
+# sessões, sob orçamento de memória) e é pedido de novo a cada rerun
 if "dataset_id" not in st.session_state:
     st.session_state.dataset_id = None
-if "df" not in st.session_state:
-    st.session_state.df = None
-
-# =========================
-# Funções auxiliares de leitura (mesmo núcleo, reorganizadas)
-# =========================
-SAMPLE_SIZE = 65536  # 64KB
-
-def detect_encoding_sample(content: bytes) -> str:
-    sample = content[:SAMPLE_SIZE]
-    try:
-        import chardet
-        res = chardet.detect(sample)
-        enc = (res.get("encoding") or "").lower()
-        if enc.startswith("utf"):
-            return "utf-8"
-        if "1252" in enc or "8859" in enc or "latin" in enc:
-            return "cp1252"
-        return "utf-8"
-    except Exception:
-        try:
-            sample.decode("utf-8")
-            return "utf-8"
-        except UnicodeDecodeError:
-            return "cp1252"
-
-def detect_separator_sample(content: bytes, encoding: str) -> str:
-    text = content[:SAMPLE_SIZE].decode(encoding, errors="ignore").strip()
-    return ";" if text.count(";") > text.count(",") else ","
-
-@st.cache_data(show_spinner=False)
-def read_csv_fast(file_bytes: bytes) -> pd.DataFrame:
-    enc = detect_encoding_sample(file_bytes)
-    sep = detect_separator_sample(file_bytes, enc)
-    bio = io.BytesIO(file_bytes)
-    try:
-        return pd.read_csv(bio, sep=sep, encoding=enc, engine="c")
-    except Exception:
-        bio.seek(0)
-        return pd.read_csv(bio, sep=sep, encoding=enc, engine="python", on_bad_lines="skip")
 
 # =========================
 # Upload (AGORA NO CONTEÚDO PRINCIPAL)
@@ -93,22 +93,56 @@ def read_csv_fast(file_bytes: bytes) -> pd.DataFrame:
 st.subheader("1) Upload do CSV")
 up = st.file_uploader("Escolha um arquivo .csv", type=["csv"], label_visibility="collapsed")
 
+df = None
 if up:
-    content = up.read()
-    st.session_state.dataset_id = dataset_id_from_bytes(content)
+    # reruns (qualquer interação) reconhecem o mesmo upload pela identidade do arquivo:
+    # nada é relido, hasheado ou limpo de novo
+    upload_key = getattr(up, "file_id", None) or (up.name, up.size)
     try:
-        df = read_csv_fast(content)
-        # limpeza extra
-        df = df.dropna(how="all").dropna(axis=1, how="all")
-        df.columns = df.columns.str.strip()
-        st.session_state.df = df
+        if upload_key == st.session_state.get("upload_key") and st.session_state.dataset_id:
+            df = get_registry().get(st.session_state.dataset_id)
+        if df is None:
+            streaming = up.size >= STREAMING_THRESHOLD_MB * 1024 * 1024
+            with st.spinner("Lendo CSV grande em streaming..." if streaming else "Lendo CSV..."):
+                new_id, df, info = ingest_upload(up)
+            st.session_state.dataset_id = new_id
+            st.session_state.ingest_info = info
+            st.session_state.upload_key = upload_key
         st.success(f"Dataset carregado. ID: {st.session_state.dataset_id}")
+        info = st.session_state.get("ingest_info") or {}
+        if info.get("source") == "memory":
+            st.caption("Dataset reaproveitado da memória do processo (sem re-leitura).")
+        elif info.get("source") == "store":
+            st.caption("Dataset reaproveitado do armazenamento colunar em disco (sem re-parse).")
+        elif info.get("source") == "streaming":
+            st.caption(
+                f"Ingestão em streaming ({info['engine']}): {info['rows']:,} linhas em "
+                f"{info['seconds']:.1f}s • {info['rows_per_s']:,.0f} linhas/s • "
+                f"pico de RSS {info['peak_rss_mb']:,.0f} MB • "
+                f"{info['skipped_rows']} linha(s) inválida(s) ignorada(s)"
+            )
     except Exception as e:
         st.error(f"Falha ao ler o CSV: {e}")
-        st.session_state.df = None
+        df = None
+        st.session_state.dataset_id = None
+        st.session_state.upload_key = None
 
-df = st.session_state.df
 dataset_id = st.session_state.dataset_id
+if df is None and dataset_id:
+    # descartado da memória por outra sessão: volta do armazenamento colunar (mmap)
+    df = get_registry().get(dataset_id)
+
+# No modo pool, o dataset é materializado uma vez em Arrow e mapeado pelos workers;
+# o lease mantém o arquivo vivo enquanto esta sessão usa o dataset.
+if EXEC_MODE == "pool":
+    lease = st.session_state.get("frame_lease")
+    if df is None or (lease is not None and lease.dataset_id != dataset_id):
+        if lease is not None:
+            lease.release()
+        lease = None
+    if df is not None and lease is None:
+        lease = DatasetLease(dataset_id, df)
+    st.session_state.frame_lease = lease
 
 # =========================
 # UI principal
@@ -120,6 +154,10 @@ if df is not None:
     st.caption(f"{n_total} linhas × {n_cols} colunas • Mostrando {n_show} linha(s)")
     st.dataframe(df.head(n_show), use_container_width=True)
 
+    # perfil vetorizado calculado uma vez por dataset (alimenta prompts e respostas diretas)
+    with st.spinner("Calculando perfil do dataset..."):
+        get_profile(dataset_id, df)
+
     mem = DatasetMemory.load(dataset_id)
 
     # Ações lado a lado
@@ -129,8 +167,7 @@ if df is not None:
         summarize_now = st.button("🧠 Resumir conclusões (sem executar código)", use_container_width=True)
     with col2:
         if st.button("🧹 Limpar conclusões deste dataset", use_container_width=True):
-            mem.conclusions = []
-            mem.save()
+            mem.clear_conclusions()
             st.success("Conclusões apagadas.")
     st.caption("Dica: use o resumo para obter uma visão geral das análises já realizadas para este dataset.")
 
@@ -173,42 +210,97 @@ if df is not None:
         if not question or not question.strip():
             st.warning("Digite uma pergunta antes de continuar.")
         else:
+            # pipeline assíncrono: código e crítica aparecem token a token; o crítico começa
+            # assim que RESULT_TEXT existe. Uma nova pergunta cancela a execução anterior.
+            previous_run = st.session_state.get("active_run")
+            if previous_run is not None:
+                previous_run.cancel()
+            run = PipelineRun()
+            st.session_state.active_run = run
+
+            code_box = st.empty()
+            preview_box = st.empty()
+            result_box = st.container()
+            critic_header = st.empty()
+            critic_box = st.empty()
+
+            def show_code_tokens(text):
+                code_box.code(text)
+
+            # prévia em amostra (frames grandes): aparece em ~1s e é substituída pelo resultado completo
+            def show_preview(prev):
+                with preview_box.container():
+                    st.info(
+                        f"⏳ Prévia aproximada: amostra de {prev['sample_rows']:,} de {prev['total_rows']:,} linhas. "
+                        "O resultado com todos os dados substituirá esta prévia."
+                    )
+                    st.markdown(prev.get("text") or "")
+                    for img_bytes in prev.get("images", []):
+                        st.image(img_bytes)
+
+            def show_result(out):
+                code_box.empty()
+                preview_box.empty()
+                with result_box:
+                    if out.get("source") == "profile":
+                        st.caption("⚡ Resposta calculada direto do perfil do dataset (sem LLM e sem executar código).")
+                    elif out.get("cached"):
+                        st.caption("⚡ Resposta reaproveitada do cache (mesma pergunta, dataset e schema).")
+                    elif out.get("reused_from"):
+                        st.caption("♻️ Pergunta parecida já respondida: código reexecutado sem chamar a LLM.")
+                    elif (out.get("speculative") or {}).get("repaired"):
+                        st.caption("🔧 O código gerado falhou e foi corrigido automaticamente (erro devolvido à LLM).")
+                    st.markdown(out.get("text") or "")
+                    if out.get("stdout"):
+                        with st.expander("Saída (stdout) do código"):
+                            st.code(out["stdout"])
+                    for img_bytes in out.get("images", []):
+                        st.image(img_bytes)
+                    if out.get("code"):
+                        with st.expander("Código gerado (auditoria)"):
+                            reused = out.get("reused_from")
+                            if reused:
+                                st.markdown(
+                                    f"♻️ Reaproveitado do turno #{reused['turn_id']} "
+                                    f"(“{reused['question']}”, similaridade {reused['score']:.2f})."
+                                )
+                            spec = out.get("speculative")
+                            if spec and not out.get("cached"):
+                                lines = [f"- candidato {f['candidate']} (temperatura {f['temperature']}), "
+                                         f"{f['stage']}: `{f['error']}`" for f in spec["failures"]]
+                                st.markdown(
+                                    f"**Geração especulativa:** {spec['candidates']} candidato(s) em paralelo; "
+                                    + ("versão corrigida após erro" if spec["repaired"]
+                                       else f"venceu o candidato {spec['winner']} (temperatura {spec['temperature']})")
+                                    + (".\n" + "\n".join(lines) if lines else ".")
+                                )
+                            if out.get("audit"):
+                                st.markdown("**Análise de custo antes da execução:**\n" + format_audit(out["audit"]))
+                            st.code(out["code"])
+
+            def show_critic_tokens(text):
+                critic_header.subheader("🧠 Conclusões críticas")
+                critic_box.markdown(text)
+
+            # Conclusões críticas (opcional)
+            enable_critic = True  # pode virar toggle em config, deixei ligado por padrão
             with st.spinner("Gerando código e executando..."):
-                out = generate_and_execute(
+                out = run.run(
                     question, df, mem,
                     llm_model="gpt-4o-mini",
                     temperature=0.0,
+                    critic_model="gpt-4o-mini",
+                    critic_temperature=0.2,
+                    enable_critic=enable_critic,
+                    on_code_token=show_code_tokens,
+                    on_preview=show_preview,
+                    on_result=show_result,
+                    on_critic_token=show_critic_tokens,
                 )
-            st.markdown(out.get("text") or "")
-            if out.get("stdout"):
-                with st.expander("Saída (stdout) do código"):
-                    st.code(out["stdout"])
-            for img_bytes in out.get("images", []):
-                st.image(img_bytes)
-            with st.expander("Código gerado (auditoria)"):
-                st.code(out.get("code") or "")
-
-            # Conclusões críticas (opcional)
-            enable_critic = True  # pode virar toggle em config, deixei ligado por padrão
-            if enable_critic:
-                with st.spinner("Gerando conclusões críticas..."):
-                    hint = build_schema_hint(df)
-                    history_snippet = _format_history(mem.recent_turns(k=5))
-                    critic_text = run_critic(
-                        question=question,
-                        history_snippet=history_snippet,
-                        schema_hint=hint,
-                        result_text=out.get("text",""),
-                        stdout_tail=out.get("stdout","") or "",
-                        llm_model="gpt-4o-mini",
-                        temperature=0.2,
-                    )
-                    for line in critic_text.splitlines():
-                        s = line.strip()
-                        if s.startswith(("-", "•")) and len(s) > 2:
-                            mem.add_conclusion(s.lstrip("-• ").strip())
-                st.subheader("🧠 Conclusões críticas")
-                st.markdown(critic_text)
+            if st.session_state.get("active_run") is run:
+                st.session_state.active_run = None
+            if out is None:
+                st.caption("Execução cancelada.")
 
 else:
     st.info("Faça upload de um CSV para começar.")
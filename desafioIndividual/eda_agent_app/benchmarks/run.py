@@ -0,0 +1,246 @@
+"""
+Benchmarks offline do EDA Agent (sem rede, sem chave da OpenAI).
+
+    python -m benchmarks.run --preset quick --out bench.json
+    python -m benchmarks.run --preset quick --baseline bench.json --fail-on-regression
+
+Mede leitura de CSV, build_schema_hint, run_generated_code sobre um corpus de snippets,
+DatasetMemory com históricos grandes e generate_and_execute ponta a ponta com uma LLM
+falsa determinística. A saída é JSON; com --baseline, compara medianas e aponta regressões.
+"""
+from __future__ import annotations
+import os, re, sys, json, time, shutil, argparse, platform, statistics, tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# isola memória/caches do agente antes de importar o pacote
+_BENCH_CACHE = tempfile.mkdtemp(prefix="eda-bench-")
+os.environ.setdefault("EDA_AGENT_CACHE_DIR", _BENCH_CACHE)
+os.environ.setdefault("EDA_AGENT_METRICS", "0")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from src.eda_agent.state import DatasetMemory
+from src.eda_agent.ingest import read_csv_bytes, read_csv_streaming, clean_frame, peak_rss_mb
+from src.eda_agent.executor import run_generated_code, invalidate_results
+from src.eda_agent.profile import invalidate_profile
+from src.eda_agent.render import clear_figure_cache
+from src.eda_agent.agents import codegen_agent
+from .synthetic import make_csv, dataset_name
+from .snippets import SNIPPETS, E2E_QUESTIONS
+
+# (linhas, colunas); separador/encoding alternam entre os casos
+PRESETS = {
+    "quick": [(10_000, 10), (100_000, 50), (10_000, 500)],
+    "standard": [(10_000, 10), (100_000, 50), (1_000_000, 20), (10_000, 2_000)],
+    "full": [(10_000, 10), (100_000, 100), (1_000_000, 50), (10_000_000, 10), (100_000, 2_000)],
+}
+FORMATS = [(",", "utf-8"), (";", "cp1252")]
+# acima disto, read_csv_bytes (arquivo inteiro em memória) não é medido; só o streaming
+BYTES_LIMIT_MB = 512
+
+def _timeit(fn: Callable[[], Any], repeat: int) -> Tuple[Dict[str, Any], Any]:
+    times, out = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": repeat}, out
+
+# =========================
+# LLM falsa: devolve o snippet canônico da pergunta
+# =========================
+class FakeLLM:
+    def invoke(self, msgs) -> AIMessage:
+        m = re.search(r"PERGUNTA ATUAL: (.*)", msgs[-1].content)
+        name = E2E_QUESTIONS.get(m.group(1).strip() if m else "") or "describe"
+        return AIMessage(content=f"```python\n{SNIPPETS[name].strip()}\n```")
+
+    async def astream(self, msgs):
+        yield AIMessageChunk(content=self.invoke(msgs).content)
+
+def _fake_build_llm(model: Optional[str] = None, temperature: float = 0.0) -> FakeLLM:
+    return FakeLLM()
+
+# =========================
+# Suítes
+# =========================
+def bench_ingest(cases, data_dir: str, repeat: int, results: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    frames = {}
+    for i, (rows, cols) in enumerate(cases):
+        sep, enc = FORMATS[i % len(FORMATS)]
+        name = dataset_name(rows, cols, sep, enc)
+        path = make_csv(data_dir, rows, cols, sep=sep, encoding=enc)
+        size_mb = os.path.getsize(path) / 1e6
+        if size_mb <= BYTES_LIMIT_MB:
+            with open(path, "rb") as f:
+                raw = f.read()
+            stats, df = _timeit(lambda: read_csv_bytes(raw), repeat)
+            results[f"read_csv_bytes/{name}"] = {**stats, "mb": round(size_mb, 1), "rows": len(df),
+                                                  "rows_per_s": len(df) / stats["median_s"]}
+            del raw
+        stats, (df, ingest) = _timeit(lambda: read_csv_streaming(path), repeat)
+        results[f"read_csv_streaming/{name}"] = {**stats, "mb": round(size_mb, 1), "rows": len(df),
+                                                  "rows_per_s": len(df) / stats["median_s"],
+                                                  "engine": ingest["engine"], "peak_rss_mb": peak_rss_mb()}
+        df = clean_frame(df) if cols <= 50 else df  # dropna em frames largos esvazia o dataset
+        stats, _ = _timeit(lambda: codegen_agent.build_schema_hint(df), repeat)
+        results[f"build_schema_hint/{name}"] = stats
+        frames[name] = df
+    return frames
+
+def bench_snippets(frames: Dict[str, pd.DataFrame], repeat: int, results: Dict[str, Any]) -> None:
+    for name, df in frames.items():
+        if len(df) > 2_000_000:
+            continue  # corpus completo em 10M linhas leva minutos; a ingestão já cobre esse caso
+        for snippet, code in SNIPPETS.items():
+            def _run():
+                return run_generated_code(code, {"pd": pd, "np": np, "plt": plt, "df": df.copy(deep=False)})
+            try:
+                stats, out = _timeit(_run, repeat)
+            except Exception as e:
+                results[f"run_generated_code/{snippet}/{name}"] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            results[f"run_generated_code/{snippet}/{name}"] = {**stats, "images": len(out["images"])}
+
+def bench_memory(n_conclusions: int, repeat: int, results: Dict[str, Any]) -> None:
+    mem = DatasetMemory.load("bench-memory")
+    with mem.batch():
+        for i in range(n_conclusions):
+            mem.add_conclusion(f"Conclusão sintética {i}: a coluna num_{i % 50} tem média {i * 0.37:.2f}.")
+        for i in range(200):
+            mem.add_turn(f"Pergunta {i}?", f"Resposta {i}.", "RESULT_TEXT = 'x'\n" * 20)
+    results["memory/load"] = {**_timeit(lambda: DatasetMemory.load("bench-memory"), repeat)[0],
+                              "conclusions": n_conclusions}
+    # operações unitárias são rápidas demais para medir isoladas: 100 por rodada (um commit cada)
+    ops = 100
+    results["memory/recent_turns"] = {**_timeit(lambda: [mem.recent_turns(5) for _ in range(ops)], repeat)[0],
+                                      "ops": ops}
+    results["memory/add_turn"] = {**_timeit(
+        lambda: [mem.add_turn(f"Pergunta {i}?", "Resposta.", "x = 1") for i in range(ops)], repeat)[0], "ops": ops}
+    counter = iter(range(10**9))
+    results["memory/add_conclusion"] = {**_timeit(
+        lambda: [mem.add_conclusion(f"Conclusão nova {next(counter)}.") for _ in range(ops)], repeat)[0], "ops": ops}
+    results["memory/save"] = {**_timeit(mem.save, repeat)[0], "conclusions": len(mem.conclusions)}
+
+def _cold_start() -> None:
+    # "cold" reexecuta o código, recalcula o perfil e recodifica as figuras
+    invalidate_results()
+    invalidate_profile()
+    clear_figure_cache()
+
+def bench_end_to_end(frames: Dict[str, pd.DataFrame], repeat: int, results: Dict[str, Any]) -> None:
+    original = codegen_agent.build_llm
+    codegen_agent.build_llm = _fake_build_llm
+    try:
+        for name, df in frames.items():
+            if len(df) > 2_000_000:
+                continue
+            mem = DatasetMemory.load(f"bench-e2e-{name}")
+            for cached in (False, True):
+                def _run():
+                    if not cached:
+                        _cold_start()
+                    return [codegen_agent.generate_and_execute(q, df, mem, use_cache=cached)
+                            for q in E2E_QUESTIONS]
+                if cached:
+                    _run()  # aquece o cache de respostas
+                stats, _ = _timeit(_run, repeat)
+                label = "cached" if cached else "cold"
+                results[f"generate_and_execute/{label}/{name}"] = {
+                    **stats, "questions": len(E2E_QUESTIONS),
+                    "per_question_s": stats["median_s"] / len(E2E_QUESTIONS),
+                }
+    finally:
+        codegen_agent.build_llm = original
+
+# =========================
+# Comparação com baseline
+# =========================
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    rows = []
+    for key, cur in sorted(results.items()):
+        base = baseline.get(key)
+        if not base or "median_s" not in cur or "median_s" not in base:
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] > 0 else float("inf")
+        status = "regressão" if ratio > 1 + threshold else ("melhora" if ratio < 1 - threshold else "ok")
+        rows.append({"bench": key, "baseline_s": base["median_s"], "atual_s": cur["median_s"],
+                     "razão": ratio, "status": status})
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmarks offline do EDA Agent.")
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    ap.add_argument("--suites", default="ingest,snippets,memory,e2e",
+                    help="lista separada por vírgulas: ingest,snippets,memory,e2e")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "eda-bench-data"),
+                    help="onde os CSVs sintéticos são gerados (reaproveitados entre execuções)")
+    ap.add_argument("--memory-conclusions", type=int, default=5_000)
+    ap.add_argument("--out", help="grava os resultados em JSON")
+    ap.add_argument("--baseline", help="JSON de uma execução anterior para comparação")
+    ap.add_argument("--threshold", type=float, default=0.2, help="tolerância relativa (0.2 = 20%%)")
+    ap.add_argument("--fail-on-regression", action="store_true")
+    args = ap.parse_args(argv)
+    suites = {s.strip() for s in args.suites.split(",") if s.strip()}
+
+    results: Dict[str, Any] = {}
+    try:
+        frames: Dict[str, pd.DataFrame] = {}
+        if suites & {"ingest", "snippets", "e2e"}:
+            # sem a suíte ingest, os frames são lidos uma vez e as medições descartadas
+            measured = "ingest" in suites
+            frames = bench_ingest(PRESETS[args.preset], args.data_dir, args.repeat if measured else 1,
+                                  results if measured else {})
+        if "snippets" in suites:
+            bench_snippets(frames, args.repeat, results)
+        if "memory" in suites:
+            bench_memory(args.memory_conclusions, args.repeat, results)
+        if "e2e" in suites:
+            bench_end_to_end(frames, args.repeat, results)
+    finally:
+        if os.environ["EDA_AGENT_CACHE_DIR"] == _BENCH_CACHE:
+            shutil.rmtree(_BENCH_CACHE, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "preset": args.preset,
+            "suites": sorted(suites),
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        report["comparison"] = compare(results, baseline, args.threshold)
+        regressions = [r for r in report["comparison"] if r["status"] == "regressão"]
+        for r in report["comparison"]:
+            print(f"{r['status']:>10}  {r['razão']:6.2f}x  {r['baseline_s']:.5f}s → {r['atual_s']:.5f}s  {r['bench']}",
+                  file=sys.stderr)
+        if regressions and args.fail_on_regression:
+            exit_code = 1
+
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
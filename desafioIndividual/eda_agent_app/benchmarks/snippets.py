@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+# Corpus de snippets no estilo do que a LLM gera (sem imports; df/pd/np/plt disponíveis).
+# Usam select_dtypes para rodar em qualquer dataset sintético.
+SNIPPETS = {
+    "describe": """
+num = df.select_dtypes("number")
+print(num.describe().T.head(20))
+RESULT_TEXT = f"{num.shape[1]} colunas numéricas descritas."
+""",
+    "dtypes_nulls": """
+nulls = df.isna().sum().sort_values(ascending=False)
+print(df.dtypes.value_counts())
+print(nulls.head(10))
+RESULT_TEXT = f"Total de nulos: {int(nulls.sum())}."
+""",
+    "groupby_mean": """
+cats = df.select_dtypes(exclude="number").columns
+nums = df.select_dtypes("number").columns
+if len(cats) and len(nums):
+    g = df.groupby(cats[0])[nums[0]].agg(["mean", "median", "count"]).sort_values("mean", ascending=False)
+    print(g)
+    RESULT_TEXT = f"Maior média de {nums[0]} em {g.index[0]}."
+else:
+    RESULT_TEXT = "Sem colunas para agrupar."
+""",
+    "value_counts": """
+cats = df.select_dtypes(exclude="number").columns
+vc = df[cats[0]].value_counts().head(10) if len(cats) else pd.Series(dtype="int64")
+print(vc)
+RESULT_TEXT = f"Categoria mais frequente: {vc.index[0] if len(vc) else 'n/a'}."
+""",
+    "histogram": """
+col = df.select_dtypes("number").columns[0]
+plt.figure(figsize=(6, 4))
+plt.hist(df[col].dropna(), bins=50)
+plt.title(f"Histograma de {col}")
+RESULT_TEXT = f"Histograma de {col} gerado."
+""",
+    "correlation_heatmap": """
+num = df.select_dtypes("number").iloc[:, :30]
+corr = num.corr()
+plt.figure(figsize=(6, 5))
+plt.imshow(corr, cmap="coolwarm", vmin=-1, vmax=1)
+plt.colorbar()
+pairs = corr.where(~np.eye(len(corr), dtype=bool)).abs().unstack().dropna().sort_values(ascending=False)
+RESULT_TEXT = f"Maior correlação absoluta: {pairs.iloc[0]:.3f}." if len(pairs) else "Sem pares."
+""",
+    "outliers_iqr": """
+out = {}
+for col in df.select_dtypes("number").columns[:20]:
+    s = df[col].dropna()
+    q1, q3 = s.quantile(0.25), s.quantile(0.75)
+    iqr = q3 - q1
+    out[col] = int(((s < q1 - 1.5 * iqr) | (s > q3 + 1.5 * iqr)).sum())
+print(out)
+RESULT_TEXT = f"Outliers (IQR) em {sum(1 for v in out.values() if v)} coluna(s)."
+""",
+    "scatter": """
+nums = df.select_dtypes("number").columns
+plt.figure(figsize=(6, 4))
+plt.scatter(df[nums[0]], df[nums[1 % len(nums)]], s=2, alpha=0.3)
+RESULT_TEXT = f"Dispersão entre {nums[0]} e {nums[1 % len(nums)]}."
+""",
+    "time_series": """
+dates = [c for c in df.columns if c.startswith("date_")]
+nums = df.select_dtypes("number").columns
+if dates and len(nums):
+    s = df.assign(_d=pd.to_datetime(df[dates[0]], errors="coerce")).set_index("_d")[nums[0]].resample("MS").mean()
+    plt.figure(figsize=(6, 3))
+    plt.plot(s.index, s.values)
+    RESULT_TEXT = f"Série mensal de {nums[0]} com {len(s)} pontos."
+else:
+    RESULT_TEXT = "Sem coluna de data."
+""",
+}
+
+# perguntas do fluxo ponta a ponta → snippet devolvido pela LLM falsa
+# (None: respondida pelo perfil, sem LLM)
+E2E_QUESTIONS = {
+    "Quais são os tipos de dados?": None,
+    "Compare os valores ausentes entre as colunas": "dtypes_nulls",
+    "Qual a média da primeira coluna numérica por categoria?": "groupby_mean",
+    "Mostre um histograma da primeira coluna numérica": "histogram",
+    "Existem outliers nas colunas numéricas?": "outliers_iqr",
+}
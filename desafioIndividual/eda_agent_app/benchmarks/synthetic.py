@@ -0,0 +1,54 @@
+from __future__ import annotations
+import os
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+# categorias com acentos: exercitam a detecção cp1252/utf-8
+CATEGORIES = np.array(["São Paulo", "Goiânia", "Brasília", "Maceió", "Florianópolis", "Curitiba", "Belém", "Ceará"])
+CHUNK_ROWS = 200_000
+
+def _columns(n_cols: int) -> List[str]:
+    # ciclo de tipos: float com NaN, int, categoria, data, booleano
+    kinds = ["num", "int", "cat", "date", "flag"]
+    return [f"{kinds[i % len(kinds)]}_{i}" for i in range(n_cols)]
+
+def _chunk(rng: np.random.Generator, start: int, n_rows: int, columns: List[str]) -> pd.DataFrame:
+    data: Dict[str, np.ndarray] = {}
+    for c in columns:
+        kind = c.split("_", 1)[0]
+        if kind == "num":
+            v = rng.normal(100, 25, n_rows).round(3)
+            v[rng.random(n_rows) < 0.02] = np.nan
+        elif kind == "int":
+            v = rng.integers(0, 10_000, n_rows)
+        elif kind == "cat":
+            v = CATEGORIES[rng.integers(0, len(CATEGORIES), n_rows)]
+        elif kind == "date":
+            v = (np.datetime64("2020-01-01") + (start + np.arange(n_rows)) % 1500).astype(str)
+        else:
+            v = rng.random(n_rows) < 0.5
+        data[c] = v
+    return pd.DataFrame(data, columns=columns)
+
+def dataset_name(rows: int, cols: int, sep: str, encoding: str) -> str:
+    sep_name = "semicolon" if sep == ";" else "comma"
+    return f"{rows}x{cols}-{sep_name}-{encoding}"
+
+def make_csv(data_dir: str, rows: int, cols: int, sep: str = ",", encoding: str = "utf-8", seed: int = 0) -> str:
+    """
+    Gera (uma vez) um CSV sintético determinístico, em blocos, e retorna o caminho.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, dataset_name(rows, cols, sep, encoding) + ".csv")
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    columns = _columns(cols)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding=encoding, newline="") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            _chunk(rng, start, n, columns).to_csv(f, sep=sep, index=False, header=start == 0)
+    os.replace(tmp, path)
+    return path
@@ -1,9 +1,22 @@
 from __future__ import annotations
-import os
-from typing import Optional
+import os, asyncio, threading
+from typing import Dict, Optional, Tuple
+import httpx
 from langchain_openai import ChatOpenAI
 
 DEFAULT_MODEL = "gpt-4o-mini"
+# aponte para um servidor compatível com a API da OpenAI (ex.: stub local para benchmarks)
+BASE_URL = os.getenv("OPENAI_BASE_URL", "").strip() or None
+# teto de conexões simultâneas por processo (= chamadas LLM concorrentes; as demais aguardam)
+MAX_CONNECTIONS = int(os.getenv("EDA_AGENT_LLM_MAX_CONNECTIONS", "16"))
+# retentativas em 429/5xx com backoff exponencial + jitter (feitas pelo SDK da OpenAI)
+MAX_RETRIES = int(os.getenv("EDA_AGENT_LLM_MAX_RETRIES", "4"))
+TIMEOUT_S = float(os.getenv("EDA_AGENT_LLM_TIMEOUT_S", "120"))
+
+_clients: Dict[Tuple[str, float, Optional[str]], ChatOpenAI] = {}
+_http: Dict[Optional[str], Tuple[httpx.Client, httpx.AsyncClient]] = {}
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
 
 def get_api_key() -> str:
     api_key = os.getenv("OPENAI_API_KEY", "").strip()
@@ -11,9 +24,51 @@ def get_api_key() -> str:
         raise RuntimeError("OPENAI_API_KEY ausente. Configure a variável de ambiente.")
     return api_key
 
+def _http_clients(base_url: Optional[str]) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    # um pool keep-alive por endpoint: o handshake TLS é pago uma vez por conexão, não por chamada
+    if base_url not in _http:
+        limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+        timeout = httpx.Timeout(TIMEOUT_S, connect=10.0)
+        _http[base_url] = (
+            httpx.Client(limits=limits, timeout=timeout),
+            httpx.AsyncClient(limits=limits, timeout=timeout),
+        )
+    return _http[base_url]
+
 def build_llm(model: Optional[str] = None, temperature: float = 0.0) -> ChatOpenAI:
     """
     Fábrica de LLM para todos os agentes.
+    Reutiliza um cliente por (modelo, temperatura, base_url), com conexões HTTP compartilhadas.
+    """
+    key = (model or DEFAULT_MODEL, float(temperature), BASE_URL)
+    with _lock:
+        llm = _clients.get(key)
+        if llm is None:
+            api_key = get_api_key()
+            http_client, http_async_client = _http_clients(BASE_URL)
+            llm = ChatOpenAI(
+                model=key[0],
+                temperature=temperature,
+                api_key=api_key,
+                base_url=BASE_URL,
+                max_retries=MAX_RETRIES,
+                timeout=TIMEOUT_S,
+                http_client=http_client,
+                http_async_client=http_async_client,
+                stream_usage=True,  # contagem de tokens também nas chamadas com streaming
+            )
+            _clients[key] = llm
+        return llm
+
+def get_async_loop() -> asyncio.AbstractEventLoop:
+    """
+    Loop de eventos único do processo, numa thread daemon. Toda chamada assíncrona à LLM
+    roda nele para que as conexões do AsyncClient compartilhado sejam reaproveitadas
+    (conexões httpx ficam presas ao loop que as criou).
     """
-    api_key = get_api_key()
-    return ChatOpenAI(model=(model or DEFAULT_MODEL), temperature=temperature, api_key=api_key)
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="eda-agent-aio", daemon=True).start()
+        return _loop
@@ -1,12 +1,24 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+import re, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Optional, Tuple
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from langchain.schema import HumanMessage, SystemMessage
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from ..state import DatasetMemory
 from ..executor import run_generated_code
-from .base import build_llm
+from ..worker_pool import EXEC_MODE, get_worker_pool
+from ..profile import get_profile, answer_from_profile
+from ..prompt_context import HISTORY_TURNS, build_prompt_context
+from ..sampling import wants_preview, get_sample
+from ..shared_frames import DatasetLease
+from ..answer_cache import ANSWER_CACHE_ENABLED, answer_key, get_answer_cache
+from ..vectorize import optimize_code
+from ..question_index import REUSE_ENABLED
+from ..sql_engine import SQL_ENABLED
+from ..metrics import span, traced
+from .base import build_llm, get_async_loop
 
 SYSTEM = """Você é um engenheiro de dados que GERA CÓDIGO PYTHON para responder perguntas sobre um DataFrame 'df' (pandas).
 REGRAS OBRIGATÓRIAS:
@@ -19,31 +31,24 @@ REGRAS OBRIGATÓRIAS:
 - Valide a existência e os tipos das colunas antes de operar. Seja robusto a NaNs.
 """
 
+SQL_NOTE = """- Também existe sql("SELECT ... FROM df ...") → DataFrame (DuckDB, somente leitura, multithread).
+  Para agregações em muitas linhas (groupby, contagens, médias, top-N, filtros), faça a agregação no SQL
+  e use pandas/plt só no resultado agregado. Uma única consulta SELECT por chamada; não traga o dataset inteiro.
+"""
+
+@traced("build_schema_hint")
 def build_schema_hint(df: pd.DataFrame) -> dict:
     return {"columns": list(df.columns), "dtypes": {c: str(t) for c, t in df.dtypes.items()}}
 
-def _format_history(turns: List[Dict[str, Any]]) -> str:
-    if not turns:
-        return "Nenhum histórico relevante."
-    lines = []
-    for t in turns:
-        q = (t.get("question") or "").strip()
-        a = (t.get("result_text") or "").strip()
-        if q or a:
-            lines.append(f"- Pergunta: {q}\n  Conclusão: {a}")
-    return "\n".join(lines) if lines else "Nenhum histórico relevante."
-
-def generate_and_execute(question: str, df: pd.DataFrame, memory: DatasetMemory,
-                         llm_model: str="gpt-4o-mini", temperature: float=0.0,
-                         enable_critic: bool = False) -> Dict[str, Any]:
-    """
-    Agente Codegen: gera código Python, executa em sandbox e persiste resultado/turno.
-    (Se quiser o crítico, invoque o critic_agent a partir do app após esse retorno.)
-    """
-    llm = build_llm(model=llm_model, temperature=temperature)
-    hint = build_schema_hint(df)
-    history_snippet = _format_history(memory.recent_turns(k=5))
+def extract_code(out: str) -> str:
+    code = out
+    if "```" in out:
+        m = re.search(r"```(?:python)?\s*(.*?)```", out, re.S)
+        if m:
+            code = m.group(1).strip()
+    return code
 
+def build_codegen_messages(question: str, hint: dict, profile_hint: str, history_snippet: str) -> list:
     prompt = f"""
 PERGUNTA ATUAL: {question}
 
@@ -52,6 +57,9 @@ HISTÓRICO RECENTE (pergunta → conclusão):
 
 SCHEMA (JSON): {hint}
 
+PERFIL PRÉ-CALCULADO (não recalcule o que já está aqui; use para validar colunas/tipos):
+{profile_hint}
+
 Gere APENAS um snippet Python que, quando executado, produza a resposta para a pergunta atual.
 Regras:
 - Use 'df' (pandas), 'pd', 'np', 'plt'. Não use 'import'.
@@ -59,25 +67,248 @@ Regras:
 - Se a pergunta referir-se a algo previamente analisado, infira de forma conservadora a partir do HISTÓRICO; se houver ambiguidade, mencione-a em RESULT_TEXT.
 - Gere gráficos quando fizer sentido.
 """
-    msgs = [SystemMessage(content=SYSTEM), HumanMessage(content=prompt)]
-    out = llm.invoke(msgs).content
+    if SQL_ENABLED:
+        prompt += SQL_NOTE
+    return [SystemMessage(content=SYSTEM), HumanMessage(content=prompt)]
 
-    code = out
-    if "```" in out:
-        import re
-        m = re.search(r"```(?:python)?\s*(.*?)```", out, re.S)
-        if m:
-            code = m.group(1).strip()
+def generate_code(question: str, df: pd.DataFrame, memory: DatasetMemory, hint: dict, profile: dict,
+                  llm_model: str="gpt-4o-mini", temperature: float=0.0) -> str:
+    llm = build_llm(model=llm_model, temperature=temperature)
+    ctx = build_prompt_context(question, hint, memory.dataset_id, profile, memory.recent_turns(k=HISTORY_TURNS))
+    msgs = build_codegen_messages(question, ctx["schema"], ctx["profile"], ctx["history"])
+    with span("codegen.llm", model=llm_model) as sp:
+        msg = llm.invoke(msgs)
+        sp.add_usage(msg)
+    return extract_code(msg.content)
+
+async def _astream_code(msgs: list, llm_model: str, temperature: float, span_name: str,
+                        on_token: Optional[Callable[[str], None]] = None) -> str:
+    llm = build_llm(model=llm_model, temperature=temperature)
+    out = ""
+    with span(span_name, model=llm_model, streaming=True, temperature=temperature) as sp:
+        async for chunk in llm.astream(msgs):
+            out += chunk.content or ""
+            sp.add_usage(chunk)  # só o último chunk traz usage (stream_usage)
+            if on_token is not None:
+                on_token(out)
+    return extract_code(out)
+
+async def agenerate_code(question: str, hint: dict, profile_hint: str, history_snippet: str,
+                         llm_model: str="gpt-4o-mini", temperature: float=0.0,
+                         on_token: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Versão assíncrona com streaming: on_token recebe o texto acumulado a cada chunk.
+    hint/profile_hint/history_snippet já vêm recortados pelo orçamento (build_prompt_context).
+    """
+    msgs = build_codegen_messages(question, hint, profile_hint, history_snippet)
+    return await _astream_code(msgs, llm_model, temperature, "codegen.llm", on_token)
 
-    exec_result = run_generated_code(code, extra_globals={"pd": pd, "np": np, "plt": plt, "df": df})
+REPAIR_PROMPT = """O código acima falhou na etapa de {stage} com o erro:
+{error}
 
-    if exec_result.get("text"):
-        memory.add_conclusion(exec_result["text"])
-    memory.add_turn(question=question, result_text=exec_result.get("text") or "", code=code or "")
+Corrija o snippet para responder à mesma pergunta, seguindo as mesmas regras (sem 'import',
+com RESULT_TEXT). Confira nomes e tipos das colunas no SCHEMA. Retorne APENAS o código corrigido.
+"""
+
+async def arepair_code(question: str, hint: dict, profile_hint: str, history_snippet: str,
+                       code: str, stage: str, error: str, llm_model: str="gpt-4o-mini",
+                       temperature: float=0.0, on_token: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Rodada de correção: devolve à LLM o snippet que falhou junto com o erro (mesma conversa
+    do codegen, para não perder schema/perfil/histórico).
+    """
+    msgs = build_codegen_messages(question, hint, profile_hint, history_snippet) + [
+        AIMessage(content=f"```python\n{code}\n```"),
+        HumanMessage(content=REPAIR_PROMPT.format(stage=stage, error=error)),
+    ]
+    return await _astream_code(msgs, llm_model, temperature, "codegen.repair", on_token)
+
+def vectorize_with_llm(code: str, findings: List[Dict[str, Any]],
+                       llm_model: str="gpt-4o-mini", temperature: float=0.0) -> str:
+    """
+    Devolve à LLM um snippet com padrões lentos (iterrows, apply linha a linha...) pedindo
+    a versão vetorizada.
+    """
+    llm = build_llm(model=llm_model, temperature=temperature)
+    issues = "\n".join(f"- linha {f['line']}: {f['detail']} (~{f['estimated_s']:.1f}s estimados)" for f in findings)
+    prompt = f"""
+O snippet abaixo está correto, mas é lento no DataFrame 'df' por causa destes padrões:
+{issues}
 
-    return {
+Reescreva-o de forma VETORIZADA (operações de coluna do pandas/numpy, groupby, merge, np.where...),
+sem laços Python sobre linhas, mantendo exatamente o mesmo resultado, gráficos e RESULT_TEXT.
+Retorne APENAS o código.
+
+```python
+{code}
+```
+"""
+    with span("vectorize.llm", model=llm_model) as sp:
+        msg = llm.invoke([SystemMessage(content=SYSTEM), HumanMessage(content=prompt)])
+        sp.add_usage(msg)
+    return extract_code(msg.content)
+
+def prepare_code(code: str, df: pd.DataFrame, llm_model: str="gpt-4o-mini",
+                 temperature: float=0.0) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Análise de custo antes da execução. Retorna (código final, decisões para a auditoria).
+    """
+    return optimize_code(code, len(df), regenerate=lambda c, findings: vectorize_with_llm(
+        c, findings, llm_model=llm_model, temperature=temperature))
+
+def execute_code(code: str, df: pd.DataFrame, dataset_id: Optional[str] = None,
+                 on_text: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+    if EXEC_MODE == "pool":
+        return get_worker_pool().run(code, df, dataset_id=dataset_id, on_text=on_text)
+    # cópia rasa: o código gerado não altera o frame da sessão (copy-on-write)
+    return run_generated_code(code, extra_globals={"pd": pd, "np": np, "plt": plt, "df": df.copy(deep=False)},
+                              dataset_id=dataset_id, on_text=on_text)
+
+def execute_progressive(code: str, df: pd.DataFrame, dataset_id: str,
+                         on_preview: Callable[[Dict[str, Any]], None],
+                         on_text: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+    """
+    Roda o snippet primeiro numa amostra (prévia aproximada) e depois no frame completo.
+    No modo pool as duas execuções correm em paralelo; inline, em sequência (pyplot e
+    redirect_stdout são globais ao processo). on_text vale só para a execução completa.
+    """
+    sid, sample = get_sample(dataset_id, df)
+
+    def _preview() -> None:
+        try:
+            preview = execute_code(code, sample, dataset_id=sid)
+        except Exception:
+            return  # a prévia é opcional; erros reais aparecem na execução completa
+        on_preview({**preview, "code": code, "approx": True,
+                    "sample_rows": len(sample), "total_rows": len(df)})
+
+    if EXEC_MODE != "pool":
+        _preview()
+        return execute_code(code, df, dataset_id=dataset_id, on_text=on_text)
+    # lease da amostra só durante a pergunta: o arquivo compartilhado sai quando ela termina
+    lease = DatasetLease(sid, sample)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            full = ex.submit(execute_code, code, df, dataset_id, on_text)
+            _preview()
+            return full.result()
+    finally:
+        lease.release()
+
+def answer_without_llm(question: str, memory: DatasetMemory, hint: dict, profile: dict,
+                       llm_model: str, temperature: float, use_cache: bool = ANSWER_CACHE_ENABLED):
+    """
+    Atalhos sem LLM: perfil do dataset e cache de respostas.
+    Retorna (resultado ou None, chave do cache para gravar o resultado novo).
+    """
+    # perguntas simples (tipos, nulos, média de uma coluna...) saem direto do perfil
+    with span("profile.shortcut") as sp:
+        quick = answer_from_profile(question, profile)
+        sp.record(cache_hit=quick is not None)
+    if quick is not None:
+        with memory.batch():
+            memory.add_conclusion(quick["text"])
+            memory.add_turn(question=question, result_text=quick["text"], code="")
+        return {**quick, "cached": False}, None
+
+    cache_key = None
+    if use_cache:
+        cache_key = answer_key(memory.dataset_id, question, hint, llm_model, temperature)
+        with span("answer_cache.lookup") as sp:
+            cached = get_answer_cache().get(cache_key)
+            sp.record(cache_hit=cached is not None)
+        if cached is not None:
+            # conclusão já foi registrada na primeira execução; só registra o turno
+            memory.add_turn(question=question, result_text=cached["text"], code=cached["code"])
+            return {**cached, "cached": True}, cache_key
+    return None, cache_key
+
+def find_reusable_code(question: str, memory: DatasetMemory, hint: dict) -> Optional[Dict[str, Any]]:
+    """
+    Pergunta parecida (reformulação) já respondida neste dataset: devolve o código salvo
+    para ser reexecutado sem chamar a LLM. None se não houver turno acima do limiar.
+    """
+    if not REUSE_ENABLED:
+        return None
+    with span("reuse.lookup") as sp:
+        match = memory.find_similar_turn(question, hint["columns"])
+        sp.record(cache_hit=match is not None)
+    return match
+
+def reused_marker(match: Dict[str, Any]) -> Dict[str, Any]:
+    return {"turn_id": match["turn_id"], "question": match["question"], "score": round(match["score"], 3)}
+
+def generate_and_execute(question: str, df: pd.DataFrame, memory: DatasetMemory,
+                         llm_model: str="gpt-4o-mini", temperature: float=0.0,
+                         enable_critic: bool = False, use_cache: bool = ANSWER_CACHE_ENABLED,
+                         on_preview: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Agente Codegen: gera código Python, executa em sandbox e persiste resultado/turno.
+    (Se quiser o crítico, invoque o critic_agent a partir do app após esse retorno.)
+    Perguntas simples são respondidas pelo perfil do dataset; perguntas repetidas no mesmo
+    dataset/schema/modelo são servidas do cache de respostas; reformulações de perguntas já
+    respondidas reexecutam o código salvo. Com on_preview, frames grandes
+    recebem antes uma prévia calculada numa amostra.
+    """
+    hint = build_schema_hint(df)
+    profile = get_profile(memory.dataset_id, df)
+
+    shortcut, cache_key = answer_without_llm(question, memory, hint, profile, llm_model, temperature, use_cache)
+    if shortcut is not None:
+        return shortcut
+
+    reuse = find_reusable_code(question, memory, hint) if use_cache else None
+    speculation = None
+    if reuse is not None:
+        code, audit = reuse["code"], []  # já passou pela análise de custo quando foi gerado
+        if on_preview is not None and wants_preview(df):
+            exec_result = execute_progressive(code, df, memory.dataset_id, on_preview)
+        else:
+            exec_result = execute_code(code, df, dataset_id=memory.dataset_id)
+    else:
+        code, audit, exec_result, speculation = generate_with_repair(
+            question, df, memory, hint, profile, llm_model=llm_model, temperature=temperature, on_preview=on_preview)
+
+    result = {
         "code": code,
         "text": exec_result.get("text", ""),
         "stdout": exec_result.get("stdout", ""),
         "images": exec_result.get("images", []),
+        "audit": audit,
     }
+    if speculation is not None:
+        result["speculative"] = speculation
+    if reuse is not None:
+        result["reused_from"] = reused_marker(reuse)
+    record_result(question, memory, result, cache_key)
+    return {**result, "cached": False}
+
+def generate_with_repair(question: str, df: pd.DataFrame, memory: DatasetMemory, hint: dict, profile: dict,
+                         llm_model: str="gpt-4o-mini", temperature: float=0.0,
+                         on_preview: Optional[Callable[[Dict[str, Any]], None]] = None):
+    """
+    Codegen → análise de custo → execução com candidatos em paralelo e correção automática
+    (speculative.py), no loop assíncrono do processo. Retorna (código, auditoria, resultado
+    da execução, resumo da especulação ou None).
+    """
+    from ..speculative import SPECULATIVE_CANDIDATES, SpeculativeCodegen  # speculative importa este módulo
+    ctx = build_prompt_context(question, hint, memory.dataset_id, profile, memory.recent_turns(k=HISTORY_TURNS))
+    progressive = on_preview is not None and wants_preview(df) and SPECULATIVE_CANDIDATES == 1
+
+    def _execute(code: str):
+        if progressive:
+            return asyncio.to_thread(execute_progressive, code, df, memory.dataset_id, on_preview)
+        return asyncio.to_thread(execute_code, code, df, memory.dataset_id)
+
+    gen = SpeculativeCodegen(question, ctx, df, _execute, llm_model=llm_model, temperature=temperature,
+                             serial_exec=EXEC_MODE != "pool")
+    won = asyncio.run_coroutine_threadsafe(gen.run(), get_async_loop()).result()
+    return won["code"], won["audit"], won["exec_result"], gen.marker(won)
+
+def record_result(question: str, memory: DatasetMemory, result: Dict[str, Any], cache_key: Optional[str]) -> None:
+    with memory.batch():
+        if result.get("text"):
+            memory.add_conclusion(result["text"])
+        memory.add_turn(question=question, result_text=result.get("text") or "", code=result.get("code") or "")
+    if cache_key is not None:
+        get_answer_cache().put(cache_key, result)
@@ -1,13 +1,14 @@
 from __future__ import annotations
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional
 from langchain.schema import HumanMessage, SystemMessage
+from ..metrics import span
 from .base import build_llm
 
 CRITIC_SYSTEM = """Você é um analista de dados sênior. Sua tarefa é produzir CONCLUSÕES CRÍTICAS claras e acionáveis
 com base em:
 - a pergunta do usuário,
 - o histórico recente (pergunta → conclusão),
-- o schema do dataset,
+- o schema e o perfil pré-calculado do dataset,
 - o RESULT_TEXT e um trecho do stdout do código executado pelo agente.
 
 Regras:
@@ -21,10 +22,8 @@ Regras:
 - Responda em português.
 """
 
-def run_critic(*, question: str, history_snippet: str, schema_hint: dict,
-               result_text: str, stdout_tail: str,
-               llm_model: str="gpt-4o-mini", temperature: float=0.2) -> str:
-    llm = build_llm(model=llm_model, temperature=temperature)
+def build_critic_messages(*, question: str, history_snippet: str, schema_hint: dict,
+                          result_text: str, stdout_tail: str, profile_hint: str = "") -> list:
     prompt = f"""
 PERGUNTA: {question}
 
@@ -34,11 +33,48 @@ HISTÓRICO (recente):
 SCHEMA (JSON):
 {schema_hint}
 
+PERFIL DO DATASET (pré-calculado):
+{profile_hint or "Não disponível."}
+
 RESULTADO DO CÓDIGO (RESULT_TEXT):
 {result_text}
 
 TRECHO DO STDOUT (até 1200 chars):
 {stdout_tail[:1200]}
 """
-    msgs = [SystemMessage(content=CRITIC_SYSTEM), HumanMessage(content=prompt)]
-    return llm.invoke(msgs).content.strip()
+    return [SystemMessage(content=CRITIC_SYSTEM), HumanMessage(content=prompt)]
+
+def run_critic(*, question: str, history_snippet: str, schema_hint: dict,
+               result_text: str, stdout_tail: str, profile_hint: str = "",
+               llm_model: str="gpt-4o-mini", temperature: float=0.2) -> str:
+    llm = build_llm(model=llm_model, temperature=temperature)
+    msgs = build_critic_messages(question=question, history_snippet=history_snippet, schema_hint=schema_hint,
+                                 result_text=result_text, stdout_tail=stdout_tail, profile_hint=profile_hint)
+    with span("critic.llm", model=llm_model) as sp:
+        msg = llm.invoke(msgs)
+        sp.add_usage(msg)
+    return msg.content.strip()
+
+async def astream_critic(*, question: str, history_snippet: str, schema_hint: dict,
+                         result_text: str, stdout_tail: str, profile_hint: str = "",
+                         llm_model: str="gpt-4o-mini", temperature: float=0.2,
+                         on_token: Optional[Callable[[str], None]] = None) -> str:
+    llm = build_llm(model=llm_model, temperature=temperature)
+    msgs = build_critic_messages(question=question, history_snippet=history_snippet, schema_hint=schema_hint,
+                                 result_text=result_text, stdout_tail=stdout_tail, profile_hint=profile_hint)
+    out = ""
+    with span("critic.llm", model=llm_model, streaming=True) as sp:
+        async for chunk in llm.astream(msgs):
+            out += chunk.content or ""
+            sp.add_usage(chunk)
+            if on_token is not None:
+                on_token(out)
+    return out.strip()
+
+def critic_bullets(critic_text: str) -> List[str]:
+    bullets = []
+    for line in critic_text.splitlines():
+        s = line.strip()
+        if s.startswith(("-", "•")) and len(s) > 2:
+            bullets.append(s.lstrip("-• ").strip())
+    return bullets
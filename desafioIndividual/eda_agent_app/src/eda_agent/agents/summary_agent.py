@@ -1,11 +1,13 @@
 from __future__ import annotations
+import time
 from typing import Dict, Any, List
 from langchain.schema import HumanMessage, SystemMessage
-from ..state import DatasetMemory
+from ..state import DatasetMemory, ROLLING_SUMMARY_KEY
+from ..metrics import span
 from .base import build_llm
 
-SUMMARY_SYSTEM = """Você é um analista de dados sênior. Sua tarefa é produzir um RESUMO EXECUTIVO conciso
-com base APENAS no histórico (pergunta → conclusão) e nas conclusões críticas já salvas.
+SUMMARY_SYSTEM = """Você é um analista de dados sênior. Sua tarefa é manter um RESUMO EXECUTIVO conciso
+com base APENAS no resumo anterior, no histórico (pergunta → conclusão) e nas conclusões críticas já salvas.
 Não execute código, não invente colunas nem valores numéricos que não estejam no texto.
 
 Formato (em português):
@@ -14,28 +16,70 @@ Formato (em português):
 3) Próximos passos (3–5 bullets)
 """
 
+# lotes dobrados por chamada; o que sobrar fica para a próxima (o checkpoint guarda onde parou)
+MAX_BATCHES = 3
+
 def summarize_memory(memory: DatasetMemory, llm_model: str="gpt-4o-mini",
-                     temperature: float=0.2, max_turns: int = 8, max_conclusions: int = 30) -> str:
-    llm = build_llm(model=llm_model, temperature=temperature)
+                     temperature: float=0.2, max_turns: int = 8, max_conclusions: int = 30,
+                     max_batches: int = MAX_BATCHES) -> str:
+    """
+    Resumo incremental: o último resumo fica salvo em memory.summaries com o checkpoint
+    (ids da última conclusão/turno incorporados); cada chamada só dobra nele as novidades,
+    no máximo max_batches lotes, então o custo não cresce com a memória. O primeiro resumo
+    sai de uma única chamada sobre as conclusões/turnos mais recentes. Sem novidades, devolve
+    o resumo salvo sem LLM.
+    """
+    rolling = memory.summaries.get(ROLLING_SUMMARY_KEY) or {}
+    if not rolling.get("text"):
+        # memória já existente sem resumo: semeia com o fim da memória numa chamada só
+        cons = memory.conclusions_since(0, limit=max_conclusions, latest=True)
+        turns = memory.turns_since(0, limit=max_turns, latest=True)
+        return _fold_batch(memory, rolling, cons, turns, llm_model, temperature)["text"]
+    # lotes em ordem cronológica a partir do checkpoint; o checkpoint só avança sobre o que
+    # foi de fato dobrado no resumo
+    for _ in range(max(1, max_batches)):
+        cons = memory.conclusions_since(rolling.get("conclusion_id", 0), limit=max_conclusions)
+        turns = memory.turns_since(rolling.get("turn_id", 0), limit=max_turns)
+        if not cons and not turns:
+            break
+        rolling = _fold_batch(memory, rolling, cons, turns, llm_model, temperature)
+        if len(cons) < max_conclusions and len(turns) < max_turns:
+            break
+    return rolling["text"]
 
-    turns = memory.recent_turns(k=max_turns)
+def _fold_batch(memory: DatasetMemory, rolling: Dict[str, Any], cons: List[Dict[str, Any]],
+                turns: List[Dict[str, Any]], llm_model: str, temperature: float) -> Dict[str, Any]:
     hist = []
     for t in turns:
         q = (t.get("question") or "").strip()
         a = (t.get("result_text") or "").strip()
         if q or a:
             hist.append(f"- Pergunta: {q}\n  Conclusão: {a}")
-    history_snippet = "\n".join(hist) if hist else "Sem histórico recente."
-
-    cons = memory.conclusions[-max_conclusions:] if memory.conclusions else []
-    conclusions_snippet = "\n".join(f"- {c}" for c in cons) if cons else "Sem conclusões salvas."
+    history_snippet = "\n".join(hist) if hist else "Sem histórico novo."
+    conclusions_snippet = "\n".join(f"- {c['text']}" for c in cons) if cons else "Sem conclusões novas."
 
     prompt = f"""
-HISTÓRICO (recente, pergunta → conclusão):
+RESUMO ANTERIOR:
+{rolling.get("text") or "Nenhum (primeiro resumo)."}
+
+HISTÓRICO NOVO (desde o resumo anterior, pergunta → conclusão):
 {history_snippet}
 
-CONCLUSÕES SALVAS (amostra):
+CONCLUSÕES NOVAS (desde o resumo anterior):
 {conclusions_snippet}
+
+Atualize o resumo anterior incorporando as novidades (mantenha o que continua válido,
+corrija o que foi contradito) e devolva o resumo completo no formato pedido.
 """
     msgs = [SystemMessage(content=SUMMARY_SYSTEM), HumanMessage(content=prompt)]
-    return llm.invoke(msgs).content.strip()
+    with span("summary.llm", model=llm_model, folded_conclusions=len(cons), folded_turns=len(turns)) as sp:
+        msg = build_llm(model=llm_model, temperature=temperature).invoke(msgs)
+        sp.add_usage(msg)
+    rolling = {
+        "text": msg.content.strip(),
+        "conclusion_id": cons[-1]["id"] if cons else rolling.get("conclusion_id", 0),
+        "turn_id": turns[-1]["id"] if turns else rolling.get("turn_id", 0),
+        "ts": int(time.time()),
+    }
+    memory.set_summary(ROLLING_SUMMARY_KEY, rolling)
+    return rolling
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import os, json, hashlib, shutil, threading, time, unicodedata, uuid
+from typing import Any, Dict, Optional
+from .state import CACHE_DIR
+
+ANSWER_CACHE_DIR = os.path.join(CACHE_DIR, "answers")
+ANSWER_CACHE_MAX_MB = float(os.environ.get("EDA_AGENT_ANSWER_CACHE_MB", "256"))
+ANSWER_CACHE_ENABLED = os.environ.get("EDA_AGENT_ANSWER_CACHE", "1").strip().lower() not in {"0", "false", "no"}
+
+def normalize_question(question: str) -> str:
+    # mesma pergunta com caixa/espaços/pontuação final diferentes => mesma chave
+    s = unicodedata.normalize("NFC", question or "").casefold()
+    s = " ".join(s.split())
+    return s.rstrip(" ?!.;:")
+
+def answer_key(dataset_id: str, question: str, schema_hint: dict,
+               llm_model: str, temperature: float) -> str:
+    payload = {
+        "dataset_id": dataset_id,
+        "question": normalize_question(question),
+        "schema": schema_hint,
+        "model": llm_model,
+        "temperature": float(temperature),
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+class AnswerCache:
+    """
+    Cache persistente de respostas (código, RESULT_TEXT, stdout e figuras) em disco.
+    Cada entrada é um diretório; o mtime de 'entry.json' marca o último uso (LRU).
+    Tamanhos por entrada ficam em memória (o diretório só é varrido na criação e quando o
+    limite estoura), então stats() é barato o bastante para cada rerun do Streamlit.
+    """
+    def __init__(self, root: str = ANSWER_CACHE_DIR, max_bytes: int = int(ANSWER_CACHE_MAX_MB * 1024 * 1024)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._sizes: Dict[str, int] = {os.path.basename(path): size for _, size, path in self._entries()}
+        self._bytes = sum(self._sizes.values())
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._entry_dir(key)
+        meta_path = os.path.join(path, "entry.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            images = []
+            for name in meta.get("images", []):
+                with open(os.path.join(path, name), "rb") as f:
+                    images.append(f.read())
+            os.utime(meta_path)  # marca uso recente
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return {
+            "code": meta.get("code", ""),
+            "text": meta.get("text", ""),
+            "stdout": meta.get("stdout", ""),
+            "images": images,
+            "audit": meta.get("audit", []),
+        }
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        # grava em diretório temporário e renomeia (leitores nunca veem entrada parcial)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            names, size = [], 0
+            for i, img in enumerate(result.get("images") or []):
+                name = f"fig_{i}.bin"
+                with open(os.path.join(tmp, name), "wb") as f:
+                    f.write(img)
+                names.append(name)
+                size += len(img)
+            with open(os.path.join(tmp, "entry.json"), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "ts": int(time.time()),
+                        "code": result.get("code") or "",
+                        "text": result.get("text") or "",
+                        "stdout": result.get("stdout") or "",
+                        "images": names,
+                        "audit": result.get("audit") or [],
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            size += os.path.getsize(os.path.join(tmp, "entry.json"))
+            final = self._entry_dir(key)
+            if os.path.isdir(final):
+                shutil.rmtree(final, ignore_errors=True)
+            os.replace(tmp, final)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        with self._lock:
+            self._bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            over = self._bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _entries(self):
+        out = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                mtime = os.path.getmtime(os.path.join(path, "entry.json"))
+                size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+            except OSError:
+                continue
+            out.append((mtime, size, path))
+        return out
+
+    def _evict(self) -> None:
+        # varre o diretório (mtimes para a ordem LRU) e ressincroniza os tamanhos em memória,
+        # que podem ter divergido se outro processo (ex.: modo batch) grava no mesmo cache
+        with self._lock:
+            entries = self._entries()
+            self._sizes = {os.path.basename(path): size for _, size, path in entries}
+            self._bytes = sum(self._sizes.values())
+            for _, size, path in sorted(entries):
+                if self._bytes <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                self._bytes -= self._sizes.pop(os.path.basename(path))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for _, _, path in self._entries():
+                shutil.rmtree(path, ignore_errors=True)
+            self._sizes, self._bytes = {}, 0
+
+    def stats(self) -> Dict[str, Any]:
+        # só contadores em memória: nada de varrer o diretório a cada rerun do app
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._sizes),
+                "bytes": self._bytes,
+            }
+
+_CACHE: Optional[AnswerCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = AnswerCache()
+        return _CACHE
@@ -0,0 +1,484 @@
+"""
+Modo batch (sem Streamlit): roda uma lista de perguntas contra um CSV e gera um relatório.
+
+    python -m src.eda_agent.batch dados.csv perguntas.txt --out relatorio.html
+    python -m src.eda_agent.batch dados.csv perguntas.txt --out relatorio.md --llm-concurrency 8 --rpm 300
+
+O dataset é lido uma vez (ou mapeado do armazenamento colunar), as chamadas à LLM correm
+em paralelo sob limite de concorrência e de requisições por minuto, e o código gerado roda
+no pool de workers (um job por worker). Cada pergunta usa o mesmo histórico (o do início
+do lote), então o resultado não depende da ordem em que as respostas terminam.
+"""
+from __future__ import annotations
+import os, sys, json, html, time, base64, asyncio, argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+
+from .state import DatasetMemory, dataset_id_from_file
+from .ingest import STREAMING_THRESHOLD_MB, read_csv_bytes, read_csv_streaming, clean_frame
+from .dataset_store import load_dataset, save_dataset
+from .dataset_registry import get_registry
+from .shared_frames import DatasetLease
+from .worker_pool import POOL_SIZE, WorkerPool
+from .profile import get_profile
+from .prompt_context import HISTORY_TURNS, build_prompt_context
+from .answer_cache import ANSWER_CACHE_ENABLED
+from .vectorize import format_audit
+from .pipeline import _save_bullets
+from .agents.codegen_agent import (
+    build_schema_hint, answer_without_llm, find_reusable_code, reused_marker, execute_code, record_result,
+)
+from .speculative import SPECULATIVE_CANDIDATES, SpeculativeCodegen
+from .agents.critic_agent import astream_critic
+from .agents.base import get_async_loop
+
+# chamadas simultâneas à LLM e teto de requisições por minuto (0 = sem teto) no modo batch
+BATCH_LLM_CONCURRENCY = int(os.environ.get("EDA_AGENT_BATCH_LLM_CONCURRENCY", "4"))
+BATCH_RPM = int(os.environ.get("EDA_AGENT_BATCH_RPM", "0"))
+
+STAGES = [("espera_llm", "Espera LLM"), ("codegen", "Codegen"), ("vectorize", "Vetorização"),
+          ("execute", "Execução"), ("critic", "Crítico"), ("total", "Total")]
+
+# =========================
+# Limite de chamadas à LLM
+# =========================
+class RateLimiter:
+    """
+    No máximo `concurrency` chamadas em andamento e `rpm` iniciadas por minuto (espaçadas
+    uniformemente). Uso: `async with limiter: ...` dentro do loop de eventos.
+    """
+    def __init__(self, concurrency: int, rpm: int = 0):
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "RateLimiter":
+        await self._sem.acquire()
+        if self._interval:
+            async with self._lock:
+                now = time.monotonic()
+                wait = self._next - now
+                self._next = max(now, self._next) + self._interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._sem.release()
+
+# =========================
+# Dataset
+# =========================
+def load_frame(path: str) -> Tuple[str, pd.DataFrame, Dict[str, Any]]:
+    """
+    Lê o CSV uma única vez: mesmo conteúdo já visto é mapeado do armazenamento colunar;
+    arquivos grandes são lidos em streaming. Retorna (dataset_id, frame limpo, info).
+    """
+    t0 = time.perf_counter()
+    dataset_id = dataset_id_from_file(path)
+    df = load_dataset(dataset_id)
+    source = "armazenamento colunar"
+    if df is None:
+        if os.path.getsize(path) >= STREAMING_THRESHOLD_MB * 1024 * 1024:
+            df, _ = read_csv_streaming(path)
+            source = "streaming"
+        else:
+            with open(path, "rb") as f:
+                df = read_csv_bytes(f.read())
+            source = "csv"
+        # tipos compactados antes de persistir: o store e os workers já recebem o frame enxuto
+        df = get_registry().admit(dataset_id, clean_frame(df), source=source)
+        save_dataset(dataset_id, df)
+    return dataset_id, df, {"path": path, "dataset_id": dataset_id, "rows": len(df), "columns": df.shape[1],
+                            "source": source, "seconds": time.perf_counter() - t0}
+
+def read_questions(path: str) -> List[str]:
+    # .json: lista de strings; demais: uma pergunta por linha ('#' comenta)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            return [str(q).strip() for q in json.load(f) if str(q).strip()]
+        return [ln.strip() for ln in f if ln.strip() and not ln.lstrip().startswith("#")]
+
+# =========================
+# Execução do lote
+# =========================
+class BatchRunner:
+    """
+    Responde várias perguntas sobre um dataset fora do Streamlit. LLM (codegen, vetorização,
+    crítico) limitada por RateLimiter; execução no WorkerPool ("pool") ou em série no
+    próprio processo ("inline": pyplot e redirect_stdout são globais).
+    """
+    def __init__(self, df: pd.DataFrame, dataset_id: str, *, llm_model: str = "gpt-4o-mini",
+                 temperature: float = 0.0, critic_model: str = "gpt-4o-mini", critic_temperature: float = 0.2,
+                 enable_critic: bool = True, use_cache: bool = ANSWER_CACHE_ENABLED,
+                 llm_concurrency: int = BATCH_LLM_CONCURRENCY, rpm: int = BATCH_RPM,
+                 workers: int = POOL_SIZE, exec_mode: str = "pool", candidates: int = SPECULATIVE_CANDIDATES):
+        self.df = df
+        self.memory = DatasetMemory.load(dataset_id)
+        self.llm_model, self.temperature = llm_model, temperature
+        self.critic_model, self.critic_temperature = critic_model, critic_temperature
+        self.enable_critic, self.use_cache = enable_critic, use_cache
+        self.llm_concurrency, self.rpm = llm_concurrency, rpm
+        self.exec_mode = exec_mode
+        self.candidates = max(1, candidates)
+        self.workers = max(1, workers) if exec_mode == "pool" else 1
+        self.hint = build_schema_hint(df)
+        self.profile = get_profile(dataset_id, df)
+        self.turns = self.memory.recent_turns(k=HISTORY_TURNS)
+        self.on_done = None
+
+    def _execute(self, pool: Optional[WorkerPool], code: str) -> Dict[str, Any]:
+        if pool is not None:
+            return pool.run(code, self.df, dataset_id=self.memory.dataset_id)
+        return execute_code(code, self.df, dataset_id=self.memory.dataset_id)
+
+    def _prepare(self, question: str):
+        ctx = build_prompt_context(question, self.hint, self.memory.dataset_id, self.profile, self.turns)
+        result, cache_key = answer_without_llm(question, self.memory, self.hint, self.profile,
+                                               self.llm_model, self.temperature, self.use_cache)
+        reuse = None
+        if result is None and self.use_cache:
+            reuse = find_reusable_code(question, self.memory, self.hint)
+        return ctx, result, cache_key, reuse
+
+    def run(self, questions: List[str]) -> Dict[str, Any]:
+        """
+        Bloqueia até todas as perguntas terminarem. Retorna {"meta", "items"} (itens na ordem
+        das perguntas, com texto, stdout, imagens, crítica e tempos por etapa).
+        """
+        t0 = time.perf_counter()
+        lease = DatasetLease(self.memory.dataset_id, self.df) if self.exec_mode == "pool" else None
+        pool = WorkerPool(size=self.workers) if self.exec_mode == "pool" else None
+        exec_threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="eda-batch-exec")
+        try:
+            fut = asyncio.run_coroutine_threadsafe(self._run_all(questions, pool, exec_threads), get_async_loop())
+            try:
+                items = fut.result()
+            except BaseException:
+                fut.cancel()
+                raise
+        finally:
+            exec_threads.shutdown(wait=False, cancel_futures=True)
+            if pool is not None:
+                pool.close()
+            if lease is not None:
+                lease.release()
+        wall = time.perf_counter() - t0
+        busy = sum(it["timings"].get("total", 0.0) for it in items)
+        return {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "dataset_id": self.memory.dataset_id,
+                "rows": len(self.df),
+                "columns": self.df.shape[1],
+                "questions": len(items),
+                "errors": sum(1 for it in items if it.get("error")),
+                "model": self.llm_model,
+                "critic": self.critic_model if self.enable_critic else None,
+                "llm_concurrency": self.llm_concurrency,
+                "candidates": self.candidates,
+                "rpm": self.rpm,
+                "exec_mode": self.exec_mode,
+                "workers": self.workers,
+                "wall_s": wall,
+                "sum_question_s": busy,
+                # > 1: perguntas sobrepostas (LLM concorrente + execução paralela)
+                "parallelism": busy / wall if wall > 0 else 0.0,
+            },
+            "items": items,
+        }
+
+    async def _run_all(self, questions: List[str], pool: Optional[WorkerPool],
+                       exec_threads: ThreadPoolExecutor) -> List[Dict[str, Any]]:
+        limiter = RateLimiter(self.llm_concurrency, self.rpm)
+        tasks = [asyncio.ensure_future(self._answer(i, q, limiter, pool, exec_threads))
+                 for i, q in enumerate(questions, 1)]
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _answer(self, n: int, question: str, limiter: RateLimiter, pool: Optional[WorkerPool],
+                      exec_threads: ThreadPoolExecutor) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        timings: Dict[str, float] = {}
+        item: Dict[str, Any] = {"n": n, "question": question, "origin": "llm", "timings": timings}
+        t_start = time.perf_counter()
+        try:
+            # tokenização, cache em disco e SQLite fora do loop compartilhado
+            ctx, result, cache_key, reuse = await asyncio.to_thread(self._prepare, question)
+            if result is None:
+                speculation = None
+                if reuse is not None:
+                    code, audit = reuse["code"], []
+                    t0 = time.perf_counter()
+                    exec_result = await loop.run_in_executor(exec_threads, self._execute, pool, code)
+                    timings["execute"] = time.perf_counter() - t0
+                else:
+                    # candidatos em paralelo + correção; cada chamada à LLM (inclusive a vetorização) passa pelo limitador
+                    gen = SpeculativeCodegen(
+                        question, ctx, self.df,
+                        lambda code: loop.run_in_executor(exec_threads, self._execute, pool, code),
+                        llm_model=self.llm_model, temperature=self.temperature,
+                        candidates=self.candidates, limiter=limiter, serial_exec=pool is None)
+                    won = await gen.run()
+                    code, audit, exec_result = won["code"], won["audit"], won["exec_result"]
+                    timings.update(won["timings"])
+                    speculation = gen.marker(won)
+                result = {
+                    "code": code,
+                    "text": exec_result.get("text", ""),
+                    "stdout": exec_result.get("stdout", ""),
+                    "images": exec_result.get("images", []),
+                    "audit": audit,
+                    "cached": False,
+                }
+                if speculation is not None:
+                    result["speculative"] = speculation
+                    if speculation["repaired"]:
+                        item["origin"] = "corrigido"
+                if reuse is not None:
+                    result["reused_from"] = reused_marker(reuse)
+                    item["origin"] = "reaproveitado"
+                await asyncio.to_thread(record_result, question, self.memory, result, cache_key)
+            else:
+                item["origin"] = "perfil" if result.get("source") == "profile" else "cache"
+            item.update({k: result.get(k) for k in ("text", "stdout", "images", "code", "audit", "reused_from",
+                                                    "speculative")})
+
+            if self.enable_critic and result.get("source") != "profile":
+                t0 = time.perf_counter()
+                async with limiter:
+                    timings["espera_llm"] = timings.get("espera_llm", 0.0) + time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    item["critic"] = await astream_critic(
+                        question=question,
+                        history_snippet=ctx["history"],
+                        schema_hint=ctx["schema"],
+                        result_text=result.get("text", ""),
+                        stdout_tail=result.get("stdout", "") or "",
+                        profile_hint=ctx["profile"],
+                        llm_model=self.critic_model,
+                        temperature=self.critic_temperature,
+                    )
+                    timings["critic"] = time.perf_counter() - t0
+                await asyncio.to_thread(_save_bullets, self.memory, item["critic"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            item["origin"] = "erro"
+            item["error"] = f"{type(e).__name__}: {e}"
+        timings["total"] = time.perf_counter() - t_start
+        if self.on_done is not None:
+            self.on_done(item)
+        return item
+
+# =========================
+# Relatório (HTML autocontido ou Markdown + imagens ao lado)
+# =========================
+def _mime(img: bytes) -> str:
+    if img[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if img[:2] == b"\xff\xd8":
+        return "image/jpeg"
+    if img[:4] == b"RIFF" and img[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+def _timing_rows(report: Dict[str, Any]) -> List[List[str]]:
+    rows = []
+    for it in report["items"]:
+        t = it["timings"]
+        rows.append([str(it["n"]), it["question"], it["origin"]]
+                    + [f"{t[k]:.2f}" if k in t else "—" for k, _ in STAGES])
+    return rows
+
+def _meta_lines(report: Dict[str, Any], dataset: Optional[Dict[str, Any]]) -> List[str]:
+    m = report["meta"]
+    lines = []
+    if dataset:
+        lines.append(f"Dataset: {dataset['path']} ({dataset['source']}, {dataset['seconds']:.1f}s)")
+    lines += [
+        f"ID {m['dataset_id']} • {m['rows']:,} linhas × {m['columns']} colunas",
+        f"{m['questions']} pergunta(s) • {m['errors']} erro(s) • modelo {m['model']}"
+        + (f" • crítico {m['critic']}" if m["critic"] else " • sem crítico"),
+        f"LLM: até {m['llm_concurrency']} chamada(s) simultânea(s)"
+        + (f", {m['rpm']} req/min" if m["rpm"] else "")
+        + (f" • {m['candidates']} candidato(s) por pergunta" if m.get("candidates", 1) > 1 else "")
+        + f" • execução: {m['exec_mode']} ({m['workers']} worker(s))",
+        f"Tempo total {m['wall_s']:.1f}s • soma por pergunta {m['sum_question_s']:.1f}s • "
+        f"paralelismo efetivo {m['parallelism']:.1f}x",
+    ]
+    return lines
+
+def _speculation_note(it: Dict[str, Any]) -> Optional[str]:
+    spec = it.get("speculative")
+    if not spec or not spec["failures"]:
+        return None
+    if spec["repaired"]:
+        src = spec["repaired_from"]
+        return f"🔧 Código corrigido automaticamente após erro ({src['stage']}: {src['error']})."
+    return (f"🎲 Venceu o candidato {spec['winner']} de {spec['candidates']} "
+            f"(temperatura {spec['temperature']}); {len(spec['failures'])} falhou(aram).")
+
+def render_html(report: Dict[str, Any], dataset: Optional[Dict[str, Any]] = None) -> str:
+    e = html.escape
+    head = ["#", "Pergunta", "Origem"] + [f"{label} (s)" for _, label in STAGES]
+    out = [
+        "<!DOCTYPE html><html lang='pt-BR'><head><meta charset='utf-8'><title>EDA Agent – relatório batch</title>",
+        "<style>body{font-family:system-ui,sans-serif;max-width:1100px;margin:2em auto;padding:0 1em}"
+        "table{border-collapse:collapse;font-size:.9em}td,th{border:1px solid #ccc;padding:4px 8px}"
+        "td.n{text-align:right}pre{background:#f6f8fa;padding:.8em;overflow-x:auto}"
+        "img{max-width:100%}.erro{color:#b00}section{border-top:1px solid #ddd;margin-top:2em}</style></head><body>",
+        "<h1>📊 EDA Agent – relatório batch</h1>",
+        "<p>" + "<br>".join(e(ln) for ln in _meta_lines(report, dataset)) + "</p>",
+        "<h2>Tempos por pergunta</h2><table><tr>" + "".join(f"<th>{e(h)}</th>" for h in head) + "</tr>",
+    ]
+    for row in _timing_rows(report):
+        cells = [f"<td class='n'>{e(row[0])}</td>", f"<td>{e(row[1])}</td>", f"<td>{e(row[2])}</td>"]
+        cells += [f"<td class='n'>{e(c)}</td>" for c in row[3:]]
+        out.append("<tr>" + "".join(cells) + "</tr>")
+    out.append("</table>")
+    for it in report["items"]:
+        out.append(f"<section><h2>{it['n']}. {e(it['question'])}</h2>")
+        if it.get("error"):
+            out.append(f"<p class='erro'>❌ {e(it['error'])}</p></section>")
+            continue
+        reused = it.get("reused_from")
+        if reused:
+            out.append(f"<p><em>♻️ Código reaproveitado do turno #{reused['turn_id']} "
+                       f"(similaridade {reused['score']:.2f}).</em></p>")
+        note = _speculation_note(it)
+        if note:
+            out.append(f"<p><em>{e(note)}</em></p>")
+        out.append(f"<p>{e(it.get('text') or '')}</p>")
+        if it.get("stdout"):
+            out.append(f"<details><summary>Saída (stdout)</summary><pre>{e(it['stdout'])}</pre></details>")
+        for img in it.get("images") or []:
+            out.append(f"<img src='data:{_mime(img)};base64,{base64.b64encode(img).decode('ascii')}'>")
+        if it.get("critic"):
+            out.append(f"<h3>🧠 Conclusões críticas</h3><pre>{e(it['critic'])}</pre>")
+        if it.get("code"):
+            audit = f"<pre>{e(format_audit(it['audit']))}</pre>" if it.get("audit") else ""
+            out.append(f"<details><summary>Código gerado</summary>{audit}<pre>{e(it['code'])}</pre></details>")
+        out.append("</section>")
+    out.append("</body></html>")
+    return "\n".join(out)
+
+def render_markdown(report: Dict[str, Any], out_path: str, dataset: Optional[Dict[str, Any]] = None) -> str:
+    # imagens vão para "<relatório>_files/" ao lado do .md
+    stem = os.path.splitext(out_path)[0]
+    files_dir = f"{stem}_files"
+    head = ["#", "Pergunta", "Origem"] + [f"{label} (s)" for _, label in STAGES]
+    out = ["# 📊 EDA Agent – relatório batch", ""]
+    out += [f"- {ln}" for ln in _meta_lines(report, dataset)]
+    out += ["", "## Tempos por pergunta", "", "| " + " | ".join(head) + " |",
+            "|" + "---|" * 3 + "---:|" * len(STAGES)]
+    for row in _timing_rows(report):
+        out.append("| " + " | ".join(c.replace("|", "\\|") for c in row) + " |")
+    for it in report["items"]:
+        out += ["", f"## {it['n']}. {it['question']}", ""]
+        if it.get("error"):
+            out.append(f"❌ `{it['error']}`")
+            continue
+        reused = it.get("reused_from")
+        if reused:
+            out += [f"_♻️ Código reaproveitado do turno #{reused['turn_id']} (similaridade {reused['score']:.2f})._", ""]
+        note = _speculation_note(it)
+        if note:
+            out += [f"_{note}_", ""]
+        out.append(it.get("text") or "")
+        if it.get("stdout"):
+            out += ["", "```text", it["stdout"].rstrip(), "```"]
+        for k, img in enumerate(it.get("images") or [], 1):
+            os.makedirs(files_dir, exist_ok=True)
+            ext = _mime(img).split("/")[-1].replace("octet-stream", "bin")
+            name = f"q{it['n']:03d}_{k}.{ext}"
+            with open(os.path.join(files_dir, name), "wb") as f:
+                f.write(img)
+            out += ["", f"![figura {k}]({os.path.basename(files_dir)}/{name})"]
+        if it.get("critic"):
+            out += ["", "### 🧠 Conclusões críticas", "", it["critic"]]
+        if it.get("code"):
+            out += ["", "<details><summary>Código gerado</summary>", ""]
+            if it.get("audit"):
+                out += [format_audit(it["audit"]), ""]
+            out += ["```python", it["code"].rstrip(), "```", "", "</details>"]
+    return "\n".join(out) + "\n"
+
+def write_report(report: Dict[str, Any], out_path: str, dataset: Optional[Dict[str, Any]] = None) -> str:
+    if out_path.lower().endswith((".md", ".markdown")):
+        text = render_markdown(report, out_path, dataset)
+    else:
+        text = render_html(report, dataset)
+    with open(out_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return out_path
+
+# =========================
+# CLI
+# =========================
+def main(argv: Optional[List[str]] = None) -> int:
+    from dotenv import load_dotenv
+    load_dotenv()
+    # frames mapeados em memória são compartilhados entre execuções (mesma regra do app)
+    pd.set_option("mode.copy_on_write", True)
+
+    ap = argparse.ArgumentParser(description="Roda um lote de perguntas contra um CSV e gera um relatório.")
+    ap.add_argument("csv")
+    ap.add_argument("questions", nargs="?", help="arquivo .txt (uma por linha) ou .json (lista)")
+    ap.add_argument("-q", "--question", action="append", default=[], help="pergunta avulsa (repetível)")
+    ap.add_argument("--out", default="relatorio_batch.html", help=".html (autocontido) ou .md")
+    ap.add_argument("--json", help="também grava os resultados (sem imagens) em JSON")
+    ap.add_argument("--model", default="gpt-4o-mini")
+    ap.add_argument("--temperature", type=float, default=0.0)
+    ap.add_argument("--critic-model", default="gpt-4o-mini")
+    ap.add_argument("--no-critic", action="store_true")
+    ap.add_argument("--no-cache", action="store_true", help="ignora cache de respostas e reaproveitamento")
+    ap.add_argument("--llm-concurrency", type=int, default=BATCH_LLM_CONCURRENCY)
+    ap.add_argument("--rpm", type=int, default=BATCH_RPM, help="requisições à LLM por minuto (0 = sem teto)")
+    ap.add_argument("--workers", type=int, default=POOL_SIZE, help="processos de execução")
+    ap.add_argument("--exec", dest="exec_mode", choices=["pool", "inline"], default="pool")
+    ap.add_argument("--candidates", type=int, default=SPECULATIVE_CANDIDATES,
+                    help="snippets gerados em paralelo por pergunta (o primeiro que roda sem erro vence)")
+    ap.add_argument("--fail-on-error", action="store_true")
+    args = ap.parse_args(argv)
+
+    questions = (read_questions(args.questions) if args.questions else []) + [q for q in args.question if q.strip()]
+    if not questions:
+        ap.error("nenhuma pergunta informada")
+
+    dataset_id, df, dataset = load_frame(args.csv)
+    print(f"Dataset {dataset_id}: {len(df):,} linhas × {df.shape[1]} colunas ({dataset['source']}, "
+          f"{dataset['seconds']:.1f}s)", file=sys.stderr)
+    runner = BatchRunner(df, dataset_id, llm_model=args.model, temperature=args.temperature,
+                         critic_model=args.critic_model, enable_critic=not args.no_critic,
+                         use_cache=ANSWER_CACHE_ENABLED and not args.no_cache,
+                         llm_concurrency=args.llm_concurrency, rpm=args.rpm,
+                         workers=args.workers, exec_mode=args.exec_mode, candidates=args.candidates)
+    done = [0]
+
+    def _progress(item: Dict[str, Any]) -> None:
+        done[0] += 1
+        status = "erro" if item.get("error") else item["origin"]
+        print(f"[{done[0]}/{len(questions)}] {status:>13} {item['timings']['total']:6.1f}s  {item['question']}",
+              file=sys.stderr)
+
+    runner.on_done = _progress
+    report = runner.run(questions)
+    write_report(report, args.out, dataset)
+    if args.json:
+        slim = {**report, "dataset": dataset,
+                "items": [{**it, "images": len(it.get("images") or [])} for it in report["items"]]}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(slim, f, ensure_ascii=False, indent=2, default=str)
+    m = report["meta"]
+    print(f"Relatório: {args.out} • {m['questions']} pergunta(s) em {m['wall_s']:.1f}s "
+          f"(paralelismo {m['parallelism']:.1f}x) • {m['errors']} erro(s)", file=sys.stderr)
+    return 1 if args.fail_on_error and m["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
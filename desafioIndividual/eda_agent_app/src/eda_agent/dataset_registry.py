@@ -0,0 +1,177 @@
+from __future__ import annotations
+import os, time, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+from .dataset_store import has_dataset, load_dataset, save_dataset
+from .metrics import span
+
+# orçamento global (processo) para frames em memória; acima dele, os menos usados vão para o disco
+REGISTRY_BUDGET_MB = float(os.environ.get("EDA_AGENT_REGISTRY_MB", "2048"))
+DOWNCAST_ENABLED = os.environ.get("EDA_AGENT_DOWNCAST", "1").strip().lower() not in {"0", "false", "no"}
+
+# =========================
+# Compactação de tipos na admissão
+# =========================
+def _arrow_strings() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _compact_column(s: pd.Series, arrow: bool) -> Optional[pd.Series]:
+    # inteiros e floats ficam como estão: int32 estoura em silêncio em produtos/somas entre
+    # colunas feitos pelo código gerado, e float32 mudaria médias/desvios. Texto também não
+    # vira category: fillna com valor novo levanta erro e groupby passa a listar grupos vazios
+    if arrow and s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) == "string":
+        return s.astype("string[pyarrow]")
+    return None
+
+def compact_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Colunas de texto em strings Arrow (colunas numéricas não mudam). Colunas não alteradas
+    não são copiadas.
+    Retorna (frame, {coluna: "tipo antigo → novo"}).
+    """
+    if df.columns.has_duplicates:
+        return df, {}
+    arrow = _arrow_strings()
+    out, changes = df, {}
+    for c in df.columns:
+        s = df[c]
+        new = _compact_column(s, arrow)
+        if new is None:
+            continue
+        if out is df:
+            out = df.copy(deep=False)
+        out[c] = new
+        changes[str(c)] = f"{s.dtype} → {new.dtype}"
+    return out, changes
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+# =========================
+# Registro de datasets do processo
+# =========================
+class _Entry:
+    def __init__(self, df: pd.DataFrame, source: str, saved_mb: float):
+        self.df = df
+        self.source = source
+        self.bytes = frame_bytes(df)
+        self.saved_mb = saved_mb
+        self.hits = 0
+        self.last_used = time.time()
+        self.spilling = False
+
+class DatasetRegistry:
+    """
+    Frames limpos compartilhados por todas as sessões, por dataset_id. Cada sessão recebe uma
+    cópia rasa (copy-on-write): mutações ficam locais e o frame compartilhado é somente
+    leitura. Acima do orçamento, os menos usados são gravados no armazenamento colunar (se
+    ainda não estiverem lá) e descartados da memória; get() os remapeia sob demanda. Sem
+    armazenamento (desligado ou frame não serializável), o frame sai da memória mesmo assim
+    (contado em "dropped"): um novo upload do mesmo arquivo o reingere.
+    """
+    def __init__(self, budget_mb: float = REGISTRY_BUDGET_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.spilled = 0
+        self.dropped = 0
+
+    def get(self, dataset_id: str, load_spilled: bool = True) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(dataset_id)
+            if entry is not None:
+                self._entries.move_to_end(dataset_id)
+                entry.hits += 1
+                entry.last_used = time.time()
+                return entry.df.copy(deep=False)
+        if not load_spilled:
+            return None
+        df = load_dataset(dataset_id)  # descartado antes (ou de outro processo): remapeia do disco
+        return None if df is None else self.admit(dataset_id, df, downcast=False, source="store")
+
+    def admit(self, dataset_id: str, df: pd.DataFrame, downcast: bool = DOWNCAST_ENABLED,
+              source: str = "csv") -> pd.DataFrame:
+        """
+        Registra o frame (compactando os tipos se downcast) e devolve a cópia rasa da sessão.
+        """
+        saved_mb = 0.0
+        if downcast:
+            with span("registry.downcast", columns=df.shape[1]) as sp:
+                before = frame_bytes(df)
+                df, changes = compact_frame(df)
+                saved_mb = (before - frame_bytes(df)) / 1e6
+                sp.record(changed=len(changes), saved_mb=round(saved_mb, 1))
+        with self._lock:
+            existing = self._entries.get(dataset_id)
+            if existing is not None:
+                # outra sessão admitiu o mesmo conteúdo antes: fica o primeiro
+                self._entries.move_to_end(dataset_id)
+                return existing.df.copy(deep=False)
+            self._entries[dataset_id] = _Entry(df, source, saved_mb)
+            victims = self._pick_victims(keep=dataset_id)
+        # a escrita no disco (pode levar vários segundos) fica fora do lock: get() das outras
+        # sessões não espera
+        self._spill(victims)
+        return df.copy(deep=False)
+
+    def _pick_victims(self, keep: str) -> List[Tuple[str, _Entry]]:
+        # chamado com o lock: os menos usados até caber no orçamento (os já em disco não
+        # precisam de escrita, mas também entram na lista)
+        total = sum(e.bytes for e in self._entries.values() if not e.spilling)
+        victims = []
+        for dataset_id, entry in self._entries.items():
+            if total <= self.budget:
+                break
+            if dataset_id == keep or entry.spilling:
+                continue
+            entry.spilling = True
+            victims.append((dataset_id, entry))
+            total -= entry.bytes
+        return victims
+
+    def _spill(self, victims: List[Tuple[str, _Entry]]) -> None:
+        for dataset_id, entry in victims:
+            # só fica remapeável o que foi para o disco; o resto é descartado e contado
+            stored = has_dataset(dataset_id) or save_dataset(dataset_id, entry.df) is not None
+            with self._lock:
+                if self._entries.get(dataset_id) is entry:
+                    del self._entries[dataset_id]
+                if stored:
+                    self.spilled += 1
+                else:
+                    self.dropped += 1
+
+    def evict(self, dataset_id: str) -> bool:
+        with self._lock:
+            return self._entries.pop(dataset_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = [{
+                "dataset_id": k,
+                "linhas": len(e.df),
+                "colunas": e.df.shape[1],
+                "memória_mb": round(e.bytes / 1e6, 1),
+                "economia_downcast_mb": round(e.saved_mb, 1),
+                "origem": e.source,
+                "acessos": e.hits,
+                "ocioso_s": int(time.time() - e.last_used),
+            } for k, e in reversed(self._entries.items())]
+            total = sum(e.bytes for e in self._entries.values())
+        return {"datasets": rows, "total_mb": total / 1e6, "budget_mb": self.budget / 1e6, "spilled": self.spilled,
+                "dropped": self.dropped}
+
+_REGISTRY: Optional[DatasetRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+def get_registry() -> DatasetRegistry:
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            _REGISTRY = DatasetRegistry()
+        return _REGISTRY
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import os, threading, uuid
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from .state import CACHE_DIR
+
+# frames limpos persistidos ao lado da memória ({dataset_id}.json) como Arrow IPC sem
+# compressão, para que possam ser mapeados em memória em vez de re-parseados
+STORE_MAX_MB = float(os.environ.get("EDA_AGENT_STORE_MB", "4096"))
+STORE_ENABLED = os.environ.get("EDA_AGENT_STORE", "1").strip().lower() not in {"0", "false", "no"}
+
+_lock = threading.Lock()
+
+def store_path(dataset_id: str) -> str:
+    return os.path.join(CACHE_DIR, f"{dataset_id}.feather")
+
+def has_dataset(dataset_id: str) -> bool:
+    return os.path.exists(store_path(dataset_id))
+
+def load_dataset(dataset_id: str) -> Optional[pd.DataFrame]:
+    """
+    Carrega o frame limpo via memory-map; colunas numéricas sem nulos não são copiadas.
+    """
+    path = store_path(dataset_id)
+    if not STORE_ENABLED or not os.path.exists(path):
+        return None
+    try:
+        import pyarrow.feather as feather
+        table = feather.read_table(path, memory_map=True)
+        os.utime(path)  # marca uso recente (LRU)
+    except Exception:
+        return None
+    # colunas 'string' (compactadas na admissão) voltam como strings Arrow, não objetos Python
+    with pd.option_context("mode.string_storage", "pyarrow"):
+        return table.to_pandas(split_blocks=True, date_as_object=False)
+
+def save_dataset(dataset_id: str, df: pd.DataFrame) -> Optional[str]:
+    if not STORE_ENABLED:
+        return None
+    path = store_path(dataset_id)
+    if os.path.exists(path):
+        return path
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        table = pa.Table.from_pandas(df)
+    except Exception:
+        # ex.: colunas object com tipos mistos; segue só com o cache em memória
+        return None
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+    evict(keep=dataset_id)
+    return path
+
+def stored_datasets() -> List[Dict[str, Any]]:
+    out = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(".feather"):
+            st = entry.stat()
+            out.append({
+                "dataset_id": entry.name[: -len(".feather")],
+                "bytes": st.st_size,
+                "last_used": st.st_mtime,
+            })
+    return out
+
+def evict(keep: Optional[str] = None, max_bytes: Optional[int] = None) -> List[str]:
+    """
+    Remove os datasets usados há mais tempo até caber no orçamento de disco.
+    (Remover um arquivo mapeado é seguro no Linux: quem já o mapeou continua lendo.)
+    """
+    budget = int(STORE_MAX_MB * 1024 * 1024) if max_bytes is None else max_bytes
+    removed = []
+    with _lock:
+        entries = sorted(stored_datasets(), key=lambda e: e["last_used"])
+        total = sum(e["bytes"] for e in entries)
+        for e in entries:
+            if total <= budget:
+                break
+            if e["dataset_id"] == keep:
+                continue
+            try:
+                os.remove(store_path(e["dataset_id"]))
+            except OSError:
+                continue
+            total -= e["bytes"]
+            removed.append(e["dataset_id"])
+    return removed
@@ -1,9 +1,17 @@
 from __future__ import annotations
-import io, contextlib, ast
-from typing import Any, Dict
+import io, os, contextlib, ast, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+from .render import encode_figure, render_figures
+from .metrics import span
+from .sql_engine import make_sql_helper
+
+# código já validado/compilado (por hash) e resultados de snippets determinísticos por (código, dataset)
+CODE_CACHE_SIZE = int(os.environ.get("EDA_AGENT_CODE_CACHE", "256"))
+RESULT_MEMO_MB = float(os.environ.get("EDA_AGENT_RESULT_MEMO_MB", "64"))
 
 # Builtins seguros e suficientes para Pandas/Numpy/Matplotlib
 SAFE_BUILTINS = {
@@ -74,41 +82,171 @@ class _SafetyVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
 def _fig_to_png_bytes(fig) -> bytes:
-    buf = io.BytesIO()
-    fig.savefig(buf, format="png", bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return buf.read()
-
-def run_generated_code(code: str, extra_globals: Dict[str, Any]) -> Dict[str, Any]:
-    # validação AST
-    try:
-        tree = ast.parse(code, mode="exec")
-    except SyntaxError as e:
-        raise ValueError(f"Erro de sintaxe no código gerado: {e}")
-    _SafetyVisitor().visit(tree)
+    return encode_figure(fig, "png")
+
+# =========================
+# Cache de código compilado e memo de resultados
+# =========================
+# nomes que tornam a saída não reprodutível (np.random, default_rng, datetime.now...)
+_NONDETERMINISTIC = {"random", "default_rng", "RandomState", "now", "today", "utcnow"}
+# amostragem só é determinística com semente explícita
+_SEEDED_CALLS = {"sample"}
+
+_compiled: "OrderedDict[str, Tuple[Any, bool]]" = OrderedDict()
+_results: "OrderedDict[Tuple, Tuple[Dict[str, Any], int]]" = OrderedDict()
+_results_bytes = 0
+_stats = {"compile_hits": 0, "compile_misses": 0, "memo_hits": 0, "memo_misses": 0}
+_cache_lock = threading.Lock()
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+def _is_deterministic(tree: ast.AST) -> bool:
+    for node in ast.walk(tree):
+        name = node.attr if isinstance(node, ast.Attribute) else node.id if isinstance(node, ast.Name) else None
+        if name in _NONDETERMINISTIC:
+            return False
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in _SEEDED_CALLS
+                and not any(k.arg in {"random_state", "seed"} for k in node.keywords)):
+            return False
+    return True
+
+def compile_checked(code: str) -> Tuple[Any, bool]:
+    """
+    Valida (AST) e compila o snippet uma vez por hash de código.
+    Retorna (code object, True se o snippet não usa aleatoriedade/relógio).
+    """
+    key = code_hash(code)
+    with _cache_lock:
+        hit = _compiled.get(key)
+        if hit is not None:
+            _compiled.move_to_end(key)
+            _stats["compile_hits"] += 1
+            return hit
+        _stats["compile_misses"] += 1
+    with span("ast_validate"):
+        try:
+            tree = ast.parse(code, mode="exec")
+        except SyntaxError as e:
+            raise ValueError(f"Erro de sintaxe no código gerado: {e}")
+        _SafetyVisitor().visit(tree)
+        entry = (compile(tree, filename="<llm_code>", mode="exec"), _is_deterministic(tree))
+    with _cache_lock:
+        _compiled[key] = entry
+        while len(_compiled) > max(1, CODE_CACHE_SIZE):
+            _compiled.popitem(last=False)
+    return entry
+
+def _frame_token(df: Any) -> Any:
+    # mesmo dataset_id com frame diferente (colunas/linhas/tipos) não reaproveita resultado
+    if df is None or not hasattr(df, "shape"):
+        return None
+    return (df.shape, tuple(map(str, df.columns)), tuple(map(str, getattr(df, "dtypes", ()))))
+
+def result_key(code: str, dataset_id: Optional[str], df: Any) -> Optional[Tuple]:
+    """
+    Chave do memo de resultados, ou None se o snippet não pode ser memorizado
+    (sem dataset_id, memo desligado ou código com aleatoriedade).
+    """
+    if not dataset_id or RESULT_MEMO_MB <= 0:
+        return None
+    _, deterministic = compile_checked(code)
+    if not deterministic:
+        return None
+    return (code_hash(code), dataset_id, _frame_token(df))
+
+def memo_get(key: Tuple) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        hit = _results.get(key)
+        if hit is None:
+            _stats["memo_misses"] += 1
+            return None
+        _results.move_to_end(key)
+        _stats["memo_hits"] += 1
+    out = hit[0]
+    return {**out, "images": list(out["images"])}
+
+def memo_put(key: Tuple, result: Dict[str, Any]) -> None:
+    global _results_bytes
+    entry = {"stdout": result.get("stdout", ""), "text": result.get("text", ""), "images": list(result.get("images", []))}
+    size = len(entry["stdout"]) + len(entry["text"]) + sum(len(b) for b in entry["images"])
+    budget = RESULT_MEMO_MB * 1024 * 1024
+    if size > budget / 4:
+        return  # resultado grande demais: expulsaria o memo inteiro
+    with _cache_lock:
+        if key in _results:
+            return
+        _results[key] = (entry, size)
+        _results_bytes += size
+        while _results_bytes > budget and _results:
+            _, (_, old_size) = _results.popitem(last=False)
+            _results_bytes -= old_size
+
+def invalidate_results(dataset_id: Optional[str] = None) -> int:
+    """
+    Descarta resultados memorizados de um dataset (ou todos). Retorna quantos saíram.
+    """
+    global _results_bytes
+    with _cache_lock:
+        keys = [k for k in _results if dataset_id is None or k[1] == dataset_id]
+        for k in keys:
+            _results_bytes -= _results.pop(k)[1]
+    return len(keys)
+
+def execution_cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        return {**_stats, "compiled": len(_compiled), "results": len(_results), "results_bytes": _results_bytes}
+
+def run_generated_code(code: str, extra_globals: Dict[str, Any], dataset_id: Optional[str] = None,
+                       memo: bool = True, on_text: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+    """
+    Executa o snippet no sandbox. Snippets determinísticos já executados no mesmo dataset
+    devolvem o resultado memorizado (texto, stdout e figuras) sem reexecutar. on_text(texto,
+    stdout), se dado, é chamado assim que o snippet termina, antes da codificação das figuras.
+    """
+    key = result_key(code, dataset_id, extra_globals.get("df")) if memo else None
+    if key is not None:
+        with span("result_memo.lookup") as sp:
+            hit = memo_get(key)
+            sp.record(cache_hit=hit is not None)
+        if hit is not None:
+            return hit
+
+    # validação AST + compilação (cacheadas por hash do código)
+    compiled, deterministic = compile_checked(code)
 
     # ambiente de execução com builtins restritos
     sandbox_globals = {"__builtins__": SAFE_BUILTINS}
     sandbox_globals.update(extra_globals)
+    # sql("SELECT ... FROM df"): DuckDB somente leitura sobre a cópia colunar do dataset (se houver)
+    if "sql" not in sandbox_globals:
+        sql = make_sql_helper(dataset_id, extra_globals.get("df"))
+        if sql is not None:
+            sandbox_globals["sql"] = sql
 
     # executa capturando stdout
     f = io.StringIO()
-    with contextlib.redirect_stdout(f):
-        exec(compile(tree, filename="<llm_code>", mode="exec"), sandbox_globals, sandbox_globals)
+    with span("exec"), contextlib.redirect_stdout(f):
+        exec(compiled, sandbox_globals, sandbox_globals)
 
     text = sandbox_globals.get("RESULT_TEXT")
+    text = text if isinstance(text, str) else ""
     stdout = f.getvalue()
+    if on_text is not None:
+        on_text(text, stdout)
 
-    # captura todas as figuras abertas
-    images = []
-    for num in plt.get_fignums():
-        fig = plt.figure(num)
-        images.append(_fig_to_png_bytes(fig))
+    # captura todas as figuras abertas (agregação de artistas grandes e cache por
+    # dataset_id + código ficam em render.py); snippets com aleatoriedade/relógio não usam o
+    # cache de figuras, senão o gráfico contradiz o RESULT_TEXT da nova execução
+    figs = [plt.figure(num) for num in plt.get_fignums()]
+    images = render_figures(figs, dataset_id=dataset_id if deterministic else None, code=code)
     plt.close("all")
 
-    return {
+    out = {
         "stdout": stdout,
-        "text": text if isinstance(text, str) else "",
+        "text": text,
         "images": images,
     }
+    if key is not None:
+        memo_put(key, out)
+    return out
@@ -0,0 +1,222 @@
+from __future__ import annotations
+import os, io, time, hashlib, tempfile
+from typing import Any, Dict, Optional, Tuple
+import pandas as pd
+from .state import CACHE_DIR
+from .dataset_store import load_dataset, save_dataset
+from .dataset_registry import get_registry
+from .metrics import span, traced
+
+SAMPLE_SIZE = 65536  # 64KB
+SPOOL_DIR = os.path.join(CACHE_DIR, "uploads")
+# uploads acima deste tamanho usam a ingestão em streaming
+STREAMING_THRESHOLD_MB = float(os.environ.get("EDA_AGENT_STREAMING_MB", "200"))
+BLOCK_MB = int(os.environ.get("EDA_AGENT_CSV_BLOCK_MB", "16"))
+COPY_CHUNK = 8 * 1024 * 1024
+
+def detect_encoding_sample(content: bytes) -> str:
+    sample = content[:SAMPLE_SIZE]
+    try:
+        import chardet
+        res = chardet.detect(sample)
+        enc = (res.get("encoding") or "").lower()
+        if enc.startswith("utf"):
+            return "utf-8"
+        if "1252" in enc or "8859" in enc or "latin" in enc:
+            return "cp1252"
+        return "utf-8"
+    except Exception:
+        try:
+            sample.decode("utf-8")
+            return "utf-8"
+        except UnicodeDecodeError:
+            return "cp1252"
+
+def detect_separator_sample(content: bytes, encoding: str) -> str:
+    text = content[:SAMPLE_SIZE].decode(encoding, errors="ignore").strip()
+    return ";" if text.count(";") > text.count(",") else ","
+
+@traced("read_csv")
+def read_csv_bytes(file_bytes: bytes) -> pd.DataFrame:
+    enc = detect_encoding_sample(file_bytes)
+    sep = detect_separator_sample(file_bytes, enc)
+    bio = io.BytesIO(file_bytes)
+    try:
+        return pd.read_csv(bio, sep=sep, encoding=enc, engine="c")
+    except Exception:
+        bio.seek(0)
+        return pd.read_csv(bio, sep=sep, encoding=enc, engine="python", on_bad_lines="skip")
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # limpeza extra: linhas/colunas totalmente vazias e espaços nos nomes
+    df = df.dropna(how="all").dropna(axis=1, how="all")
+    df.columns = df.columns.str.strip()
+    return df
+
+# =========================
+# Ingestão em streaming (arquivos grandes)
+# =========================
+def peak_rss_mb() -> float:
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+    except ImportError:
+        return 0.0
+
+def _cast_best(col):
+    # mesma ordem da inferência do pyarrow; o que não converte inteiro fica como texto
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    for t in (pa.int64(), pa.float64(), pa.bool_(), pa.timestamp("ns")):
+        try:
+            return pc.cast(col, t)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+    return col
+
+def _read_arrow_stream(path: str, enc: str, sep: str, stats: Dict[str, Any]) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    def _skip(row) -> str:
+        stats["skipped_rows"] += 1
+        return "skip"
+
+    def _read(column_types: Optional[Dict[str, Any]]):
+        stats["skipped_rows"] = stats["chunks"] = 0
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(encoding=enc, block_size=int(BLOCK_MB * 1024 * 1024), use_threads=True),
+            parse_options=pacsv.ParseOptions(delimiter=sep, invalid_row_handler=_skip),
+            convert_options=pacsv.ConvertOptions(column_types=column_types or {}, strings_can_be_null=True),
+        )
+        batches = []
+        try:
+            for batch in reader:
+                batches.append(batch)
+                stats["chunks"] += 1
+        except pa.ArrowInvalid:
+            return reader.schema, None
+        return reader.schema, pa.Table.from_batches(batches, schema=reader.schema)
+
+    inferred, table = _read(None)
+    if table is None:
+        # tipo inferido no 1º bloco não serve para um bloco posterior: uma única releitura com
+        # tudo como texto e conversão por coluna depois de concatenar (sem uma passada por coluna)
+        _, table = _read({name: pa.string() for name in inferred.names})
+        if table is None:
+            raise ValueError("Não foi possível ler o CSV em streaming.")
+        table = pa.table([_cast_best(table.column(i)) for i in range(table.num_columns)], names=table.column_names)
+        stats["retyped_columns"] = sorted(
+            f.name for f, g in zip(inferred, table.schema) if not pa.types.is_string(f.type) and g.type != f.type)
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+def _read_pandas_chunks(path: str, enc: str, sep: str, stats: Dict[str, Any], chunk_rows: int = 200_000) -> pd.DataFrame:
+    parts = []
+    for chunk in pd.read_csv(path, sep=sep, encoding=enc, engine="c", chunksize=chunk_rows,
+                             on_bad_lines="skip", low_memory=False):
+        parts.append(chunk)
+        stats["chunks"] += 1
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+def read_csv_streaming(path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Lê um CSV do disco em blocos (pyarrow multithread quando disponível).
+    Linhas inválidas são descartadas por bloco, sem reprocessar o arquivo inteiro.
+    Retorna o DataFrame e estatísticas (linhas/s, pico de RSS, linhas ignoradas).
+    """
+    with open(path, "rb") as f:
+        head = f.read(SAMPLE_SIZE)
+    enc = detect_encoding_sample(head)
+    sep = detect_separator_sample(head, enc)
+    stats: Dict[str, Any] = {"encoding": enc, "sep": sep, "chunks": 0, "skipped_rows": 0,
+                             "bytes": os.path.getsize(path)}
+    t0 = time.perf_counter()
+    with span("read_csv", streaming=True, bytes=stats["bytes"]) as sp:
+        try:
+            df = _read_arrow_stream(path, enc, sep, stats)
+            stats["engine"] = "pyarrow"
+        except ImportError:
+            df = _read_pandas_chunks(path, enc, sep, stats)
+            stats["engine"] = "pandas-chunks"
+        sp.record(engine=stats["engine"], rows=len(df))
+    elapsed = time.perf_counter() - t0
+    stats.update({
+        "rows": len(df),
+        "seconds": elapsed,
+        "rows_per_s": (len(df) / elapsed) if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    return df, stats
+
+# =========================
+# Ingestão à prova de reruns: um hash por arquivo, frame limpo no registro do processo
+# =========================
+def _upload_size(fileobj) -> int:
+    size = getattr(fileobj, "size", None)
+    if size is None:
+        pos = fileobj.tell()
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(pos)
+    return int(size)
+
+def hash_upload(fileobj, spool: bool = False) -> Tuple[str, Optional[str], Optional[bytes]]:
+    """
+    SHA-256 do upload (mesmo id de dataset_id_from_bytes) numa única leitura. Com spool=True,
+    grava a cópia em disco em blocos na mesma passada; sem spool, devolve o conteúdo lido
+    para o parse. Retorna (dataset_id, caminho do spool ou None, bytes ou None).
+    """
+    fileobj.seek(0)
+    if not spool:
+        content = fileobj.read()
+        return hashlib.sha256(content).hexdigest()[:16], None, content
+    h = hashlib.sha256()
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".csv", dir=SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for block in iter(lambda: fileobj.read(COPY_CHUNK), b""):
+                h.update(block)
+                out.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return h.hexdigest()[:16], path, None
+
+def ingest_upload(fileobj) -> Tuple[str, pd.DataFrame, Dict[str, Any]]:
+    """
+    Um upload → (dataset_id, frame limpo, info). O arquivo é lido e hasheado uma única vez;
+    mesmo conteúdo já visto volta do registro de datasets (memória) ou do armazenamento
+    colunar (mmap), sem re-parse nem nova limpeza. Frames novos têm os tipos compactados na
+    admissão. info["source"]: memory | store | csv | streaming.
+    """
+    streaming = _upload_size(fileobj) >= STREAMING_THRESHOLD_MB * 1024 * 1024
+    with span("ingest_upload", streaming=streaming) as sp:
+        dataset_id, path, content = hash_upload(fileobj, spool=streaming)
+        try:
+            registry = get_registry()
+            info: Dict[str, Any] = {"source": "memory"}
+            df = registry.get(dataset_id, load_spilled=False)
+            if df is None:
+                df = load_dataset(dataset_id)
+                info["source"] = "store"
+                if df is not None:
+                    df = registry.admit(dataset_id, df, downcast=False, source="store")
+            if df is None:
+                if streaming:
+                    df, stats = read_csv_streaming(path)
+                    info = {**stats, "source": "streaming"}
+                else:
+                    df = read_csv_bytes(content)
+                    content = None  # o parse já tem tudo; libera o buffer antes da limpeza
+                    info["source"] = "csv"
+                df = registry.admit(dataset_id, clean_frame(df), source=info["source"])
+                save_dataset(dataset_id, df)
+            sp.record(source=info["source"], cache_hit=info["source"] in {"memory", "store"})
+        finally:
+            if path is not None:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+    return dataset_id, df, info
@@ -0,0 +1,159 @@
+from __future__ import annotations
+import os, json, time, threading
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional
+
+METRICS_ENABLED = os.environ.get("EDA_AGENT_METRICS", "1").strip().lower() not in {"0", "false", "no"}
+# acima deste tamanho o arquivo vira metrics.jsonl.1 (a geração anterior é descartada)
+METRICS_MAX_MB = float(os.environ.get("EDA_AGENT_METRICS_MB", "20"))
+_TAIL_BLOCK = 64 * 1024
+_lock = threading.Lock()
+
+def metrics_path() -> str:
+    from .state import CACHE_DIR  # import tardio: state também é instrumentado
+    return os.path.join(CACHE_DIR, "metrics.jsonl")
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+    except ImportError:
+        return 0.0
+
+class Span:
+    def __init__(self, stage: str, attrs: Dict[str, Any]):
+        self.stage = stage
+        self.attrs = dict(attrs)
+
+    def record(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def add_usage(self, message) -> None:
+        # tokens de prompt/completion de um AIMessage (invoke) ou do último chunk (stream)
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage:
+            self.attrs["prompt_tokens"] = self.attrs.get("prompt_tokens", 0) + int(usage.get("input_tokens", 0))
+            self.attrs["completion_tokens"] = self.attrs.get("completion_tokens", 0) + int(usage.get("output_tokens", 0))
+
+def _write(record: Dict[str, Any]) -> None:
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    # O_APPEND: linhas pequenas não se intercalam, nem entre processos (workers do pool)
+    path = metrics_path()
+    with _lock:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+            st = os.fstat(fd)
+            # outro processo pode ter rotacionado antes: só renomeia se o arquivo ainda é este
+            if st.st_size > METRICS_MAX_MB * 1024 * 1024 and os.stat(path).st_ino == st.st_ino:
+                os.replace(path, path + ".1")
+        finally:
+            os.close(fd)
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[Span]:
+    """
+    Mede uma etapa: tempo de parede, CPU da thread, variação do pico de RSS e atributos
+    extras (tokens, cache_hit...). Grava uma linha em CACHE_DIR/metrics.jsonl.
+    """
+    s = Span(stage, attrs)
+    if not METRICS_ENABLED:
+        yield s
+        return
+    t0, c0, rss0 = time.perf_counter(), time.thread_time(), _peak_rss_mb()
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        record = {
+            "ts": time.time(),
+            "stage": stage,
+            "wall_ms": (time.perf_counter() - t0) * 1000,
+            "cpu_ms": (time.thread_time() - c0) * 1000,
+            "rss_delta_mb": _peak_rss_mb() - rss0,
+            "pid": os.getpid(),
+        }
+        record.update(s.attrs)
+        try:
+            _write(record)
+        except OSError:
+            pass
+
+def traced(stage: str):
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def _tail_lines(path: str, n: int) -> List[bytes]:
+    # lê blocos a partir do fim até ter n linhas completas, sem percorrer o arquivo inteiro
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return []
+    with f:
+        pos = f.seek(0, os.SEEK_END)
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(_TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    if pos > 0:
+        lines = lines[1:]  # primeira linha possivelmente cortada no meio
+    return lines[-n:] if n > 0 else []
+
+def load_spans(limit: int = 5000) -> List[Dict[str, Any]]:
+    path = metrics_path()
+    lines = _tail_lines(path, limit)
+    if len(lines) < limit:
+        # logo após uma rotação, completa com o fim da geração anterior
+        lines = _tail_lines(path + ".1", limit - len(lines)) + lines
+    out = []
+    for line in lines:
+        try:
+            out.append(json.loads(line))
+        except ValueError:
+            continue
+    return out
+
+def _pct(values: List[float], q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    i = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[i]
+
+def summarize_spans(spans: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    p50/p95 de latência por etapa, CPU média, tokens médios e taxa de acerto de cache.
+    """
+    spans = load_spans() if spans is None else spans
+    by_stage: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for s in spans:
+        by_stage[s.get("stage", "?")].append(s)
+    rows = []
+    for stage, items in sorted(by_stage.items()):
+        wall = [i.get("wall_ms", 0.0) for i in items]
+        hits = [i["cache_hit"] for i in items if "cache_hit" in i]
+        tokens = [i.get("prompt_tokens", 0) + i.get("completion_tokens", 0) for i in items if "prompt_tokens" in i]
+        rows.append({
+            "etapa": stage,
+            "n": len(items),
+            "p50_ms": round(_pct(wall, 0.5), 1),
+            "p95_ms": round(_pct(wall, 0.95), 1),
+            "cpu_ms_médio": round(sum(i.get("cpu_ms", 0.0) for i in items) / len(items), 1),
+            "rss_delta_mb_máx": round(max(i.get("rss_delta_mb", 0.0) for i in items), 1),
+            "tokens_médios": round(sum(tokens) / len(tokens), 1) if tokens else None,
+            "cache_hit_%": round(100 * sum(hits) / len(hits), 1) if hits else None,
+            "erros": sum(1 for i in items if "error" in i),
+        })
+    return rows
@@ -0,0 +1,227 @@
+from __future__ import annotations
+import asyncio, queue, time
+from typing import Any, Callable, Dict, Optional
+import pandas as pd
+from .state import DatasetMemory
+from .profile import get_profile
+from .prompt_context import HISTORY_TURNS, build_prompt_context
+from .sampling import wants_preview
+from .answer_cache import ANSWER_CACHE_ENABLED
+from .agents.codegen_agent import (
+    build_schema_hint, answer_without_llm, find_reusable_code, reused_marker,
+    execute_code, execute_progressive, record_result,
+)
+from .speculative import SPECULATIVE_CANDIDATES, SpeculativeCodegen
+from .worker_pool import EXEC_MODE
+from .agents.critic_agent import astream_critic, critic_bullets
+from .agents.base import get_async_loop
+
+Callback = Optional[Callable[[Any], None]]
+
+class PipelineRun:
+    """
+    Pipeline assíncrono de uma pergunta: codegen com streaming → execução (thread) →
+    crítico iniciado assim que o snippet define RESULT_TEXT, em paralelo com a codificação
+    das figuras e a persistência. As corrotinas rodam no loop compartilhado do processo (clientes HTTP
+    reaproveitados); os callbacks são entregues de volta e executados na thread que chamou
+    run() (a thread do script do Streamlit). cancel() pode ser chamado de outra thread.
+    """
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: set = set()
+        self.cancelled = False
+        self.timings: Dict[str, float] = {}
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            for task in list(self._tasks):
+                try:
+                    loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    pass  # loop já encerrado
+
+    def _spawn(self, coro) -> "asyncio.Task":
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _mark(self, stage: str, t0: float) -> None:
+        self.timings[stage] = time.perf_counter() - t0
+
+    def run(self, question: str, df: pd.DataFrame, memory: DatasetMemory, **kwargs) -> Optional[Dict[str, Any]]:
+        """
+        Executa o pipeline até o fim; retorna None se foi cancelado.
+        """
+        events: "queue.Queue" = queue.Queue()
+        for name in ("on_code_token", "on_preview", "on_result", "on_critic_token"):
+            cb = kwargs.get(name)
+            if cb is not None:
+                kwargs[name] = (lambda cb: lambda *a: events.put((cb, a)))(cb)
+        fut = asyncio.run_coroutine_threadsafe(self._main(question, df, memory, **kwargs), get_async_loop())
+        try:
+            while not (fut.done() and events.empty()):
+                try:
+                    cb, args = events.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                cb(*args)
+        except BaseException:
+            # ex.: o Streamlit interrompe o script (nova pergunta/rerun) durante um callback
+            self.cancel()
+            raise
+        return fut.result()
+
+    async def _main(self, question: str, df: pd.DataFrame, memory: DatasetMemory, **kwargs):
+        self._loop = asyncio.get_running_loop()
+        if self.cancelled:
+            return None
+        try:
+            return await self._spawn(self._pipeline(question, df, memory, **kwargs))
+        except asyncio.CancelledError:
+            return None
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+
+    async def _pipeline(self, question: str, df: pd.DataFrame, memory: DatasetMemory, *,
+                        llm_model: str="gpt-4o-mini", temperature: float=0.0,
+                        critic_model: str="gpt-4o-mini", critic_temperature: float=0.2,
+                        enable_critic: bool = True, use_cache: bool = ANSWER_CACHE_ENABLED,
+                        on_code_token: Callback = None, on_preview: Callback = None,
+                        on_result: Callback = None, on_critic_token: Callback = None) -> Dict[str, Any]:
+        t_start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # perfil, tokenização, cache em disco e SQLite fora do loop compartilhado (não trava o
+        # streaming das outras sessões)
+        ctx, result, cache_key, reuse = await asyncio.to_thread(
+            _prepare, question, df, memory, llm_model, temperature, use_cache)
+
+        # o crítico pode começar assim que a execução produz RESULT_TEXT, antes da codificação
+        # das figuras; os tokens dele só vão para a tela depois do resultado
+        early: Dict[str, Any] = {}
+        shown = {"result": False, "latest": ""}
+
+        def _critic_token(text: str) -> None:
+            shown["latest"] = text
+            if shown["result"] and on_critic_token is not None:
+                on_critic_token(text)
+
+        def _start_critic(text: str, stdout: str) -> "asyncio.Task":
+            return self._spawn(astream_critic(
+                question=question,
+                history_snippet=ctx["history"],
+                schema_hint=ctx["schema"],
+                result_text=text,
+                stdout_tail=stdout or "",
+                profile_hint=ctx["profile"],
+                llm_model=critic_model,
+                temperature=critic_temperature,
+                on_token=_critic_token,
+            ))
+
+        def _on_text(text: str, stdout: str) -> None:
+            # thread de execução → loop; vale o primeiro candidato que chega até aqui
+            def _start() -> None:
+                if not early.get("decided") and "task" not in early:
+                    early.update(task=_start_critic(text, stdout), key=(text, stdout or ""))
+            loop.call_soon_threadsafe(_start)
+
+        if result is None:
+            # prévia em amostra só com um candidato (vários em paralelo gerariam prévias concorrentes)
+            progressive = (on_preview is not None and wants_preview(df)
+                           and (reuse is not None or SPECULATIVE_CANDIDATES == 1))
+            on_text = _on_text if enable_critic else None
+
+            def _execute(code: str):
+                if progressive:
+                    return asyncio.to_thread(execute_progressive, code, df, memory.dataset_id, on_preview, on_text)
+                return asyncio.to_thread(execute_code, code, df, memory.dataset_id, on_text)
+
+            speculation = None
+            if reuse is not None:
+                code, audit = reuse["code"], []
+                if on_code_token is not None:
+                    on_code_token(code)
+                t0 = time.perf_counter()
+                exec_result = await _execute(code)
+                self._mark("execute", t0)
+            else:
+                # candidatos em paralelo (EDA_AGENT_SPECULATIVE) e uma rodada de correção se todos falharem
+                gen = SpeculativeCodegen(question, ctx, df, _execute, llm_model=llm_model, temperature=temperature,
+                                         serial_exec=EXEC_MODE != "pool", on_token=on_code_token)
+                won = await gen.run()
+                code, audit, exec_result = won["code"], won["audit"], won["exec_result"]
+                self.timings.update({k: v for k, v in won["timings"].items() if k != "espera_llm"})
+                speculation = gen.marker(won)
+            result = {
+                "code": code,
+                "text": exec_result.get("text", ""),
+                "stdout": exec_result.get("stdout", ""),
+                "images": exec_result.get("images", []),
+                "audit": audit,
+                "cached": False,
+            }
+            if speculation is not None:
+                result["speculative"] = speculation
+            if reuse is not None:
+                result["reused_from"] = reused_marker(reuse)
+            persist = self._spawn(asyncio.to_thread(record_result, question, memory, result, cache_key))
+        else:
+            persist = None
+
+        # crítico já iniciado com o RESULT_TEXT do vencedor é mantido; senão (candidato que
+        # perdeu, resultado memorizado, atalho) começa agora, em paralelo com a persistência
+        critic_task = None
+        early["decided"] = True
+        if enable_critic and result.get("source") != "profile":
+            key = (result.get("text", ""), result.get("stdout", "") or "")
+            if early.get("key") == key:
+                critic_task = early["task"]
+            else:
+                if "task" in early:
+                    early["task"].cancel()
+                critic_task = _start_critic(*key)
+        elif "task" in early:
+            early["task"].cancel()
+        if on_result is not None:
+            on_result(result)
+        shown["result"] = True
+        if shown["latest"] and on_critic_token is not None:
+            on_critic_token(shown["latest"])
+        self.timings["first_result"] = time.perf_counter() - t_start
+        if persist is not None:
+            await persist
+
+        critic_text = ""
+        if critic_task is not None:
+            t0 = time.perf_counter()
+            critic_text = await critic_task
+            self._mark("critic", t0)
+            await asyncio.to_thread(_save_bullets, memory, critic_text)
+        self._mark("total", t_start)
+        return {**result, "critic": critic_text}
+
+def _prepare(question: str, df: pd.DataFrame, memory: DatasetMemory, llm_model: str, temperature: float,
+             use_cache: bool):
+    """
+    Etapas síncronas antes da LLM: schema, perfil, contexto do prompt, atalhos sem LLM e
+    reaproveitamento. Retorna (ctx, resultado do atalho ou None, chave do cache, reuse).
+    """
+    hint = build_schema_hint(df)
+    profile = get_profile(memory.dataset_id, df)
+    # schema/perfil/histórico dentro do orçamento de tokens (só colunas relevantes em datasets largos)
+    ctx = build_prompt_context(question, hint, memory.dataset_id, profile, memory.recent_turns(k=HISTORY_TURNS))
+    result, cache_key = answer_without_llm(question, memory, hint, profile, llm_model, temperature, use_cache)
+    reuse = None
+    if result is None and use_cache:
+        reuse = find_reusable_code(question, memory, hint)
+    return ctx, result, cache_key, reuse
+
+def _save_bullets(memory: DatasetMemory, critic_text: str) -> None:
+    # um único commit para todos os bullets do crítico
+    with memory.batch():
+        for bullet in critic_bullets(critic_text):
+            memory.add_conclusion(bullet)
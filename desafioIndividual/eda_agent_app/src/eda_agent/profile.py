@@ -0,0 +1,268 @@
+from __future__ import annotations
+import os, json, math, re, threading, unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from .state import CACHE_DIR
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+HIST_BINS = 10
+TOP_K = 5
+MAX_CORR_COLS = 50
+PROFILE_VERSION = 1
+
+_profiles: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+def profile_path(dataset_id: str) -> str:
+    return os.path.join(CACHE_DIR, f"{dataset_id}.profile.json")
+
+def _num(v) -> Optional[float]:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(f) or math.isinf(f) else f
+
+def compute_profile(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Perfil do dataset calculado em uma passada vetorizada por estatística:
+    nulos, cardinalidade, min/max/média/desvio, quantis, histogramas, top-k e correlação.
+    """
+    num_cols = list(df.select_dtypes(include="number").columns)
+    nulls = df.isna().sum()
+    uniques = df.nunique(dropna=True)
+
+    stats = pd.DataFrame()
+    quants = pd.DataFrame()
+    if num_cols:
+        stats = df[num_cols].agg(["min", "max", "mean", "std"])
+        quants = df[num_cols].quantile(QUANTILES)
+
+    columns: Dict[str, Dict[str, Any]] = {}
+    for c in df.columns:
+        col = df[c]
+        info: Dict[str, Any] = {
+            "dtype": str(col.dtype),
+            "nulls": int(nulls[c]),
+            "unique": int(uniques[c]),
+        }
+        if c in num_cols:
+            info.update({k: _num(stats.at[k, c]) for k in ["min", "max", "mean", "std"]})
+            info["quantiles"] = {str(q): _num(quants.at[q, c]) for q in QUANTILES}
+            values = col.to_numpy(dtype="float64", na_value=np.nan)
+            values = values[np.isfinite(values)]
+            if values.size:
+                counts, edges = np.histogram(values, bins=HIST_BINS)
+                info["histogram"] = {"counts": counts.tolist(), "edges": [float(e) for e in edges]}
+        elif pd.api.types.is_datetime64_any_dtype(col.dtype):
+            if col.notna().any():
+                info["min"], info["max"] = str(col.min()), str(col.max())
+        else:
+            top = col.value_counts(dropna=True).head(TOP_K)
+            info["top"] = [[str(k), int(v)] for k, v in top.items()]
+        columns[str(c)] = info
+
+    corr: Dict[str, Dict[str, Optional[float]]] = {}
+    corr_cols = num_cols[:MAX_CORR_COLS]
+    if len(corr_cols) >= 2:
+        m = df[corr_cols].corr()
+        corr = {str(a): {str(b): _num(m.at[a, b]) for b in corr_cols} for a in corr_cols}
+
+    return {
+        "version": PROFILE_VERSION,
+        "rows": int(len(df)),
+        "cols": int(df.shape[1]),
+        "columns": columns,
+        "corr": corr,
+    }
+
+def get_profile(dataset_id: str, df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Perfil cacheado por dataset_id (memória do processo + JSON em CACHE_DIR).
+    """
+    with _lock:
+        if dataset_id in _profiles:
+            return _profiles[dataset_id]
+    path = profile_path(dataset_id)
+    prof = None
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                prof = json.load(f)
+            if prof.get("version") != PROFILE_VERSION:
+                prof = None
+        except (OSError, ValueError):
+            prof = None
+    if prof is None:
+        prof = compute_profile(df)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(prof, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    with _lock:
+        _profiles[dataset_id] = prof
+    return prof
+
+def invalidate_profile(dataset_id: Optional[str] = None) -> int:
+    """
+    Descarta perfis cacheados (memória e JSON) de um dataset (ou todos). Retorna quantos saíram.
+    """
+    with _lock:
+        ids = [k for k in _profiles if dataset_id is None or k == dataset_id]
+        for k in ids:
+            _profiles.pop(k, None)
+    names = [f"{dataset_id}.profile.json"] if dataset_id else [
+        n for n in os.listdir(CACHE_DIR) if n.endswith(".profile.json")]
+    for name in names:
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except OSError:
+            pass
+    return len(ids)
+
+def _fmt(v) -> str:
+    if v is None:
+        return "NA"
+    if isinstance(v, float):
+        return f"{v:.6g}"
+    return str(v)
+
+def top_correlations(profile: Dict[str, Any], k: int = 5, min_abs: float = 0.5) -> List[tuple]:
+    pairs = []
+    cols = list(profile.get("corr", {}))
+    for i, a in enumerate(cols):
+        for b in cols[i + 1:]:
+            r = profile["corr"][a].get(b)
+            if r is not None and abs(r) >= min_abs:
+                pairs.append((a, b, r))
+    return sorted(pairs, key=lambda p: -abs(p[2]))[:k]
+
+def compact_profile(profile: Dict[str, Any], columns: Optional[Iterable[str]] = None) -> str:
+    """
+    Versão textual compacta do perfil para os prompts (uma linha por coluna).
+    """
+    wanted = set(columns) if columns is not None else None
+    lines = [f"{profile['rows']} linhas × {profile['cols']} colunas"]
+    for name, info in profile["columns"].items():
+        if wanted is not None and name not in wanted:
+            continue
+        parts = [f"nulos={info['nulls']}", f"únicos={info['unique']}"]
+        if "mean" in info:
+            q = info.get("quantiles", {})
+            parts += [f"min={_fmt(info['min'])}", f"média={_fmt(info['mean'])}",
+                      f"mediana={_fmt(q.get('0.5'))}", f"max={_fmt(info['max'])}",
+                      f"dp={_fmt(info['std'])}"]
+        elif "min" in info:
+            parts += [f"min={info['min']}", f"max={info['max']}"]
+        elif info.get("top"):
+            parts.append("top=" + ", ".join(f"{v}({n})" for v, n in info["top"][:3]))
+        lines.append(f"- {name} ({info['dtype']}): " + "; ".join(parts))
+    corr = top_correlations(profile)
+    if wanted is not None:
+        corr = [(a, b, r) for a, b, r in corr if a in wanted and b in wanted]
+    if corr:
+        lines.append("Correlações fortes: " + "; ".join(f"{a}~{b}={r:.2f}" for a, b, r in corr))
+    return "\n".join(lines)
+
+# =========================
+# Respostas diretas a partir do perfil (sem LLM e sem exec)
+# =========================
+def _fold(text: str) -> str:
+    s = unicodedata.normalize("NFKD", text or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(s.casefold().split())
+
+# pedidos que exigem código (gráficos, agrupamentos, filtros) nunca são respondidos pelo perfil
+_COMPLEX = re.compile(
+    r"\b(grafico|histograma|boxplot|plot|scatter|dispersao|distribuicao|correlac\w*|outlier\w*|"
+    r"agrup\w*|por|compar\w*|filtr\w*|onde|quando|tendencia|evolucao|regressao|previs\w*|"
+    r"acima|abaixo|maior que|menor que|igual|entre|exceto|excluindo|sem|apenas|somente)\b"
+)
+_STATS = [
+    ("mean", "média", re.compile(r"\bmedias?\b")),
+    ("median", "mediana", re.compile(r"\bmedianas?\b")),
+    ("std", "desvio padrão", re.compile(r"\bdesvios?( padrao)?\b")),
+    ("min", "mínimo", re.compile(r"\b(minimo|min|menor valor)\b")),
+    ("max", "máximo", re.compile(r"\b(maximo|max|maior valor)\b")),
+    ("nulls", "valores nulos", re.compile(r"\b(nulos?|ausentes?|faltantes?|missing)\b")),
+    ("unique", "valores únicos", re.compile(r"\b(unicos?|distintos?|cardinalidade)\b")),
+]
+
+_TYPES = re.compile(r"\btipos? (de dados|das colunas|de cada coluna|das variaveis)\b|\bdtypes?\b")
+_SHAPE = re.compile(r"\b(quantas linhas|numero de linhas|quantos registros|dimensoes|tamanho do dataset|shape)\b")
+# palavras que não restringem a pergunta; qualquer outra sobra ("dos homens", "em 2020",
+# um valor de categoria) indica filtro e a pergunta vai para o codegen
+_STOPWORDS = frozenset("""
+a o as os um uma de da do das dos em na no nas nos e qual quais quanto quanta quantos quantas
+que sao ha tem existe existem me diga mostre mostra calcule calcula informe liste lista exiba
+favor coluna colunas variavel variaveis campo campos valor valores dataset dados base
+tabela arquivo todo toda todos todas geral total cada
+""".split())
+
+def _match_columns(q: str, profile: Dict[str, Any]) -> List[str]:
+    found = []
+    for name in profile["columns"]:
+        f = _fold(name)
+        if f and re.search(rf"(?<!\w){re.escape(f)}(?!\w)", q):
+            found.append(name)
+    # prefere nomes mais longos ("idade_mae" em vez de "idade" quando ambos casam)
+    found.sort(key=len, reverse=True)
+    out = []
+    for name in found:
+        if not any(_fold(name) in _fold(o) for o in out):
+            out.append(name)
+    return out
+
+def _stat_value(info: Dict[str, Any], key: str):
+    if key == "median":
+        return info.get("quantiles", {}).get("0.5")
+    return info.get(key)
+
+def _leftover(q: str, cols: List[str]) -> List[str]:
+    rest = q
+    for name in cols:
+        rest = re.sub(rf"(?<!\w){re.escape(_fold(name))}(?!\w)", " ", rest)
+    for rx in [_TYPES, _SHAPE] + [rx for _, _, rx in _STATS]:
+        rest = rx.sub(" ", rest)
+    return [t for t in re.findall(r"\w+", rest) if t not in _STOPWORDS]
+
+def answer_from_profile(question: str, profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Responde perguntas simples (tipos, dimensões, nulos, estatísticas de uma coluna)
+    diretamente do perfil. Retorna None quando a pergunta precisa de código.
+    """
+    q = _fold(question)
+    if not q or _COMPLEX.search(q):
+        return None
+    cols = _match_columns(q, profile)
+    # só responde se a pergunta não cita nada além de uma coluna e estatísticas
+    if _leftover(q, cols):
+        return None
+
+    text = None
+    if _TYPES.search(q):
+        lines = [f"- `{c}`: {i['dtype']}" for c, i in profile["columns"].items()]
+        text = f"O dataset tem {profile['cols']} colunas com os seguintes tipos:\n" + "\n".join(lines)
+    elif _SHAPE.search(q):
+        text = f"O dataset tem {profile['rows']} linhas e {profile['cols']} colunas."
+    else:
+        stats = [(key, label) for key, label, rx in _STATS if rx.search(q)]
+        if not stats:
+            return None
+        if not cols and stats == [("nulls", "valores nulos")]:
+            lines = [f"- `{c}`: {i['nulls']}" for c, i in profile["columns"].items() if i["nulls"]]
+            text = ("Valores nulos por coluna:\n" + "\n".join(lines)) if lines else "Nenhuma coluna possui valores nulos."
+        elif len(cols) == 1:
+            info = profile["columns"][cols[0]]
+            parts = []
+            for key, label in stats:
+                value = _stat_value(info, key)
+                if value is None and key not in {"nulls", "unique"}:
+                    return None  # estatística numérica em coluna não numérica
+                parts.append(f"{label} = {_fmt(value)}")
+            text = f"Coluna `{cols[0]}` ({info['dtype']}): " + "; ".join(parts) + "."
+        else:
+            return None
+
+    return {"code": "", "text": text, "stdout": "", "images": [], "source": "profile"}
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import os, re, math, threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from .profile import compact_profile, _fold
+from .metrics import span
+
+# acima deste número de colunas, o prompt leva só as colunas relevantes à pergunta
+WIDE_COLUMNS = int(os.environ.get("EDA_AGENT_WIDE_COLUMNS", "60"))
+TOP_COLUMNS = int(os.environ.get("EDA_AGENT_TOP_COLUMNS", "30"))
+# orçamento (tokens) para schema + perfil + histórico em cada prompt
+PROMPT_TOKEN_BUDGET = int(os.environ.get("EDA_AGENT_PROMPT_TOKENS", "4000"))
+HISTORY_TURNS = 5
+MIN_COLUMNS = 5
+
+_STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "na", "no", "nas", "nos", "um", "uma",
+    "para", "por", "com", "sem", "qual", "quais", "que", "como", "entre", "me", "mostre", "se", "ha",
+    "existe", "existem", "valor", "valores", "coluna", "colunas", "dataset", "dados", "the", "of", "and",
+}
+
+# =========================
+# Contagem de tokens (tiktoken quando o vocabulário está disponível; senão ~4 chars/token)
+# =========================
+_encoder: Any = None
+_encoder_lock = threading.Lock()
+
+def count_tokens(text: str) -> int:
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding("o200k_base")
+            except Exception:  # sem pacote ou sem rede para baixar o vocabulário
+                _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text or "", disallowed_special=()))
+    return (len(text or "") + 3) // 4
+
+# =========================
+# Índice léxico/fuzzy de colunas
+# =========================
+def _tokens(text: str) -> List[str]:
+    # separa camelCase, snake_case, kebab e dígitos: "cpuTemp_max2" → cpu temp max 2
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    return [t for t in re.findall(r"[a-z]+|\d+", _fold(text)) if t not in _STOPWORDS]
+
+def _spaced(text: str) -> str:
+    # forma normalizada para busca de nomes inteiros: " cpu temp 12 "
+    return " " + " ".join(re.findall(r"[a-z0-9]+", _fold(text))) + " "
+
+def _trigrams(token: str) -> set:
+    t = f"#{token}#"
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+class ColumnIndex:
+    """
+    Índice das colunas de um dataset: tokens do nome (peso cheio), valores frequentes das
+    colunas categóricas e trigramas para casar grafias aproximadas.
+    """
+    def __init__(self, profile: Dict[str, Any]):
+        self.columns: List[str] = list(profile["columns"])
+        self.spaced = {c: _spaced(c) for c in self.columns}
+        self.name_postings: Dict[str, set] = defaultdict(set)
+        self.value_postings: Dict[str, set] = defaultdict(set)
+        for c, info in profile["columns"].items():
+            toks = _tokens(c)
+            # forma colada ("fanspeed") para perguntas que juntam as palavras do nome
+            joined = "".join(t for t in toks if not t.isdigit())
+            for t in set(toks) | ({joined} if joined else set()):
+                self.name_postings[t].add(c)
+            for v, _ in info.get("top", [])[:5]:
+                for t in _tokens(str(v)):
+                    if len(t) > 2:
+                        self.value_postings[t].add(c)
+        n = max(1, len(self.columns))
+        self.idf = {t: math.log(1 + n / len(cols)) for t, cols in self.name_postings.items()}
+        self.trigram_vocab: Dict[str, set] = defaultdict(set)
+        for t in self.name_postings:
+            for g in _trigrams(t):
+                self.trigram_vocab[g].add(t)
+
+    def _fuzzy(self, token: str, min_sim: float = 0.5) -> List[Tuple[str, float]]:
+        grams = _trigrams(token)
+        shared: Dict[str, int] = defaultdict(int)
+        for g in grams:
+            for t in self.trigram_vocab.get(g, ()):
+                shared[t] += 1
+        out = []
+        for t, k in shared.items():
+            sim = k / (len(grams) + len(_trigrams(t)) - k)
+            if sim >= min_sim and t != token:
+                out.append((t, sim))
+        return out
+
+    def _score(self, text: str, weight: float, scores: Dict[str, float]) -> None:
+        spaced = _spaced(text)
+        for c, sc in self.spaced.items():
+            if len(sc) > 4 and sc in spaced:
+                scores[c] += 10 * weight  # nome citado literalmente
+        tokens = set(_tokens(text))
+        digits = {t for t in tokens if t.isdigit()}
+        for token in tokens - digits:
+            if token in self.name_postings:
+                for c in self.name_postings[token]:
+                    scores[c] += 3 * weight * self.idf[token]
+            else:
+                for t, sim in self._fuzzy(token):
+                    for c in self.name_postings[t]:
+                        scores[c] += 2 * weight * sim * self.idf[t]
+            for c in self.value_postings.get(token, ()):
+                scores[c] += 3 * weight
+        # números ("12", "0.9") só desempatam colunas já casadas por nome: "cpu temp 12" → cpuTemp_12
+        for token in digits & self.name_postings.keys():
+            for c in self.name_postings[token]:
+                if scores.get(c, 0.0) > 0:
+                    scores[c] += weight * self.idf[token]
+
+    def rank(self, question: str, context: str = "") -> List[str]:
+        """
+        Todas as colunas, das mais às menos relevantes para a pergunta (o histórico recente
+        pesa menos). Empates mantêm a ordem original do dataset.
+        """
+        scores: Dict[str, float] = defaultdict(float)
+        self._score(question, 1.0, scores)
+        if context:
+            self._score(context, 0.3, scores)
+        order = {c: i for i, c in enumerate(self.columns)}
+        return sorted(self.columns, key=lambda c: (-scores.get(c, 0.0), order[c]))
+
+_indexes: "OrderedDict[str, ColumnIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def get_column_index(dataset_id: str, profile: Dict[str, Any]) -> ColumnIndex:
+    with _indexes_lock:
+        idx = _indexes.get(dataset_id)
+        if idx is None:
+            idx = ColumnIndex(profile)
+            _indexes[dataset_id] = idx
+            while len(_indexes) > 8:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(dataset_id)
+        return idx
+
+# =========================
+# Orçamento de tokens do prompt
+# =========================
+def _narrow_schema(hint: Dict[str, Any], selected: List[str]) -> Dict[str, Any]:
+    return {
+        "columns": selected,
+        "dtypes": {c: hint["dtypes"][c] for c in selected},
+        "total_columns": len(hint["columns"]),
+        "omitted_columns": len(hint["columns"]) - len(selected),
+        "note": "Schema parcial (colunas mais relevantes à pergunta); 'df' contém todas as colunas.",
+    }
+
+def _fit_history(turns: List[Dict[str, Any]], budget: int, max_chars: int = 600) -> Tuple[str, int]:
+    # turnos mais recentes primeiro, até o orçamento acabar; saída em ordem cronológica
+    kept, used = [], 0
+    for t in reversed(turns):
+        q = (t.get("question") or "").strip()
+        a = (t.get("result_text") or "").strip()
+        if not (q or a):
+            continue
+        if len(a) > max_chars:
+            a = a[:max_chars] + "…"
+        line = f"- Pergunta: {q}\n  Conclusão: {a}"
+        cost = count_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return ("\n".join(reversed(kept)) if kept else "Nenhum histórico relevante."), len(kept)
+
+def build_prompt_context(question: str, hint: Dict[str, Any], dataset_id: str, profile: Dict[str, Any],
+                         turns: List[Dict[str, Any]], budget: int = PROMPT_TOKEN_BUDGET) -> Dict[str, Any]:
+    """
+    Schema, perfil e histórico que cabem no orçamento de tokens. Em datasets largos só entram
+    as colunas mais relevantes à pergunta (e ao histórico recente); o código gerado continua
+    vendo todas via 'df'. Retorna {"schema", "profile", "history", "columns", "tokens"}.
+    """
+    with span("prompt_context", columns=len(hint["columns"])) as sp:
+        selected: Optional[List[str]] = None
+        if len(hint["columns"]) > WIDE_COLUMNS:
+            recent = " ".join(f"{t.get('question', '')} {t.get('result_text', '')}" for t in turns[-2:])
+            ranked = get_column_index(dataset_id, profile).rank(question, recent)
+            k = TOP_COLUMNS
+            while True:
+                selected = ranked[:k]
+                schema = _narrow_schema(hint, selected)
+                profile_text = compact_profile(profile, selected)
+                used = count_tokens(str(schema)) + count_tokens(profile_text)
+                if used <= budget * 2 // 3 or k <= MIN_COLUMNS:
+                    break
+                k = max(MIN_COLUMNS, k // 2)
+        else:
+            schema = hint
+            profile_text = compact_profile(profile)
+            used = count_tokens(str(schema)) + count_tokens(profile_text)
+        history, n_turns = _fit_history(turns[-HISTORY_TURNS:], max(0, budget - used))
+        tokens = used + count_tokens(history)
+        sp.record(selected=len(selected) if selected is not None else len(hint["columns"]),
+                  turns=n_turns, tokens=tokens)
+    return {"schema": schema, "profile": profile_text, "history": history, "columns": selected, "tokens": tokens}
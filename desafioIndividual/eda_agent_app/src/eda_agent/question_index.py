@@ -0,0 +1,105 @@
+from __future__ import annotations
+import os, re, math, threading, unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+REUSE_ENABLED = os.environ.get("EDA_AGENT_REUSE", "1").strip().lower() not in {"0", "false", "no"}
+# similaridade de cosseno mínima (n-gramas de caracteres, TF-IDF) para reaproveitar código
+REUSE_THRESHOLD = float(os.environ.get("EDA_AGENT_REUSE_THRESHOLD", "0.6"))
+
+# termos equivalentes em perguntas de EDA → forma canônica
+_SYNONYMS = [
+    (r"\b(distribuicao|distribuicoes)\b", "histograma"),
+    (r"\b(valores? (ausentes?|faltantes?|nulos?)|missing|faltantes?|ausentes?)\b", "nulos"),
+    (r"\b(valores? atipicos?|anomalias?|outliers?)\b", "outliers"),
+    (r"\b(diagrama de caixa|box ?plot)\b", "boxplot"),
+    (r"\b(grafico de dispersao|dispersao|scatter ?plot|scatter)\b", "dispersao"),
+    (r"\b(correlacao|correlacoes|relacao|relacionamento)\b", "correlacao"),
+    (r"\b(promedio|average|mean)\b", "media"),
+]
+_STOPWORDS = {
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "na", "no", "um", "uma", "para", "com",
+    "qual", "quais", "que", "me", "mostre", "mostrar", "exiba", "exibir", "plote", "gere", "gerar", "faca",
+    "crie", "calcule", "calcular", "ver", "coluna", "colunas", "variavel", "grafico", "favor",
+}
+# palavras que mudam o resultado: precisam coincidir para reaproveitar ("acima" ≠ "abaixo")
+_GUARD_WORDS = {"maior", "menor", "maiores", "menores", "acima", "abaixo", "sem", "exceto", "excluindo", "nao",
+                "apenas", "somente", "top", "primeiros", "ultimos", "crescente", "decrescente", "por", "ano",
+                "mes", "dia", "media", "mediana", "soma", "total", "contagem", "minimo", "maximo", "desvio"}
+
+def fold(text: str) -> str:
+    s = unicodedata.normalize("NFKD", text or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(re.findall(r"[a-z0-9]+", s.casefold()))
+
+def canonical(text: str) -> str:
+    s = fold(text)
+    for rx, repl in _SYNONYMS:
+        s = re.sub(rx, repl, s)
+    return " ".join(w for w in s.split() if w not in _STOPWORDS)
+
+def _ngrams(text: str) -> Counter:
+    t = f" {text} "
+    return Counter(t[i:i + n] for n in (3, 4, 5) for i in range(len(t) - n + 1))
+
+def _signature(folded: str, text: str, columns: Iterable[str]) -> Tuple[FrozenSet[str], FrozenSet[str], FrozenSet[str]]:
+    # colunas citadas, números e palavras de filtro/agregação precisam ser os mesmos
+    spaced = f" {folded} "
+    words = set(text.split())
+    cols = frozenset(c for c in columns if c and f" {c} " in spaced)
+    return cols, frozenset(w for w in words if w.isdigit()), frozenset(words & _GUARD_WORDS)
+
+class QuestionIndex:
+    """
+    Índice TF-IDF de n-gramas de caracteres (3–5) sobre as perguntas já respondidas de um
+    dataset, atualizado a cada turno. Funciona offline e tolera acentos e reformulações.
+    """
+    def __init__(self, max_docs: int = 50):
+        self.max_docs = max_docs
+        self.docs: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.doc_freq: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, turn_id: int, question: str, code: str) -> None:
+        if not (question or "").strip() or not (code or "").strip():
+            return  # respostas do perfil (sem código) não são reaproveitáveis
+        text = canonical(question)
+        grams = _ngrams(text)
+        with self._lock:
+            if turn_id in self.docs:
+                return
+            self.docs[turn_id] = {"question": question, "folded": fold(question), "text": text,
+                                  "code": code, "grams": grams}
+            self.doc_freq.update(grams.keys())
+            while len(self.docs) > self.max_docs:
+                _, old = self.docs.popitem(last=False)
+                self.doc_freq.subtract(old["grams"].keys())
+            self.doc_freq = +self.doc_freq  # descarta contagens zeradas
+
+    def _vector(self, grams: Counter, n_docs: int) -> Dict[str, float]:
+        vec = {g: (1 + math.log(c)) * (math.log((n_docs + 1) / (self.doc_freq.get(g, 0) + 1)) + 1)
+               for g, c in grams.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {g: v / norm for g, v in vec.items()}
+
+    def search(self, question: str, columns: Iterable[str] = (),
+               threshold: float = REUSE_THRESHOLD) -> Optional[Dict[str, Any]]:
+        """
+        Turno mais parecido acima do limiar e com a mesma assinatura (colunas, números,
+        filtros). Retorna {"turn_id", "question", "code", "score"} ou None.
+        """
+        text = canonical(question)
+        folded_cols = [fold(c) for c in columns]
+        sig = _signature(fold(question), text, folded_cols)
+        with self._lock:
+            docs = list(self.docs.items())
+            q = self._vector(_ngrams(text), len(docs))
+            best = None
+            for turn_id, d in reversed(docs):  # empate: o turno mais recente
+                if _signature(d["folded"], d["text"], folded_cols) != sig:
+                    continue
+                v = self._vector(d["grams"], len(docs))
+                score = sum(w * v.get(g, 0.0) for g, w in q.items())
+                if score >= threshold and (best is None or score > best["score"]):
+                    best = {"turn_id": turn_id, "question": d["question"], "code": d["code"], "score": score}
+        return best
@@ -0,0 +1,171 @@
+from __future__ import annotations
+import os, io, hashlib, shutil, uuid
+from typing import List, Optional
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.collections import PathCollection
+from .state import CACHE_DIR
+from .metrics import span
+
+RENDER_FORMAT = os.environ.get("EDA_AGENT_RENDER_FORMAT", "png").strip().lower()  # png | webp | jpeg
+RENDER_DPI = int(os.environ.get("EDA_AGENT_RENDER_DPI", "100"))
+# acima disto, scatters viram hexbin e linhas são decimadas (min/max por faixa de pixels)
+MAX_POINTS = int(os.environ.get("EDA_AGENT_RENDER_MAX_POINTS", "50000"))
+FIGURE_CACHE_DIR = os.path.join(CACHE_DIR, "figures")
+FIGURE_CACHE_MAX_MB = float(os.environ.get("EDA_AGENT_FIGURE_CACHE_MB", "256"))
+
+_QUALITY = {"jpeg": {"quality": 85}, "webp": {"quality": 80}}
+
+# =========================
+# Agregação de artistas grandes
+# =========================
+def _hexbin_scatter(ax, coll: PathCollection) -> None:
+    offsets = np.asarray(coll.get_offsets())
+    x, y = offsets[:, 0], offsets[:, 1]
+    coll.remove()
+    ax.hexbin(x, y, gridsize=120, mincnt=1, bins="log", cmap="viridis")
+    ax.set_title((ax.get_title() + "\n" if ax.get_title() else "") +
+                 f"(agregado em hexbin: {len(x):,} pontos)", fontsize="small")
+
+def _decimate_line(line, target: int) -> None:
+    # envelope min/max por bloco: preserva picos e forma visual com ~2*target pontos
+    x, y = (np.asarray(a) for a in line.get_data())
+    if y.dtype.kind not in "biuf":
+        return  # eixo y categórico/texto: sem envelope numérico
+    y = y.astype("float64")
+    n = len(y)
+    block = int(np.ceil(n / target))
+    m = (n // block) * block
+    if block < 2 or m == 0:
+        return
+    yb = y[:m].reshape(-1, block)
+    base = np.arange(0, m, block)
+    i_min = base + np.nanargmin(np.where(np.isnan(yb), np.inf, yb), axis=1)
+    i_max = base + np.nanargmax(np.where(np.isnan(yb), -np.inf, yb), axis=1)
+    idx = np.unique(np.concatenate([i_min, i_max, np.arange(m, n)]))
+    line.set_data(x[idx], y[idx])
+
+def aggregate_oversized(fig, max_points: int = MAX_POINTS) -> int:
+    """
+    Troca artistas gigantes por versões agregadas. Retorna quantos artistas foram alterados.
+    """
+    changed = 0
+    for ax in fig.get_axes():
+        for coll in list(ax.collections):
+            if isinstance(coll, PathCollection) and len(coll.get_offsets()) > max_points:
+                _hexbin_scatter(ax, coll)
+                changed += 1
+        for line in list(ax.get_lines()):
+            xdata = line.get_xdata()
+            if len(xdata) <= max_points:
+                continue
+            numeric = all(np.asarray(a).dtype.kind in "biuf" for a in line.get_data())
+            if numeric and line.get_linestyle() in ("None", "", " ", "none"):
+                # plot(x, y, "o") é um scatter disfarçado
+                offsets = np.column_stack(line.get_data())
+                line.remove()
+                coll = ax.scatter(offsets[:, 0], offsets[:, 1])
+                _hexbin_scatter(ax, coll)
+            else:
+                xs = np.asarray(xdata)
+                if xs.dtype.kind in "iuf" and np.all(np.diff(xs) >= 0):
+                    _decimate_line(line, target=max_points // 2)
+                line.set_rasterized(True)
+            changed += 1
+    return changed
+
+# =========================
+# Codificação e cache
+# =========================
+def _format() -> str:
+    fmt = "jpeg" if RENDER_FORMAT in {"jpg", "jpeg"} else RENDER_FORMAT
+    return fmt if fmt in {"png", "webp", "jpeg"} else "png"
+
+def encode_figure(fig, fmt: str = "png", dpi: int = RENDER_DPI) -> bytes:
+    buf = io.BytesIO()
+    kwargs = {"pil_kwargs": _QUALITY[fmt]} if fmt in _QUALITY else {}
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches="tight", **kwargs)
+    plt.close(fig)
+    return buf.getvalue()
+
+def _cache_dir(dataset_id: str, code: str, fmt: str, dpi: int) -> str:
+    code_hash = hashlib.sha256(code.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(FIGURE_CACHE_DIR, f"{dataset_id}-{code_hash}-{fmt}-{dpi}")
+
+def _cache_get(path: str, n: int) -> Optional[List[bytes]]:
+    try:
+        names = sorted(os.listdir(path))
+    except OSError:
+        return None
+    if len(names) != n:  # código não determinístico gerou outra quantidade de figuras
+        return None
+    out = []
+    for name in names:
+        with open(os.path.join(path, name), "rb") as f:
+            out.append(f.read())
+    os.utime(path)
+    return out
+
+def _cache_put(path: str, images: List[bytes]) -> None:
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(tmp)
+        for i, img in enumerate(images):
+            with open(os.path.join(tmp, f"fig_{i:03d}.bin"), "wb") as f:
+                f.write(img)
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    _evict()
+
+def _evict() -> None:
+    entries = []
+    for e in os.scandir(FIGURE_CACHE_DIR):
+        if e.is_dir() and not e.name.endswith(".tmp"):
+            size = sum(f.stat().st_size for f in os.scandir(e.path))
+            entries.append((e.stat().st_mtime, size, e.path))
+    total = sum(size for _, size, _ in entries)
+    budget = FIGURE_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+def clear_figure_cache() -> None:
+    shutil.rmtree(FIGURE_CACHE_DIR, ignore_errors=True)
+
+def render_figures(figs, dataset_id: Optional[str] = None, code: Optional[str] = None,
+                   fmt: Optional[str] = None, dpi: int = RENDER_DPI) -> List[bytes]:
+    """
+    Codifica as figuras (agregando artistas grandes). Com dataset_id e código,
+    reaproveita imagens já codificadas para a mesma combinação; o chamador só passa
+    dataset_id para snippets determinísticos.
+    """
+    fmt = fmt or _format()
+    if not figs:
+        return []
+    with span("render", figures=len(figs), format=fmt) as sp:
+        cache_path = _cache_dir(dataset_id, code, fmt, dpi) if dataset_id and code else None
+        if cache_path is not None:
+            cached = _cache_get(cache_path, len(figs))
+            sp.record(cache_hit=cached is not None)
+            if cached is not None:
+                for fig in figs:
+                    plt.close(fig)
+                return cached
+
+        for fig in figs:
+            aggregate_oversized(fig)
+            plt.close(fig)  # desacopla do pyplot; a figura continua renderizável
+        # em série: o matplotlib não é thread-safe (cache de fontes, layout de texto, Agg);
+        # o paralelismo vem dos processos do pool, cada um com seu matplotlib
+        images = [encode_figure(fig, fmt, dpi) for fig in figs]
+
+        if cache_path is not None:
+            os.makedirs(FIGURE_CACHE_DIR, exist_ok=True)
+            _cache_put(cache_path, images)
+        return images
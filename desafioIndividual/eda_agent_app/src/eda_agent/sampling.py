@@ -0,0 +1,36 @@
+from __future__ import annotations
+import os, threading
+from collections import OrderedDict
+from typing import Tuple
+import pandas as pd
+
+PREVIEW_ROWS = int(os.environ.get("EDA_AGENT_PREVIEW_ROWS", "50000"))
+PROGRESSIVE_ENABLED = os.environ.get("EDA_AGENT_PROGRESSIVE", "1").strip().lower() not in {"0", "false", "no"}
+_MAX_SAMPLES = 8
+
+_samples: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+_lock = threading.Lock()
+
+def wants_preview(df: pd.DataFrame, n: int = PREVIEW_ROWS) -> bool:
+    # só compensa quando a amostra é bem menor que o frame completo
+    return PROGRESSIVE_ENABLED and len(df) > 2 * n
+
+def sample_id(dataset_id: str, n: int = PREVIEW_ROWS) -> str:
+    return f"{dataset_id}-s{n}"
+
+def get_sample(dataset_id: str, df: pd.DataFrame, n: int = PREVIEW_ROWS) -> Tuple[str, pd.DataFrame]:
+    """
+    Amostra aleatória uniforme (semente fixa, ordem original preservada), construída uma
+    vez por dataset_id e reaproveitada entre perguntas. Retorna (id da amostra, amostra).
+    """
+    sid = sample_id(dataset_id, n)
+    with _lock:
+        if sid in _samples:
+            _samples.move_to_end(sid)
+            return sid, _samples[sid]
+    sample = df if len(df) <= n else df.sample(n=n, random_state=0).sort_index()
+    with _lock:
+        _samples[sid] = sample
+        while len(_samples) > _MAX_SAMPLES:
+            _samples.popitem(last=False)
+    return sid, sample
@@ -0,0 +1,180 @@
+from __future__ import annotations
+import os, atexit, shutil, threading, weakref, uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from .state import CACHE_DIR
+from .dataset_store import has_dataset, store_path
+
+FRAMES_DIR = os.path.join(CACHE_DIR, "frames")
+WORKER_FRAME_SLOTS = int(os.environ.get("EDA_AGENT_WORKER_FRAMES", "2"))
+
+# =========================
+# Lado do processo principal: materialização + contagem de referências
+# =========================
+_refs: Dict[str, int] = {}
+_lock = threading.Lock()
+_swept = False
+
+def frame_path(dataset_id: str) -> str:
+    # um subdiretório por processo: arquivos de processos que morreram são reconhecíveis
+    return os.path.join(FRAMES_DIR, str(os.getpid()), f"{dataset_id}.arrow")
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def sweep_orphans() -> int:
+    """
+    Remove frames deixados por processos que terminaram sem o atexit (ex.: crash, SIGKILL).
+    Retorna quantas entradas saíram.
+    """
+    if os.name != "posix":
+        return 0  # os.kill(pid, 0) não é uma sonda no Windows
+    try:
+        entries = list(os.scandir(FRAMES_DIR))
+    except OSError:
+        return 0
+    removed = 0
+    for e in entries:
+        if e.is_dir() and e.name.isdigit() and _pid_alive(int(e.name)):
+            continue
+        if e.is_dir():
+            shutil.rmtree(e.path, ignore_errors=True)
+        else:
+            try:
+                os.remove(e.path)
+            except OSError:
+                continue
+        removed += 1
+    return removed
+
+def materialize(dataset_id: str, df) -> Optional[str]:
+    """
+    Grava o DataFrame uma única vez como Arrow IPC (sem compressão, mapeável em memória).
+    Retorna None se o frame não puder ser convertido para Arrow (ex.: colunas object mistas).
+    Se o dataset já está no store persistente, cria um hard link para aquele arquivo: a
+    evicção do store não apaga o que os workers estão lendo.
+    """
+    global _swept
+    path = frame_path(dataset_id)
+    if os.path.exists(path):
+        return path
+    with _lock:
+        sweep, _swept = not _swept, True
+    if sweep:
+        sweep_orphans()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if has_dataset(dataset_id):
+        try:
+            os.link(store_path(dataset_id), path)
+        except FileExistsError:
+            return path
+        except OSError:
+            pass  # store evictado agora ou outro sistema de arquivos: grava a cópia abaixo
+        else:
+            return path
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        table = pa.Table.from_pandas(df)
+    except Exception:
+        return None
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+    return path
+
+def acquire(dataset_id: str, df) -> Optional[str]:
+    path = materialize(dataset_id, df)
+    if path is not None:
+        with _lock:
+            _refs[dataset_id] = _refs.get(dataset_id, 0) + 1
+    return path
+
+def release(dataset_id: str) -> None:
+    with _lock:
+        n = _refs.get(dataset_id, 0) - 1
+        if n > 0:
+            _refs[dataset_id] = n
+            return
+        _refs.pop(dataset_id, None)
+    # workers percebem a remoção e descartam o frame mapeado no próximo job;
+    # o arquivo do store persistente (se houver) não é afetado
+    try:
+        os.remove(frame_path(dataset_id))
+    except OSError:
+        pass
+
+class DatasetLease:
+    """
+    Mantém o arquivo Arrow de um dataset vivo enquanto alguma sessão o usa.
+    Liberado explicitamente (release) ou quando a sessão é coletada pelo GC.
+    """
+    def __init__(self, dataset_id: str, df):
+        self.dataset_id = dataset_id
+        self.path = acquire(dataset_id, df)
+        self._finalizer = weakref.finalize(self, release, dataset_id) if self.path else None
+
+    def release(self) -> None:
+        if self._finalizer is not None:
+            self._finalizer()
+
+def frame_ref(dataset_id: Optional[str], df) -> Tuple[str, Any, Any]:
+    # referência enviada ao worker: caminho do arquivo compartilhado (só datasets com lease,
+    # que é quem remove o arquivo depois) ou o próprio frame (pickle)
+    if dataset_id:
+        with _lock:
+            leased = dataset_id in _refs
+        path = frame_path(dataset_id)
+        if leased and os.path.exists(path):
+            return ("shared", dataset_id, path)
+    return ("inline", None, df)
+
+@atexit.register
+def _cleanup_owned() -> None:
+    # frames deste processo (leases não liberados); os de processos mortos saem no sweep
+    shutil.rmtree(os.path.join(FRAMES_DIR, str(os.getpid())), ignore_errors=True)
+
+# =========================
+# Lado do worker: frames mapeados em memória, cacheados por dataset_id
+# =========================
+_mapped: "OrderedDict[str, Tuple[str, Tuple[int, int], Any]]" = OrderedDict()
+
+def _read_mapped(path: str):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+    # split_blocks evita a consolidação; colunas numéricas sem nulos apontam para o mmap
+    return table.to_pandas(split_blocks=True, date_as_object=False)
+
+def resolve_frame(ref: Tuple[str, Any, Any]):
+    kind, dataset_id, value = ref
+    if kind != "shared":
+        return value
+    # descarta frames cujos arquivos foram removidos (dataset sem sessões)
+    for key, (path, _, _) in list(_mapped.items()):
+        if key != dataset_id and not os.path.exists(path):
+            _mapped.pop(key, None)
+    st = os.stat(value)
+    stamp = (st.st_ino, st.st_size)
+    hit = _mapped.get(dataset_id)
+    if hit is not None and hit[0] == value and hit[1] == stamp:
+        _mapped.move_to_end(dataset_id)
+        df = hit[2]
+    else:
+        df = _read_mapped(value)
+        _mapped[dataset_id] = (value, stamp, df)
+        while len(_mapped) > max(1, WORKER_FRAME_SLOTS):
+            _mapped.popitem(last=False)
+    # cópia rasa: com copy-on-write, mutações do job não alteram o frame cacheado
+    return df.copy(deep=False)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+import os, asyncio, contextlib, time, traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import pandas as pd
+from .executor import compile_checked
+from .metrics import span
+from .vectorize import optimize_code
+from .agents.codegen_agent import agenerate_code, arepair_code, vectorize_with_llm
+
+# snippets gerados em paralelo por pergunta (temperaturas crescentes); 1 = geração única
+SPECULATIVE_CANDIDATES = max(1, int(os.environ.get("EDA_AGENT_SPECULATIVE", "1")))
+SPECULATIVE_TEMP_STEP = float(os.environ.get("EDA_AGENT_SPECULATIVE_TEMP_STEP", "0.4"))
+# se todos os candidatos falharem, o erro volta à LLM para uma única rodada de correção
+REPAIR_ENABLED = os.environ.get("EDA_AGENT_REPAIR", "1").strip().lower() not in {"0", "false", "no"}
+_ERROR_CHARS = 1500
+
+# etapas na ordem em que um candidato avança (quanto mais longe, melhor ponto de partida para a correção)
+STAGES = ("geração", "validação", "execução")
+
+Execute = Callable[[str], Awaitable[Dict[str, Any]]]
+
+def candidate_temperatures(base: float, n: int) -> List[float]:
+    return [round(min(1.0, base + i * SPECULATIVE_TEMP_STEP), 2) for i in range(max(1, n))]
+
+def describe_error(error: BaseException) -> str:
+    """
+    Erro em texto para a LLM: tipo, mensagem e a linha do snippet onde ocorreu (execução inline).
+    """
+    text = f"{type(error).__name__}: {error}"
+    lines = [f.lineno for f in traceback.extract_tb(error.__traceback__) if f.filename == "<llm_code>"]
+    if lines:
+        text += f" (linha {lines[-1]} do snippet)"
+    return text[:_ERROR_CHARS]
+
+class CandidateFailure(Exception):
+    def __init__(self, index: int, temperature: float, stage: str, code: str, error: BaseException):
+        super().__init__(f"{stage}: {error}")
+        self.index = index
+        self.temperature = temperature
+        self.stage = stage
+        self.code = code
+        self.error = error
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"candidate": self.index, "temperature": self.temperature, "stage": self.stage,
+                "error": describe_error(self.error)}
+
+class SpeculativeCodegen:
+    """
+    Gera vários snippets em paralelo (temperaturas variadas), valida e executa cada um assim
+    que fica pronto e fica com o primeiro que roda sem erro; os demais são cancelados. Se
+    todos falharem, o erro do candidato que chegou mais longe volta à LLM para uma rodada de
+    correção. Com um candidato só, equivale à geração normal mais a correção.
+
+    execute(code) executa o snippet (pool, inline ou progressivo); com serial_exec, uma
+    execução por vez (pyplot e redirect_stdout são globais no modo inline). limiter, se
+    dado, envolve cada chamada à LLM (ex.: RateLimiter do modo batch).
+    """
+    def __init__(self, question: str, ctx: Dict[str, Any], df: pd.DataFrame, execute: Execute, *,
+                 llm_model: str = "gpt-4o-mini", temperature: float = 0.0,
+                 candidates: int = SPECULATIVE_CANDIDATES, repair: bool = REPAIR_ENABLED,
+                 serial_exec: bool = False, limiter: Optional[Any] = None,
+                 on_token: Optional[Callable[[str], None]] = None):
+        self.question, self.ctx, self.df = question, ctx, df
+        self.execute = execute
+        self.llm_model, self.temperature = llm_model, temperature
+        self.candidates = max(1, candidates)
+        self.repair = repair
+        self.limiter = limiter
+        self.on_token = on_token
+        self._exec_lock = asyncio.Lock() if serial_exec else None
+        self._seen: set = set()
+        self.attempts: List[Dict[str, Any]] = []
+        self.repaired_from: Optional[Dict[str, Any]] = None
+        self.timings: Dict[str, float] = {}
+
+    async def _llm(self, make: Callable[[], Awaitable[Any]], timings: Dict[str, float]) -> Any:
+        t0 = time.perf_counter()
+        async with (self.limiter or contextlib.nullcontext()):
+            timings["espera_llm"] = timings.get("espera_llm", 0.0) + time.perf_counter() - t0
+            return await make()
+
+    async def _run(self, code: str) -> Dict[str, Any]:
+        if self._exec_lock is None:
+            return await self.execute(code)
+        async with self._exec_lock:
+            return await self.execute(code)
+
+    async def _attempt(self, index: int, temperature: float,
+                       generate: Callable[[], Awaitable[str]]) -> Optional[Dict[str, Any]]:
+        """
+        Gera → análise de custo → validação AST → execução. Devolve o vencedor, None se o
+        snippet repete um já tentado, ou levanta CandidateFailure com a etapa que falhou.
+        """
+        timings: Dict[str, float] = {}
+        stage, code = STAGES[0], ""
+        try:
+            t0 = time.perf_counter()
+            code = await self._llm(generate, timings)
+            timings["codegen"] = time.perf_counter() - t0 - timings.get("espera_llm", 0.0)
+            # a análise de custo (CPU) roda fora do limitador; só a eventual devolução à LLM
+            # (vetorização) ocupa uma vaga
+            loop = asyncio.get_running_loop()
+
+            def _regenerate(c: str, findings: List[Dict[str, Any]]) -> str:
+                return asyncio.run_coroutine_threadsafe(self._llm(lambda: asyncio.to_thread(
+                    vectorize_with_llm, c, findings, self.llm_model, temperature), timings), loop).result()
+
+            t0 = time.perf_counter()
+            code, audit = await asyncio.to_thread(optimize_code, code, len(self.df), _regenerate)
+            timings["vectorize"] = time.perf_counter() - t0
+            stage = STAGES[1]
+            await asyncio.to_thread(compile_checked, code)
+            if code in self._seen:
+                return None  # mesmo snippet de outro candidato: já está sendo executado
+            self._seen.add(code)
+            stage = STAGES[2]
+            t0 = time.perf_counter()
+            exec_result = await self._run(code)
+            timings["execute"] = time.perf_counter() - t0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            raise CandidateFailure(index, temperature, stage, code, e) from e
+        return {"code": code, "audit": audit, "exec_result": exec_result, "candidate": index,
+                "temperature": temperature, "timings": timings}
+
+    def _candidate(self, index: int, temperature: float) -> Awaitable[Optional[Dict[str, Any]]]:
+        ctx = self.ctx
+        # só o primeiro candidato transmite tokens; o código vencedor é mostrado no fim
+        on_token = self.on_token if index == 0 else None
+        return self._attempt(index, temperature, lambda: agenerate_code(
+            self.question, ctx["schema"], ctx["profile"], ctx["history"],
+            llm_model=self.llm_model, temperature=temperature, on_token=on_token))
+
+    async def _race(self, temperatures: List[float]) -> tuple:
+        tasks = {asyncio.ensure_future(self._candidate(i, t)): i for i, t in enumerate(temperatures)}
+        winner, failures = None, []
+        try:
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=tasks.get):
+                    error = task.exception()
+                    if isinstance(error, CandidateFailure):
+                        failures.append(error)
+                    elif error is not None:
+                        raise error
+                    elif winner is None and task.result() is not None:
+                        winner = task.result()
+        finally:
+            # LLMs ainda em streaming são canceladas; execuções já iniciadas terminam em segundo plano
+            for task in tasks:
+                task.cancel()
+        return winner, sorted(failures, key=lambda f: f.index)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Retorna {"code", "audit", "exec_result", "candidate", "temperature", "timings",
+        "repaired"}. Se nada der certo (nem a correção), levanta o erro original do candidato
+        que chegou mais longe.
+        """
+        temperatures = candidate_temperatures(self.temperature, self.candidates)
+        with span("codegen.speculative", candidates=len(temperatures)) as sp:
+            winner, failures = await self._race(temperatures)
+            self.attempts = [f.as_dict() for f in failures]
+            repaired, error = False, None
+            if winner is None:
+                # ponto de partida: quem chegou mais longe; empate fica com a menor temperatura
+                best = max(failures, key=lambda f: (STAGES.index(f.stage), -f.index))
+                error = best.error
+                if self.repair and best.code:
+                    self.repaired_from = best.as_dict()
+                    try:
+                        winner = await self._attempt(len(temperatures), self.temperature, lambda: arepair_code(
+                            self.question, self.ctx["schema"], self.ctx["profile"], self.ctx["history"],
+                            best.code, best.stage, describe_error(best.error),
+                            llm_model=self.llm_model, temperature=self.temperature, on_token=self.on_token))
+                    except CandidateFailure as f:
+                        # a falha da correção fica na auditoria; quem chama vê o erro original
+                        self.attempts.append(f.as_dict())
+                    repaired = winner is not None
+            sp.record(failed=len(self.attempts), repaired=repaired,
+                      winner=None if winner is None else winner["candidate"])
+        if winner is None:
+            raise error
+        self.timings = winner["timings"]
+        if winner["candidate"] != 0 and self.on_token is not None:
+            self.on_token(winner["code"])
+        return {**winner, "repaired": repaired}
+
+    def marker(self, winner: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Resumo para a auditoria (None numa geração única que deu certo de primeira).
+        """
+        if self.candidates == 1 and not self.attempts:
+            return None
+        return {"candidates": self.candidates, "winner": winner["candidate"],
+                "temperature": winner["temperature"], "repaired": winner["repaired"],
+                "repaired_from": self.repaired_from, "failures": self.attempts}
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os, threading
+from collections import OrderedDict
+from importlib.util import find_spec
+from typing import Any, Callable, Optional
+import pandas as pd
+from .dataset_store import has_dataset, store_path
+from .shared_frames import frame_path
+from .metrics import span
+
+# motor SQL opcional (DuckDB) exposto ao código gerado como sql("SELECT ... FROM df")
+SQL_ENABLED = (os.environ.get("EDA_AGENT_SQL", "1").strip().lower() not in {"0", "false", "no"}
+               and find_spec("duckdb") is not None)
+SQL_THREADS = int(os.environ.get("EDA_AGENT_SQL_THREADS", str(os.cpu_count() or 1)))
+SQL_MEMORY_MB = int(os.environ.get("EDA_AGENT_SQL_MEMORY_MB", "1024"))
+# resultados maiores que isto indicam falta de agregação no SQL (evita trazer o dataset inteiro ao pandas)
+SQL_MAX_ROWS = int(os.environ.get("EDA_AGENT_SQL_MAX_ROWS", "1000000"))
+_MAX_CONNECTIONS = 2
+
+class _Engine:
+    def __init__(self, con, source: Any):
+        self.con = con
+        self.source = source  # mantém vivo o objeto registrado (tabela Arrow mapeada ou DataFrame)
+        self.lock = threading.Lock()  # conexões DuckDB não são seguras para uso concorrente
+
+_engines: "OrderedDict[Optional[str], _Engine]" = OrderedDict()
+_engines_lock = threading.Lock()
+
+def _columnar_source(dataset_id: Optional[str]) -> Optional[Any]:
+    # cópia colunar já em disco (store persistente ou frame compartilhado do pool): mapeada, sem cópia
+    if not dataset_id:
+        return None
+    for path in (store_path(dataset_id) if has_dataset(dataset_id) else None, frame_path(dataset_id)):
+        if path and os.path.exists(path):
+            try:
+                import pyarrow.feather as feather
+                table = feather.read_table(path, memory_map=True)
+            except Exception:
+                continue
+            # índice não-trivial salvo pelo pandas não é coluna de 'df'
+            return table.drop([c for c in table.column_names if c.startswith("__index_level_")])
+    return None
+
+def _connect(dataset_id: Optional[str], df: Optional[pd.DataFrame]) -> _Engine:
+    import duckdb
+    source = _columnar_source(dataset_id)
+    if source is None:
+        if df is None:
+            raise ValueError("sql() indisponível: nenhum dataset carregado.")
+        source = df
+    con = duckdb.connect(":memory:", config={
+        "enable_external_access": False,  # sem arquivos, rede, ATTACH/COPY ou extensões
+        "autoload_known_extensions": False,
+        "autoinstall_known_extensions": False,
+        "threads": max(1, SQL_THREADS),
+        "memory_limit": f"{SQL_MEMORY_MB}MB",
+    })
+    con.register("df", source)
+    con.execute("SET lock_configuration = true")
+    return _Engine(con, source)
+
+def _engine(dataset_id: Optional[str], df: Optional[pd.DataFrame]) -> _Engine:
+    with _engines_lock:
+        eng = _engines.get(dataset_id) if dataset_id else None
+        if eng is not None:
+            _engines.move_to_end(dataset_id)
+            return eng
+    eng = _connect(dataset_id, df)
+    if not dataset_id:
+        return eng
+    with _engines_lock:
+        if dataset_id in _engines:
+            eng.con.close()
+            return _engines[dataset_id]
+        _engines[dataset_id] = eng
+        while len(_engines) > _MAX_CONNECTIONS:
+            _, old = _engines.popitem(last=False)
+            old.con.close()
+    return eng
+
+def run_sql(dataset_id: Optional[str], df: Optional[pd.DataFrame], query: str) -> pd.DataFrame:
+    """
+    Executa uma única consulta SELECT sobre a tabela 'df' e devolve um DataFrame.
+    """
+    import duckdb
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("sql() espera uma consulta SQL em texto.")
+    eng = _engine(dataset_id, df)
+    with eng.lock, span("sql") as sp:
+        statements = eng.con.extract_statements(query)
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("sql() aceita apenas uma consulta SELECT (somente leitura).")
+        res = eng.con.execute(query)
+        parts, n = [], 0
+        while True:
+            chunk = res.fetch_df_chunk(64)
+            if chunk.empty:
+                break
+            n += len(chunk)
+            if n > SQL_MAX_ROWS:
+                raise ValueError(f"Resultado do sql() excede {SQL_MAX_ROWS:,} linhas; agregue ou filtre na consulta.")
+            parts.append(chunk)
+        sp.record(rows=n)
+    if not parts:
+        return pd.DataFrame(columns=[d[0] for d in res.description or []])
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+def make_sql_helper(dataset_id: Optional[str], df: Optional[pd.DataFrame]) -> Optional[Callable[[str], pd.DataFrame]]:
+    """
+    Função sql(query) para o código gerado, ou None se o DuckDB não estiver disponível.
+    A conexão só é aberta na primeira chamada.
+    """
+    if not SQL_ENABLED:
+        return None
+
+    def sql(query: str) -> pd.DataFrame:
+        return run_sql(dataset_id, df, query)
+    return sql
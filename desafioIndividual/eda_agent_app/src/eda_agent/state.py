@@ -1,70 +1,368 @@
 from __future__ import annotations
-import os, json, hashlib, time
+import os, json, hashlib, time, sqlite3, threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional
+from .metrics import span
+from .question_index import QuestionIndex, fold
 
 CACHE_DIR = os.environ.get("EDA_AGENT_CACHE_DIR", ".cache")
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+MEMORY_DB = os.path.join(CACHE_DIR, "memory.sqlite3")
+MAX_TURNS = 50
+# conclusões com similaridade de Jaccard (bigramas de palavras) acima disto são descartadas
+DEDUP_THRESHOLD = float(os.environ.get("EDA_AGENT_DEDUP_THRESHOLD", "0.8"))
+ROLLING_SUMMARY_KEY = "rolling_summary"
+
 def dataset_id_from_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()[:16]
 
+def dataset_id_from_file(path: str, chunk: int = 8 * 1024 * 1024) -> str:
+    # mesmo id de dataset_id_from_bytes, sem carregar o arquivo inteiro em memória
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+# =========================
+# Armazenamento: SQLite em modo WAL (appends O(1), leitores não bloqueiam escritores,
+# seguro entre sessões/processos). Uma conexão por thread.
+# =========================
+_local = threading.local()
+_question_indexes: Dict[str, QuestionIndex] = {}
+_question_indexes_lock = threading.Lock()
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conclusions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_conclusions_ds ON conclusions(dataset_id, id);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset_id TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    result_text TEXT NOT NULL,
+    code_preview TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_turns_ds ON turns(dataset_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    dataset_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (dataset_id, key)
+);
+CREATE TABLE IF NOT EXISTS migrated (dataset_id TEXT PRIMARY KEY);
+"""
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "db", None) != MEMORY_DB:
+        conn = sqlite3.connect(MEMORY_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _migrate_schema(conn)
+        _local.conn, _local.db, _local.depth = conn, MEMORY_DB, 0
+    return conn
+
+def _migrate_schema(conn: sqlite3.Connection) -> None:
+    # bancos antigos: turns sem a coluna do código completo (necessária para reaproveitar código)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(turns)")}
+    if "code" not in cols:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if "code" not in {r[1] for r in conn.execute("PRAGMA table_info(turns)")}:
+                conn.execute("ALTER TABLE turns ADD COLUMN code TEXT NOT NULL DEFAULT ''")
+                # previews abaixo do limite de corte são o código inteiro
+                conn.execute("UPDATE turns SET code = code_preview WHERE length(code_preview) < 2000")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+@contextmanager
+def _transaction() -> Iterator[sqlite3.Connection]:
+    # transações aninhadas viram uma só (commit no nível mais externo)
+    conn = _conn()
+    if _local.depth > 0:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+    with span("memory.save"):
+        conn.execute("BEGIN IMMEDIATE")
+        _local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            _local.depth = 0
+            conn.execute("ROLLBACK")
+            raise
+        _local.depth = 0
+        conn.execute("COMMIT")
+
+def _legacy_json_path(dataset_id: str) -> str:
+    return os.path.join(CACHE_DIR, f"{dataset_id}.json")
+
+def _migrate_legacy_json(dataset_id: str) -> None:
+    # memórias antigas ({dataset_id}.json) são importadas uma única vez
+    path = _legacy_json_path(dataset_id)
+    if not os.path.exists(path):
+        return
+    with _transaction() as conn:
+        if conn.execute("SELECT 1 FROM migrated WHERE dataset_id=?", (dataset_id,)).fetchone():
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            d = json.load(f)
+        now = int(time.time())
+        conn.executemany(
+            "INSERT INTO conclusions(dataset_id, ts, text) VALUES (?, ?, ?)",
+            [(dataset_id, now, c) for c in d.get("conclusions", [])],
+        )
+        conn.executemany(
+            "INSERT INTO turns(dataset_id, ts, question, result_text, code_preview) VALUES (?, ?, ?, ?, ?)",
+            [(dataset_id, t.get("ts", now), t.get("question", ""), t.get("result_text", ""), t.get("code_preview", ""))
+             for t in d.get("chat_history", [])[-MAX_TURNS:]],
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO summaries(dataset_id, key, value) VALUES (?, ?, ?)",
+            [(dataset_id, k, json.dumps(v, ensure_ascii=False)) for k, v in d.get("summaries", {}).items()],
+        )
+        conn.execute("INSERT INTO migrated(dataset_id) VALUES (?)", (dataset_id,))
+
+def _shingles(text: str) -> frozenset:
+    # texto normalizado (sem acentos/pontuação/markdown) em bigramas de palavras; números contam
+    words = fold(text).split()
+    if len(words) < 2:
+        return frozenset(words)
+    return frozenset(zip(words, words[1:]))
+
 @dataclass
 class DatasetMemory:
     dataset_id: str
     conclusions: List[str] = field(default_factory=list)
     summaries: Dict[str, Any] = field(default_factory=dict)
-    chat_history: List[Dict[str, Any]] = field(default_factory=list)
+    _shingle_cache: Optional[List[frozenset]] = field(default=None, init=False, repr=False, compare=False)
+    # o que este objeto sabe que está no banco: save() grava só a diferença
+    _saved_conclusions: List[str] = field(default_factory=list, init=False, repr=False, compare=False)
+    _saved_summaries: Dict[str, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __init__(self, dataset_id: str, conclusions: Optional[List[str]] = None,
+                 summaries: Optional[Dict[str, Any]] = None,
+                 chat_history: Optional[List[Dict[str, Any]]] = None):
+        # construtor explícito para manter chat_history (agora no banco) como parâmetro
+        self.dataset_id = dataset_id
+        self.conclusions = list(conclusions or [])
+        self.summaries = dict(summaries or {})
+        self._shingle_cache = None
+        self._saved_conclusions = []
+        self._saved_summaries = {}
+        if chat_history is not None:
+            self.chat_history = chat_history
 
     @property
     def path(self) -> str:
-        return os.path.join(CACHE_DIR, f"{self.dataset_id}.json")
+        return MEMORY_DB
 
     @classmethod
     def load(cls, dataset_id: str) -> "DatasetMemory":
-        path = os.path.join(CACHE_DIR, f"{dataset_id}.json")
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                d = json.load(f)
-            return cls(
-                dataset_id=dataset_id,
-                conclusions=d.get("conclusions", []),
-                summaries=d.get("summaries", {}),
-                chat_history=d.get("chat_history", []),
-            )
-        return cls(dataset_id=dataset_id)
+        _migrate_legacy_json(dataset_id)
+        conn = _conn()
+        conclusions = [r[0] for r in conn.execute(
+            "SELECT text FROM conclusions WHERE dataset_id=? ORDER BY id", (dataset_id,))]
+        summaries = {k: json.loads(v) for k, v in conn.execute(
+            "SELECT key, value FROM summaries WHERE dataset_id=?", (dataset_id,))}
+        memory = cls(dataset_id=dataset_id, conclusions=conclusions, summaries=summaries)
+        memory._saved_conclusions = list(conclusions)
+        memory._saved_summaries = dict(summaries)
+        return memory
+
+    @contextmanager
+    def batch(self) -> Iterator["DatasetMemory"]:
+        """
+        Agrupa várias escritas (ex.: bullets do crítico + turno) em um único commit.
+        """
+        with _transaction():
+            yield self
 
     def save(self) -> None:
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "conclusions": self.conclusions,
-                    "summaries": self.summaries,
-                    "chat_history": self.chat_history,
-                },
-                f,
-                ensure_ascii=False,
-                indent=2,
+        # grava só o que mudou desde o load (edições em massa, ex.: remover conclusões); linhas
+        # que outra sessão escreveu nesse meio-tempo (ex.: o resumo acumulado) ficam intactas
+        now = int(time.time())
+        added, removed = list(self.conclusions), []
+        for c in self._saved_conclusions:
+            if c in added:
+                added.remove(c)
+            else:
+                removed.append(c)
+        changed = {k: v for k, v in self.summaries.items()
+                   if k not in self._saved_summaries or self._saved_summaries[k] != v}
+        dropped = [k for k in self._saved_summaries if k not in self.summaries]
+        with _transaction() as conn:
+            conn.executemany(
+                "DELETE FROM conclusions WHERE id = (SELECT id FROM conclusions "
+                "WHERE dataset_id=? AND text=? ORDER BY id LIMIT 1)",
+                [(self.dataset_id, c) for c in removed],
+            )
+            conn.executemany(
+                "INSERT INTO conclusions(dataset_id, ts, text) VALUES (?, ?, ?)",
+                [(self.dataset_id, now, c) for c in added],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO summaries(dataset_id, key, value) VALUES (?, ?, ?)",
+                [(self.dataset_id, k, json.dumps(v, ensure_ascii=False)) for k, v in changed.items()],
+            )
+            conn.executemany(
+                "DELETE FROM summaries WHERE dataset_id=? AND key=?",
+                [(self.dataset_id, k) for k in dropped],
             )
+        self._saved_conclusions = list(self.conclusions)
+        self._saved_summaries = dict(self.summaries)
+        self._shingle_cache = None
 
-    def add_conclusion(self, text: str) -> None:
-        if text and text.strip():
-            self.conclusions.append(text.strip())
-            self.save()
+    def clear_conclusions(self) -> None:
+        # o resumo acumulado cobre as conclusões apagadas: recomeça junto com elas
+        with _transaction() as conn:
+            conn.execute("DELETE FROM conclusions WHERE dataset_id=?", (self.dataset_id,))
+            conn.execute("DELETE FROM summaries WHERE dataset_id=? AND key=?", (self.dataset_id, ROLLING_SUMMARY_KEY))
+        self.conclusions, self._saved_conclusions = [], []
+        self.summaries.pop(ROLLING_SUMMARY_KEY, None)
+        self._saved_summaries.pop(ROLLING_SUMMARY_KEY, None)
+        self._shingle_cache = []
+
+    def is_duplicate(self, text: str) -> bool:
+        """
+        Quase-duplicata de uma conclusão já salva (mesmo texto normalizado ou bigramas muito
+        parecidos). RESULT_TEXT e bullets do crítico costumam repetir o que já foi dito.
+        """
+        if self._shingle_cache is None:
+            self._shingle_cache = [_shingles(c) for c in self.conclusions]
+        new = _shingles(text)
+        if not new:
+            return True
+        for old in self._shingle_cache:
+            if old == new or (old and len(new & old) / len(new | old) >= DEDUP_THRESHOLD):
+                return True
+        return False
+
+    def add_conclusion(self, text: str) -> bool:
+        text = (text or "").strip()
+        if not text or self.is_duplicate(text):
+            return False
+        with _transaction() as conn:
+            conn.execute(
+                "INSERT INTO conclusions(dataset_id, ts, text) VALUES (?, ?, ?)",
+                (self.dataset_id, int(time.time()), text),
+            )
+        self.conclusions.append(text)
+        self._saved_conclusions.append(text)
+        self._shingle_cache.append(_shingles(text))
+        return True
+
+    def conclusions_since(self, conclusion_id: int, limit: int, latest: bool = False) -> List[Dict[str, Any]]:
+        # as `limit` primeiras (ou, com latest, as últimas) conclusões posteriores ao
+        # checkpoint, sempre em ordem cronológica
+        rows = _conn().execute(
+            "SELECT id, text FROM conclusions WHERE dataset_id=? AND id > ? "
+            f"ORDER BY id {'DESC' if latest else 'ASC'} LIMIT ?",
+            (self.dataset_id, conclusion_id, limit),
+        ).fetchall()
+        return [{"id": i, "text": t} for i, t in sorted(rows)]
+
+    def turns_since(self, turn_id: int, limit: int, latest: bool = False) -> List[Dict[str, Any]]:
+        rows = _conn().execute(
+            "SELECT id, question, result_text FROM turns WHERE dataset_id=? AND id > ? "
+            f"ORDER BY id {'DESC' if latest else 'ASC'} LIMIT ?",
+            (self.dataset_id, turn_id, limit),
+        ).fetchall()
+        return [{"id": i, "question": q, "result_text": a} for i, q, a in sorted(rows)]
+
+    def set_summary(self, key: str, value: Any) -> None:
+        with _transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries(dataset_id, key, value) VALUES (?, ?, ?)",
+                (self.dataset_id, key, json.dumps(value, ensure_ascii=False)),
+            )
+        self.summaries[key] = self._saved_summaries[key] = value
 
     # Registrar um turno de conversa
-    def add_turn(self, question: str, result_text: str, code: str) -> None:
-        self.chat_history.append({
-            "ts": int(time.time()),
-            "question": (question or "").strip(),
-            "result_text": (result_text or "").strip(),
-            # armazenar preview do código para não inflar o arquivo
-            "code_preview": (code or "").strip()[:2000],
-        })
-        # manter somente os últimos 50 turnos
-        self.chat_history = self.chat_history[-50:]
-        self.save()
-
-    # Recuperar últimos N turnos
+    def add_turn(self, question: str, result_text: str, code: str, ts: Optional[int] = None) -> None:
+        with _transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO turns(dataset_id, ts, question, result_text, code_preview, code) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self.dataset_id,
+                    int(time.time()) if ts is None else int(ts),
+                    (question or "").strip(),
+                    (result_text or "").strip(),
+                    # preview curto para prompts/histórico; código completo para reaproveitamento
+                    (code or "").strip()[:2000],
+                    (code or "").strip(),
+                ),
+            )
+            # manter somente os últimos 50 turnos
+            conn.execute(
+                "DELETE FROM turns WHERE dataset_id=? AND id <= ("
+                "SELECT id FROM turns WHERE dataset_id=? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.dataset_id, self.dataset_id, MAX_TURNS),
+            )
+        # índice de perguntas: atualização incremental (só se já foi carregado neste processo)
+        idx = _question_indexes.get(self.dataset_id)
+        if idx is not None:
+            idx.add(cur.lastrowid, (question or "").strip(), (code or "").strip())
+
+    def question_index(self) -> QuestionIndex:
+        """
+        Índice de similaridade das perguntas já respondidas (carregado do banco uma vez por processo).
+        """
+        with _question_indexes_lock:
+            idx = _question_indexes.get(self.dataset_id)
+            if idx is None:
+                idx = QuestionIndex(max_docs=MAX_TURNS)
+                for turn_id, q, code in _conn().execute(
+                        "SELECT id, question, code FROM turns WHERE dataset_id=? AND code != '' ORDER BY id",
+                        (self.dataset_id,)):
+                    idx.add(turn_id, q, code)
+                _question_indexes[self.dataset_id] = idx
+            return idx
+
+    def find_similar_turn(self, question: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        return self.question_index().search(question, columns)
+
+    # Recuperar últimos N turnos (consulta indexada, sem ler o histórico inteiro)
     def recent_turns(self, k: int = 5) -> List[Dict[str, Any]]:
-        return self.chat_history[-k:]
+        rows = _conn().execute(
+            "SELECT ts, question, result_text, code_preview FROM turns "
+            "WHERE dataset_id=? ORDER BY id DESC LIMIT ?",
+            (self.dataset_id, k),
+        ).fetchall()
+        return [
+            {"ts": ts, "question": q, "result_text": a, "code_preview": c}
+            for ts, q, a, c in reversed(rows)
+        ]
+
+    @property
+    def chat_history(self) -> List[Dict[str, Any]]:
+        """
+        Últimos turnos salvos (cópia: append na lista não persiste; use add_turn).
+        """
+        return self.recent_turns(MAX_TURNS)
+
+    @chat_history.setter
+    def chat_history(self, turns: List[Dict[str, Any]]) -> None:
+        # compatível com o formato JSON antigo: substitui o histórico, turno a turno via add_turn
+        # (mantendo o ts original de cada turno)
+        with _transaction() as conn:
+            conn.execute("DELETE FROM turns WHERE dataset_id=?", (self.dataset_id,))
+            with _question_indexes_lock:
+                _question_indexes.pop(self.dataset_id, None)
+            for t in list(turns)[-MAX_TURNS:]:
+                self.add_turn(t.get("question", ""), t.get("result_text", ""),
+                              t.get("code") or t.get("code_preview", ""), ts=t.get("ts"))
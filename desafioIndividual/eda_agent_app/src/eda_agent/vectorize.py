@@ -0,0 +1,288 @@
+from __future__ import annotations
+import os, ast
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .metrics import span
+
+# off: não analisa | flag: só registra | rewrite: reescreve o que dá e devolve o resto à LLM
+VECTORIZE_MODE = os.environ.get("EDA_AGENT_VECTORIZE", "rewrite").strip().lower()
+# custo estimado (s) acima do qual padrões não reescritos voltam à LLM para vetorização
+REGENERATE_ABOVE_S = float(os.environ.get("EDA_AGENT_VECTORIZE_MAX_S", "2"))
+
+# custo aproximado por linha do frame (pandas 2.x, CPU comum); ordem de grandeza, não precisão
+_PER_ROW_S = {
+    "iterrows": 40e-6,
+    "index_loop": 20e-6,      # for i in range(len(df)): df.loc[i, ...]
+    "apply_axis1": 15e-6,
+    "itertuples": 1.5e-6,
+    "series_apply": 0.5e-6,   # df["c"].apply(lambda x: ...)
+    "loop_filter": 1e-6,      # ~100 iterações × varredura de uma máscara booleana
+}
+_DESCRIPTIONS = {
+    "iterrows": "laço com iterrows()",
+    "itertuples": "laço com itertuples()",
+    "index_loop": "laço por índice de linha (range(len(df)))",
+    "apply_axis1": "apply(..., axis=1) linha a linha",
+    "series_apply": "apply/map elemento a elemento numa coluna",
+    "loop_filter": "filtragem de df dentro de um laço Python (use groupby)",
+}
+_SAFE_UFUNCS = {"abs", "sqrt", "log", "log1p", "log10", "log2", "exp", "floor", "ceil", "round", "sign", "isnan"}
+
+# =========================
+# Detecção
+# =========================
+def _axis_is_rows(call: ast.Call) -> bool:
+    for kw in call.keywords:
+        if kw.arg == "axis" and isinstance(kw.value, ast.Constant) and kw.value.value in (1, "columns"):
+            return True
+    return False
+
+def _is_column(node: ast.AST) -> bool:
+    # df["col"]: recebedor que é, com segurança, uma Series
+    return (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)
+            and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str))
+
+def _target_names(target: ast.AST) -> set:
+    return {n.id for n in ast.walk(target) if isinstance(n, ast.Name)}
+
+class _CostVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.findings: List[Dict[str, Any]] = []
+
+    def _add(self, pattern: str, node: ast.AST) -> None:
+        self.findings.append({"pattern": pattern, "line": getattr(node, "lineno", 0)})
+
+    def visit_For(self, node: ast.For):
+        it = node.iter
+        if isinstance(it, ast.Call) and isinstance(it.func, ast.Attribute) and it.func.attr in ("iterrows", "itertuples"):
+            self._add(it.func.attr, node)
+        elif (isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == "range"
+              and any(isinstance(a, ast.Call) and isinstance(a.func, ast.Name) and a.func.id == "len" for a in it.args)):
+            self._add("index_loop", node)
+        # máscara booleana que depende da variável do laço: df[df[c] == v] a cada iteração
+        names = _target_names(node.target)
+        for sub in (n for stmt in node.body for n in ast.walk(stmt) if isinstance(n, ast.Subscript)):
+            cmp = [n for n in ast.walk(sub.slice) if isinstance(n, ast.Compare)]
+            if any(isinstance(n, ast.Name) and n.id in names for c in cmp for n in ast.walk(c)):
+                self._add("loop_filter", node)
+                break
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        f = node.func
+        if isinstance(f, ast.Attribute) and f.attr == "apply" and _axis_is_rows(node):
+            self._add("apply_axis1", node)
+        elif (isinstance(f, ast.Attribute) and f.attr in ("apply", "map") and _is_column(f.value)
+              and node.args and isinstance(node.args[0], ast.Lambda)):
+            self._add("series_apply", node)
+        self.generic_visit(node)
+
+def analyze(tree: ast.AST, n_rows: int) -> List[Dict[str, Any]]:
+    """
+    Padrões lentos conhecidos, com custo estimado a partir de len(df).
+    """
+    v = _CostVisitor()
+    v.visit(tree)
+    for f in v.findings:
+        f["estimated_s"] = round(_PER_ROW_S[f["pattern"]] * n_rows, 3)
+        f["detail"] = _DESCRIPTIONS[f["pattern"]]
+    return v.findings
+
+# =========================
+# Reescrita de lambdas simples
+# =========================
+_BOOL_METHODS = ("isna", "notna", "isnull", "notnull")
+
+def _is_boolean(node: ast.AST) -> bool:
+    # só o que é booleano por construção: em colunas numéricas, not/and/or viram ~/&/|, que são bit a bit
+    if isinstance(node, ast.Compare):
+        return True
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, bool)
+    if isinstance(node, ast.BoolOp):
+        return all(_is_boolean(v) for v in node.values)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return _is_boolean(node.operand)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        return node.func.attr in _BOOL_METHODS
+    return False
+
+def _vectorize_expr(node: ast.AST, param: str, row_of: Optional[ast.AST], value_of: Optional[ast.AST]) -> Optional[ast.AST]:
+    """
+    Traduz o corpo de uma lambda elemento a elemento para a forma vetorizada.
+    row_of: frame de apply(axis=1) (r["c"] → df["c"]); value_of: Series de apply/map (x → df["c"]).
+    Retorna None se houver qualquer construção não suportada.
+    """
+    rec = lambda n: _vectorize_expr(n, param, row_of, value_of)
+    if isinstance(node, ast.Constant):
+        return node
+    if isinstance(node, ast.Name):
+        if node.id == param:
+            return value_of  # None quando o parâmetro é uma linha inteira
+        return node
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == param:
+        if row_of is None or not (isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)):
+            return None
+        return ast.Subscript(value=row_of, slice=node.slice, ctx=ast.Load())
+    if isinstance(node, ast.BinOp):
+        left, right = rec(node.left), rec(node.right)
+        return None if left is None or right is None else ast.BinOp(left=left, op=node.op, right=right)
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not) and not _is_boolean(node.operand):
+            return None
+        operand = rec(node.operand)
+        if operand is None:
+            return None
+        op = ast.Invert() if isinstance(node.op, ast.Not) else node.op
+        return ast.UnaryOp(op=op, operand=operand)
+    if isinstance(node, ast.Compare):
+        if len(node.ops) != 1 or not isinstance(node.ops[0], (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)):
+            return None
+        left, right = rec(node.left), rec(node.comparators[0])
+        return None if left is None or right is None else ast.Compare(left=left, ops=node.ops, comparators=[right])
+    if isinstance(node, ast.BoolOp):
+        if not all(_is_boolean(v) for v in node.values):
+            return None  # ex.: "x or 0" não é "col | 0"; fica para a LLM
+        parts = [rec(v) for v in node.values]
+        if any(p is None for p in parts):
+            return None
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        out = parts[0]
+        for p in parts[1:]:
+            out = ast.BinOp(left=out, op=op, right=p)
+        return out
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = rec(node.test), rec(node.body), rec(node.orelse)
+        if test is None or body is None or orelse is None:
+            return None
+        base = row_of if row_of is not None else value_of
+        where = ast.Call(func=ast.Attribute(value=ast.Name(id="np", ctx=ast.Load()), attr="where", ctx=ast.Load()),
+                         args=[test, body, orelse], keywords=[])
+        index = ast.Attribute(value=base, attr="index", ctx=ast.Load())
+        return ast.Call(func=ast.Attribute(value=ast.Name(id="pd", ctx=ast.Load()), attr="Series", ctx=ast.Load()),
+                        args=[where], keywords=[ast.keyword(arg="index", value=index)])
+    if isinstance(node, ast.Call) and not node.keywords:
+        f = node.func
+        ok = ((isinstance(f, ast.Name) and f.id in ("abs", "round"))
+              or (isinstance(f, ast.Attribute) and isinstance(f.value, ast.Name) and f.value.id == "np"
+                  and f.attr in _SAFE_UFUNCS))
+        if not ok:
+            return None
+        args = [rec(a) for a in node.args]
+        return None if any(a is None for a in args) else ast.Call(func=f, args=args, keywords=[])
+    return None
+
+def _uses_param(node: ast.AST, param: str) -> bool:
+    return any(isinstance(n, ast.Name) and n.id == param for n in ast.walk(node))
+
+def _rewrite_call(call: ast.Call) -> Optional[Tuple[str, ast.AST]]:
+    f = call.func
+    if not (isinstance(f, ast.Attribute) and call.args and isinstance(call.args[0], ast.Lambda)):
+        return None
+    lam = call.args[0]
+    if len(call.args) != 1 or len(lam.args.args) != 1 or lam.args.vararg or lam.args.kwarg:
+        return None
+    param = lam.args.args[0].arg
+    if not _uses_param(lam.body, param):
+        return None
+    if f.attr == "apply" and _axis_is_rows(call) and isinstance(f.value, ast.Name):
+        if len(call.keywords) != 1:
+            return None  # raw=, result_type=... mudam a semântica
+        new = _vectorize_expr(lam.body, param, row_of=f.value, value_of=None)
+        return ("apply_axis1", new) if new is not None else None
+    if f.attr in ("apply", "map") and _is_column(f.value) and not call.keywords:
+        new = _vectorize_expr(lam.body, param, row_of=None, value_of=f.value)
+        return ("series_apply", new) if new is not None else None
+    return None
+
+def _splice(code: str, edits: List[Tuple[ast.AST, str]]) -> str:
+    # substitui só os trechos reescritos (preserva comentários e formatação); offsets do AST são em bytes UTF-8
+    lines = code.encode("utf-8").splitlines(keepends=True)
+    starts = [0]
+    for line in lines:
+        starts.append(starts[-1] + len(line))
+    buf = code.encode("utf-8")
+    for node, text in sorted(edits, key=lambda e: (e[0].lineno, e[0].col_offset), reverse=True):
+        a = starts[node.lineno - 1] + node.col_offset
+        b = starts[node.end_lineno - 1] + node.end_col_offset
+        buf = buf[:a] + text.encode("utf-8") + buf[b:]
+    return buf.decode("utf-8")
+
+def rewrite(code: str, tree: ast.AST) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Reescreve apply/map com lambdas simples (aritmética, comparações, and/or, if/else,
+    ufuncs do numpy) para expressões vetorizadas. Retorna o código novo e as trocas feitas.
+    """
+    edits, done = [], []
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, ast.Call):
+            res = _rewrite_call(node)
+            if res is not None:
+                pattern, new = res
+                text = "(" + ast.unparse(ast.fix_missing_locations(new)) + ")"
+                edits.append((node, text))
+                done.append({"pattern": pattern, "line": node.lineno, "before": ast.get_source_segment(code, node),
+                             "after": text})
+                continue  # não desce em chamadas já substituídas
+        todo.extend(ast.iter_child_nodes(node))
+    return (_splice(code, edits) if edits else code), done
+
+# =========================
+# Orquestração
+# =========================
+Regenerate = Callable[[str, List[Dict[str, Any]]], str]
+
+def optimize_code(code: str, n_rows: int, regenerate: Optional[Regenerate] = None,
+                  mode: str = VECTORIZE_MODE) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Passo de custo antes da execução: detecta padrões lentos, reescreve os simples e, se o
+    custo estimado restante passar de REGENERATE_ABOVE_S, pede à LLM uma versão vetorizada.
+    Retorna (código final, decisões para a auditoria).
+    """
+    if mode == "off":
+        return code, []
+    try:
+        tree = ast.parse(code, mode="exec")
+    except SyntaxError:
+        return code, []  # o executor reporta o erro de sintaxe
+    with span("vectorize", rows=n_rows) as sp:
+        findings = analyze(tree, n_rows)
+        if not findings:
+            return code, []
+        if mode == "flag":
+            return code, [{**f, "action": "sinalizado"} for f in findings]
+
+        audit: List[Dict[str, Any]] = []
+        code, rewritten = rewrite(code, tree)
+        for r in rewritten:
+            audit.append({**r, "action": "vetorizado", "detail": _DESCRIPTIONS[r["pattern"]],
+                          "estimated_s": round(_PER_ROW_S[r["pattern"]] * n_rows, 3)})
+        remaining = analyze(ast.parse(code), n_rows) if rewritten else findings
+        cost = sum(f["estimated_s"] for f in remaining)
+        if remaining and regenerate is not None and cost > REGENERATE_ABOVE_S:
+            new_code, accepted = "", False
+            try:
+                new_code = regenerate(code, remaining)
+                accepted = sum(f["estimated_s"] for f in analyze(ast.parse(new_code), n_rows)) < cost
+            except SyntaxError:
+                pass
+            for f in remaining:
+                audit.append({**f, "action": "regenerado pela LLM" if accepted else "mantido (regeneração sem ganho)"})
+            if accepted:
+                code = new_code
+        else:
+            for f in remaining:
+                audit.append({**f, "action": "mantido (custo aceitável)"})
+        sp.record(findings=len(findings), rewritten=len(rewritten), estimated_s=cost)
+    audit.sort(key=lambda a: a.get("line", 0))
+    return code, audit
+
+def format_audit(audit: List[Dict[str, Any]]) -> str:
+    lines = []
+    for a in audit:
+        line = f"- linha {a.get('line', '?')}: {a.get('detail', a.get('pattern'))} • ~{a.get('estimated_s', 0):.2f}s estimados • {a.get('action')}"
+        if a.get("before") and a.get("after"):
+            line += f"\n  `{a['before']}` → `{a['after']}`"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+import os, time, queue, atexit, threading
+import multiprocessing as mp
+from typing import Any, Callable, Dict, Optional
+from .shared_frames import frame_ref
+from .executor import result_key, memo_get, memo_put
+
+# "inline" executa no próprio processo do Streamlit; "pool" usa workers isolados
+EXEC_MODE = os.environ.get("EDA_AGENT_EXEC_MODE", "inline").strip().lower()
+POOL_SIZE = int(os.environ.get("EDA_AGENT_POOL_SIZE", str(max(1, min(4, os.cpu_count() or 1)))))
+JOB_TIMEOUT_S = float(os.environ.get("EDA_AGENT_JOB_TIMEOUT_S", "60"))
+JOB_MEMORY_MB = int(os.environ.get("EDA_AGENT_JOB_MEMORY_MB", "2048"))
+
+def _address_space_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+def _cpu_seconds(resource) -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+def _set_memory_cap(resource, memory_mb: Optional[int]) -> None:
+    # teto (soft) = espaço já mapeado (imports + frame do dataset) + orçamento do job;
+    # o limite hard fica intacto para que o próximo job possa reajustar o teto
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = hard
+    if memory_mb and memory_mb > 0:
+        soft = _address_space_bytes() + memory_mb * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+    except (ValueError, OSError):
+        pass
+
+def _worker_main(conn, memory_mb: int) -> None:
+    # imports pesados acontecem uma única vez, antes do primeiro job
+    import resource
+    import pandas as pd
+    import numpy as np
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from .executor import run_generated_code
+    from .shared_frames import resolve_frame
+
+    # frames compartilhados (mmap) são reaproveitados entre jobs; CoW isola as mutações
+    pd.set_option("mode.copy_on_write", True)
+
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        if msg is None:
+            break
+        code, ref, dataset_id, notify = msg
+        t0, cpu0 = time.perf_counter(), _cpu_seconds(resource)
+        df = None
+        try:
+            _set_memory_cap(resource, None)
+            df = resolve_frame(ref)
+            _set_memory_cap(resource, memory_mb)
+            # o memo de resultados fica no processo pai (compartilhado entre workers)
+            # com notify, RESULT_TEXT/stdout vão para o pai antes da codificação das figuras
+            on_text = (lambda text, stdout: conn.send(("text", (text, stdout), None))) if notify else None
+            out = run_generated_code(code, extra_globals={"pd": pd, "np": np, "plt": plt, "df": df},
+                                     dataset_id=dataset_id, memo=False, on_text=on_text)
+            status, payload = "ok", out
+        except BaseException as e:  # noqa: BLE001 - o erro volta para o processo pai
+            plt.close("all")
+            status, payload = "error", e
+        usage = {
+            "wall_s": time.perf_counter() - t0,
+            "cpu_s": _cpu_seconds(resource) - cpu0,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "pid": os.getpid(),
+        }
+        del df, ref
+        try:
+            conn.send((status, payload, usage))
+        except Exception:  # exceção não serializável
+            conn.send(("error", RuntimeError(f"{type(payload).__name__}: {payload}"), usage))
+        if isinstance(payload, MemoryError):
+            break  # heap possivelmente fragmentado; o pai substitui o worker
+
+class _Worker:
+    def __init__(self, ctx, memory_mb: int):
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child_conn, memory_mb), daemon=True)
+        self.proc.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> None:
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise TimeoutError("Worker de execução não inicializou a tempo.")
+        self.conn.recv()
+        self.ready = True
+
+    def kill(self) -> None:
+        try:
+            self.proc.kill()
+            self.proc.join(timeout=5)
+        except Exception:
+            pass
+        self.conn.close()
+
+class WorkerPool:
+    """
+    Pool de processos pré-inicializados (pandas/numpy/matplotlib já importados, backend Agg).
+    Cada job tem timeout de parede e teto de memória (RLIMIT_AS); workers mortos são
+    substituídos de forma transparente. Chamadas concorrentes rodam em paralelo, uma por worker.
+    """
+    def __init__(self, size: int = POOL_SIZE, timeout_s: float = JOB_TIMEOUT_S,
+                 memory_mb: int = JOB_MEMORY_MB):
+        self.size = max(1, size)
+        self.timeout_s = timeout_s
+        self.memory_mb = memory_mb
+        self._ctx = mp.get_context("spawn")  # fork não é seguro com as threads do Streamlit
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._closed = False
+        self.replaced = 0
+        for _ in range(self.size):
+            self._idle.put(_Worker(self._ctx, self.memory_mb))
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        worker.kill()
+        self.replaced += 1
+        return _Worker(self._ctx, self.memory_mb)
+
+    def run(self, code: str, df, timeout_s: Optional[float] = None,
+            dataset_id: Optional[str] = None,
+            on_text: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """
+        Com dataset_id de um dataset com lease ativo (DatasetLease), o worker mapeia o arquivo
+        Arrow compartilhado em vez de receber o frame via pickle. on_text(texto, stdout) é
+        chamado nesta thread quando o snippet termina, antes da codificação das figuras.
+        """
+        if self._closed:
+            raise RuntimeError("Pool de execução encerrado.")
+        timeout_s = self.timeout_s if timeout_s is None else timeout_s
+        key = result_key(code, dataset_id, df)
+        if key is not None:
+            hit = memo_get(key)
+            if hit is not None:
+                return hit
+        ref = frame_ref(dataset_id, df)
+        worker = self._idle.get()
+        try:
+            worker.wait_ready(timeout=120)
+            worker.conn.send((code, ref, dataset_id, on_text is not None))
+            deadline = time.monotonic() + timeout_s
+            while True:
+                finished = worker.conn.poll(max(0.0, deadline - time.monotonic()))
+                if not finished:
+                    break
+                status, payload, usage = worker.conn.recv()
+                if status != "text":
+                    break
+                on_text(*payload)
+            if finished:
+                if isinstance(payload, MemoryError):
+                    # o worker sai do loop após MemoryError; troca por um novo
+                    worker = self._replace(worker)
+            else:
+                worker = self._replace(worker)
+        except TimeoutError:
+            # worker que nunca ficou pronto não volta para a fila; os próximos jobs usam um novo
+            worker = self._replace(worker)
+            raise
+        except (EOFError, ConnectionError):
+            # worker morto (ex.: OOM killer, sinal); substitui e reporta
+            worker = self._replace(worker)
+            raise RuntimeError("O processo de execução foi encerrado inesperadamente (limite de memória?).")
+        finally:
+            self._idle.put(worker)
+
+        if not finished:
+            raise TimeoutError(f"Execução do código gerado excedeu {timeout_s:.0f}s e foi interrompida.")
+        if status != "ok":
+            if isinstance(payload, MemoryError):
+                raise MemoryError(f"Código gerado excedeu o limite de memória ({self.memory_mb} MB).")
+            raise payload
+        if key is not None:
+            memo_put(key, payload)
+        payload["usage"] = usage
+        return payload
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                w = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                w.conn.send(None)
+            except Exception:
+                pass
+            w.kill()
+
+_POOL: Optional[WorkerPool] = None
+_POOL_LOCK = threading.Lock()
+
+def get_worker_pool() -> WorkerPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = WorkerPool()
+            atexit.register(_POOL.close)
+        return _POOL
@@ -0,0 +1,5 @@
+import os, tempfile
+
+# memória/caches do agente num diretório temporário (antes de importar src.eda_agent)
+os.environ.setdefault("EDA_AGENT_CACHE_DIR", tempfile.mkdtemp(prefix="eda-agent-tests-"))
+os.environ.setdefault("EDA_AGENT_METRICS", "0")
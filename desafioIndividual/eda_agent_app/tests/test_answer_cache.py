@@ -0,0 +1,44 @@
+import pytest
+
+from src.eda_agent.answer_cache import AnswerCache, answer_key, normalize_question
+
+SCHEMA = {"columns": ["a", "b"], "dtypes": {"a": "int64", "b": "float64"}, "n_rows": 10}
+
+
+def test_normalize_question_ignores_case_spacing_and_final_punctuation():
+    assert normalize_question("  Qual a MÉDIA   de a?? ") == normalize_question("qual a média de a")
+    assert normalize_question("média de a") != normalize_question("média de b")
+
+
+def test_answer_key_changes_with_dataset_schema_model_and_temperature():
+    base = answer_key("ds1", "Média de a?", SCHEMA, "gpt-4o-mini", 0.0)
+    assert base == answer_key("ds1", "média de a", SCHEMA, "gpt-4o-mini", 0)
+    assert base != answer_key("ds2", "média de a", SCHEMA, "gpt-4o-mini", 0.0)
+    assert base != answer_key("ds1", "média de a", {**SCHEMA, "columns": ["a", "c"]}, "gpt-4o-mini", 0.0)
+    assert base != answer_key("ds1", "média de a", SCHEMA, "gpt-4o", 0.0)
+    assert base != answer_key("ds1", "média de a", SCHEMA, "gpt-4o-mini", 0.7)
+
+
+def test_put_get_roundtrip_and_lru_eviction(tmp_path):
+    cache = AnswerCache(root=str(tmp_path), max_bytes=3000)
+    assert cache.get("k0") is None
+    cache.put("k0", {"code": "x = 1", "text": "1", "images": [b"\x89PNG" + b"0" * 100]})
+    hit = cache.get("k0")
+    assert hit["text"] == "1" and hit["images"] == [b"\x89PNG" + b"0" * 100]
+    for i in range(1, 6):
+        cache.put(f"k{i}", {"code": "y", "text": "t", "images": [b"1" * 1000]})
+    assert cache.get("k1") is None  # mais antigo sai primeiro
+    assert cache.get("k5") is not None
+    assert cache.evictions > 0
+
+
+def test_stats_track_size_without_scanning_the_directory(tmp_path, monkeypatch):
+    AnswerCache(root=str(tmp_path)).put("old", {"code": "x", "images": [b"0" * 500]})
+    cache = AnswerCache(root=str(tmp_path))  # entradas existentes contadas uma vez, na criação
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] > 500
+    monkeypatch.setattr(AnswerCache, "_entries", lambda self: pytest.fail("varreu o diretório"))
+    cache.put("new", {"code": "y", "images": [b"1" * 700]})
+    cache.put("new", {"code": "y", "images": [b"1" * 100]})  # sobrescrita não conta em dobro
+    stats = cache.stats()
+    on_disk = sum(f.stat().st_size for f in tmp_path.rglob("*") if f.is_file())
+    assert stats["entries"] == 2 and stats["bytes"] == on_disk
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pandas as pd
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.eda_agent import batch
+from src.eda_agent.agents import codegen_agent
+from src.eda_agent.batch import BatchRunner, RateLimiter
+
+CODE = "```python\nplt.plot(df['a'])\nRESULT_TEXT = 'soma=' + str(int(df['a'].sum()))\n```"
+
+
+def _fake_llms(monkeypatch):
+    monkeypatch.setattr(codegen_agent, "build_llm", lambda *a, **k: FakeListChatModel(responses=[CODE]))
+
+    async def fake_critic(*, question, **kwargs):
+        return f"- crítica: {question}"
+
+    monkeypatch.setattr(batch, "astream_critic", fake_critic)
+
+
+def test_rate_limiter_spaces_calls_per_minute():
+    async def go():
+        limiter = RateLimiter(concurrency=4, rpm=600)  # uma chamada a cada 0.1s
+        starts = []
+
+        async def call():
+            async with limiter:
+                starts.append(time.monotonic())
+
+        await asyncio.gather(*(call() for _ in range(4)))
+        return sorted(starts)
+
+    starts = asyncio.run(go())
+    assert starts[-1] - starts[0] >= 0.25
+
+
+def test_runner_answers_in_question_order(monkeypatch):
+    _fake_llms(monkeypatch)
+    df = pd.DataFrame({"a": range(10)})
+    report = BatchRunner(df, "test-batch-inline", exec_mode="inline", use_cache=False,
+                         candidates=1).run(["some a coluna a", "total de a"])
+    items = report["items"]
+    assert [it["n"] for it in items] == [1, 2]
+    assert all(it["text"] == "soma=45" and it["images"] for it in items)
+    assert items[1]["critic"] == "- crítica: total de a"
+    assert report["meta"]["errors"] == 0 and report["meta"]["exec_mode"] == "inline"
+    assert all("total" in it["timings"] for it in items)
+
+
+def test_failed_question_is_reported_not_raised(monkeypatch):
+    _fake_llms(monkeypatch)
+    monkeypatch.setattr(codegen_agent, "build_llm",
+                        lambda *a, **k: FakeListChatModel(responses=["```python\nRESULT_TEXT = df['zzz']\n```"]))
+    report = BatchRunner(pd.DataFrame({"a": [1, 2]}), "test-batch-error", exec_mode="inline",
+                         use_cache=False, enable_critic=False, candidates=1).run(["coluna zzz"])
+    item = report["items"][0]
+    assert item["origin"] == "erro" and "KeyError" in item["error"]
+    assert report["meta"]["errors"] == 1
+
+
+def test_main_writes_markdown_report(monkeypatch, tmp_path):
+    _fake_llms(monkeypatch)
+    csv = tmp_path / "dados.csv"
+    pd.DataFrame({"a": range(10), "b": list("xy") * 5}).to_csv(csv, index=False)
+    questions = tmp_path / "perguntas.txt"
+    questions.write_text("# comentário\nsome a coluna a\n\n", encoding="utf-8")
+    out = tmp_path / "rel.md"
+    try:
+        code = batch.main([str(csv), str(questions), "--out", str(out), "--exec", "inline",
+                           "--no-cache", "--candidates", "1", "--fail-on-error"])
+    finally:
+        pd.reset_option("mode.copy_on_write")  # main() liga copy-on-write globalmente
+    text = out.read_text(encoding="utf-8")
+    assert code == 0
+    assert "## 1. some a coluna a" in text and "soma=45" in text and "crítica: some a coluna a" in text
+    assert list((tmp_path / "rel_files").iterdir())
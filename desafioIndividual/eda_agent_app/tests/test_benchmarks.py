@@ -0,0 +1,31 @@
+from benchmarks import run
+from src.eda_agent import profile, render
+
+
+def test_cold_iterations_do_not_reuse_profile_or_figure_caches(tmp_path, monkeypatch):
+    calls = {"profile": 0, "encode": 0}
+    compute, encode = profile.compute_profile, render.encode_figure
+
+    def counting_profile(df):
+        calls["profile"] += 1
+        return compute(df)
+
+    def counting_encode(*args, **kwargs):
+        calls["encode"] += 1
+        return encode(*args, **kwargs)
+
+    monkeypatch.setattr(profile, "compute_profile", counting_profile)
+    monkeypatch.setattr(render, "encode_figure", counting_encode)
+    frames = run.bench_ingest([(2_000, 10)], str(tmp_path), 1, {})
+    results = {}
+    run.bench_end_to_end(frames, 2, results)
+
+    assert {k.split("/")[1] for k in results} == {"cold", "cached"}
+    assert calls["profile"] >= 2  # uma vez por iteração fria
+    assert calls["encode"] >= 2
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    rows = run.compare({"a": {"median_s": 1.5}, "b": {"median_s": 0.5}, "c": {"median_s": 1.0}},
+                       {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}, "c": {"median_s": 1.05}}, 0.2)
+    assert {r["bench"]: r["status"] for r in rows} == {"a": "regressão", "b": "melhora", "c": "ok"}
@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.eda_agent import dataset_registry
+from src.eda_agent.dataset_registry import DatasetRegistry, compact_frame
+
+
+def test_compacted_int_arithmetic_matches_int64():
+    df = pd.DataFrame({"preco": [60000, 70000], "qtd": [50000, 40000]})
+    compacted, _ = compact_frame(df)
+    expected = df["preco"] * df["qtd"]
+    pd.testing.assert_series_equal(compacted["preco"] * compacted["qtd"], expected)
+    assert expected.tolist() == [3_000_000_000, 2_800_000_000]
+
+
+def test_numeric_columns_are_not_downcast():
+    df = pd.DataFrame({"a": np.arange(10, dtype="int64"), "f": np.linspace(0, 1, 10)})
+    compacted, changes = compact_frame(df)
+    assert changes == {}
+    assert compacted.dtypes.to_dict() == df.dtypes.to_dict()
+
+
+def test_text_becomes_arrow_strings_not_category():
+    df = pd.DataFrame({"cat": ["x", "y"] * 50, "id": [f"id{i}" for i in range(100)]})
+    compacted, changes = compact_frame(df)
+    assert str(compacted["cat"].dtype) == "string"
+    assert set(changes) == {"cat", "id"}
+    assert compacted["id"].tolist() == df["id"].tolist()
+    # comportamento de object preservado: fillna com valor novo e groupby sem grupos vazios
+    assert compacted["cat"].where(compacted["cat"] == "x").fillna("novo").tolist()[:2] == ["x", "novo"]
+    assert len(compacted[compacted["cat"] == "x"].groupby("cat").size()) == 1
+
+
+def test_budget_spills_outside_the_lock(monkeypatch):
+    registry = DatasetRegistry(budget_mb=0)
+    seen = []
+
+    def fake_save(dataset_id, df):
+        # get() de outra thread não pode ficar bloqueado durante a escrita
+        t = threading.Thread(target=lambda: seen.append(registry.get("b", load_spilled=False) is not None))
+        t.start()
+        t.join(timeout=5)
+        return f"/tmp/{dataset_id}.feather"
+
+    monkeypatch.setattr(dataset_registry, "has_dataset", lambda dataset_id: False)
+    monkeypatch.setattr(dataset_registry, "save_dataset", fake_save)
+    registry.admit("a", pd.DataFrame({"x": range(10)}), downcast=False)
+    registry.admit("b", pd.DataFrame({"x": range(10)}), downcast=False)
+    assert seen == [True]
+    assert registry.stats()["spilled"] == 1
+    assert registry.get("a", load_spilled=False) is None
+
+
+def test_budget_drops_entries_without_store(monkeypatch):
+    registry = DatasetRegistry(budget_mb=0)
+    monkeypatch.setattr(dataset_registry, "has_dataset", lambda dataset_id: False)
+    monkeypatch.setattr(dataset_registry, "save_dataset", lambda dataset_id, df: None)
+    for k in "abc":
+        registry.admit(k, pd.DataFrame({"x": range(10)}), downcast=False)
+    stats = registry.stats()
+    assert [d["dataset_id"] for d in stats["datasets"]] == ["c"]
+    assert stats["dropped"] == 2
@@ -0,0 +1,45 @@
+import io
+import os
+
+import pandas as pd
+
+from src.eda_agent import dataset_store, ingest
+from src.eda_agent.dataset_registry import get_registry
+from src.eda_agent.dataset_store import evict, has_dataset, load_dataset, save_dataset
+
+
+def test_roundtrip_keeps_values_and_types(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, "CACHE_DIR", str(tmp_path))
+    df = pd.DataFrame({
+        "i": [1, 2, 3],
+        "f": [0.5, None, 2.5],
+        "s": pd.Series(["a", None, "c"], dtype="string[pyarrow]"),
+        "d": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-03-01"]),
+    })
+    assert save_dataset("rt", df) == dataset_store.store_path("rt")
+    out = load_dataset("rt")
+    pd.testing.assert_frame_equal(out, df)
+    assert load_dataset("nao-existe") is None
+
+
+def test_evict_removes_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_store, "CACHE_DIR", str(tmp_path))
+    df = pd.DataFrame({"v": range(10_000)})
+    for i, name in enumerate(["velho", "medio", "novo"]):
+        save_dataset(name, df)
+        os.utime(dataset_store.store_path(name), (1_000 + i, 1_000 + i))
+    size = os.path.getsize(dataset_store.store_path("novo"))
+    assert evict(keep="velho", max_bytes=size) == ["medio", "novo"]
+    assert has_dataset("velho")
+
+
+def test_reupload_is_served_from_store_without_parsing(monkeypatch):
+    data = ("x,y\n" + "\n".join(f"{i},{i % 7}" for i in range(500)) + "\n").encode("utf-8")
+    dataset_id, df, info = ingest.ingest_upload(io.BytesIO(data))
+    assert info["source"] == "csv" and has_dataset(dataset_id)
+    get_registry().evict(dataset_id)  # outro processo / registro reiniciado
+
+    monkeypatch.setattr(ingest, "read_csv_bytes", lambda b: (_ for _ in ()).throw(AssertionError("re-parse")))
+    _, again, info = ingest.ingest_upload(io.BytesIO(data))
+    assert info["source"] == "store"
+    pd.testing.assert_frame_equal(again, df)
@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from src.eda_agent import executor
+from src.eda_agent.executor import compile_checked, execution_cache_stats, result_key, run_generated_code
+
+DF = pd.DataFrame({"a": [1, 2, 3]})
+
+
+def _run(code, dataset_id="test-memo"):
+    return run_generated_code(code, {"df": DF, "pd": pd}, dataset_id=dataset_id)
+
+
+def test_deterministic_snippet_is_memoized(monkeypatch):
+    code = "print('rodou')\nRESULT_TEXT = str(df['a'].sum())"
+    first = _run(code)
+    hits = execution_cache_stats()["memo_hits"]
+    monkeypatch.setattr(executor, "exec", lambda *a: pytest.fail("reexecutou"), raising=False)
+    again = _run(code)
+    assert again == first and again["text"] == "6"
+    assert execution_cache_stats()["memo_hits"] == hits + 1
+
+
+@pytest.mark.parametrize("code", [
+    "RESULT_TEXT = str(np.random.rand())",
+    "RESULT_TEXT = str(np.random.default_rng().integers(1000))",
+    "RESULT_TEXT = str(df.sample(1)['a'].iloc[0])",
+])
+def test_nondeterministic_snippet_is_not_memoized(code):
+    assert result_key(code, "test-memo", DF) is None
+    calls = []
+    env = {"df": DF, "pd": pd, "np": __import__("numpy"), "mark": calls.append}
+    for _ in range(2):
+        run_generated_code(code + "\nmark(1)", env, dataset_id="test-memo-random")
+    assert len(calls) == 2
+
+
+def test_seeded_sample_is_deterministic():
+    assert result_key("RESULT_TEXT = str(df.sample(2, random_state=0))", "test-memo", DF) is not None
+
+
+def test_memo_key_changes_with_frame_and_dataset():
+    code = "RESULT_TEXT = str(len(df))"
+    key = result_key(code, "ds-1", DF)
+    assert key != result_key(code, "ds-2", DF)
+    assert key != result_key(code, "ds-1", pd.DataFrame({"a": [1.0, 2.0, 3.0]}))
+    assert result_key(code, None, DF) is None
+
+
+def test_compile_cache_hits_and_still_validates():
+    code = "RESULT_TEXT = 'x' * 3"
+    compile_checked(code)
+    hits = execution_cache_stats()["compile_hits"]
+    compile_checked(code)
+    assert execution_cache_stats()["compile_hits"] == hits + 1
+    with pytest.raises(ValueError):
+        compile_checked("import os")
+    with pytest.raises(ValueError):
+        compile_checked("import os")  # código rejeitado não entra no cache
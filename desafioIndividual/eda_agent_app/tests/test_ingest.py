@@ -0,0 +1,58 @@
+import io
+import pandas as pd
+
+from src.eda_agent import ingest
+from src.eda_agent.state import dataset_id_from_bytes
+
+
+def _write(tmp_path, n_good=5000):
+    # os tipos do 1º bloco (int/float) deixam de servir em blocos posteriores
+    rows = [f"{i},{i * 0.5},{i % 3},cat{i % 4}" for i in range(n_good)]
+    rows += ["x1,abc,2,cat1", "7,8.5,texto,cat2"]
+    path = tmp_path / "mixed.csv"
+    path.write_text("a,b,c,d\n" + "\n".join(rows) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_streaming_mixed_types_reads_at_most_twice(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "BLOCK_MB", 0.01)
+    import pyarrow.csv as pacsv
+    calls = []
+    original = pacsv.open_csv
+    monkeypatch.setattr(pacsv, "open_csv", lambda *a, **k: calls.append(1) or original(*a, **k))
+    df, stats = ingest.read_csv_streaming(_write(tmp_path))
+    assert len(calls) == 2
+    assert len(df) == 5002
+    assert stats["retyped_columns"] == ["a", "b", "c"]
+    assert df["a"].iloc[-2] == "x1" and df["c"].iloc[-1] == "texto"
+    assert df["d"].iloc[0] == "cat0"
+
+
+def test_streaming_stable_types_single_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "BLOCK_MB", 0.01)
+    path = tmp_path / "ok.csv"
+    path.write_text("a,b\n" + "\n".join(f"{i},{i / 2}" for i in range(5000)) + "\n", encoding="utf-8")
+    df, stats = ingest.read_csv_streaming(str(path))
+    assert "retyped_columns" not in stats
+    assert pd.api.types.is_integer_dtype(df["a"]) and pd.api.types.is_float_dtype(df["b"])
+
+
+class _CountingUpload(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.size = len(data)
+        self.bytes_read = 0
+
+    def read(self, n=-1):
+        out = super().read(n)
+        self.bytes_read += len(out)
+        return out
+
+
+def test_small_upload_is_read_once():
+    data = ("a,b\n" + "\n".join(f"{i},{i * 2}" for i in range(1000)) + "\n").encode("utf-8")
+    upload = _CountingUpload(data)
+    dataset_id, df, info = ingest.ingest_upload(upload)
+    assert info["source"] == "csv" and len(df) == 1000
+    assert upload.bytes_read == len(data)
+    assert dataset_id == dataset_id_from_bytes(data)
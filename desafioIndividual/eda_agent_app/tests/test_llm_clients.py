@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from src.eda_agent.agents import base
+from src.eda_agent.agents.base import build_llm, get_async_loop
+
+
+def test_clients_are_reused_per_model_and_temperature(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    a = build_llm("gpt-4o-mini", 0.0)
+    assert build_llm("gpt-4o-mini", 0) is a
+    b = build_llm("gpt-4o-mini", 0.7)
+    c = build_llm("gpt-4o", 0.0)
+    assert b is not a and c is not a
+    # conexões HTTP compartilhadas entre modelos/temperaturas
+    assert a.http_client is b.http_client is c.http_client
+    assert a.http_async_client is c.http_async_client
+
+
+def test_missing_api_key_raises(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="OPENAI_API_KEY"):
+        build_llm("modelo-sem-cliente", 0.3)
+
+
+def test_single_background_loop_per_process():
+    loop = get_async_loop()
+    assert get_async_loop() is loop and loop.is_running()
+
+
+def test_pipeline_prepares_off_the_shared_loop(monkeypatch):
+    import pandas as pd
+    from src.eda_agent import pipeline
+    from src.eda_agent.state import DatasetMemory
+
+    threads = []
+
+    def fake_prepare(*args):
+        threads.append(threading.current_thread().name)
+        return {}, {"text": "ok", "source": "profile"}, None, None
+
+    monkeypatch.setattr(pipeline, "_prepare", fake_prepare)
+    out = pipeline.PipelineRun().run("tipos?", pd.DataFrame({"a": [1]}), DatasetMemory.load("loop-test"))
+    assert out["text"] == "ok"
+    assert threads and threads[0] != "eda-agent-aio"
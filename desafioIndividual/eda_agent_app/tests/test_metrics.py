@@ -0,0 +1,22 @@
+from src.eda_agent import metrics
+
+
+def test_metrics_file_rotates_and_tail_read_spans_both(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(metrics, "metrics_path", lambda: str(path))
+    monkeypatch.setattr(metrics, "METRICS_MAX_MB", 0.01)  # ~10 KB
+    for i in range(400):
+        metrics._write({"stage": "s", "i": i, "pad": "x" * 40})
+
+    assert path.stat().st_size <= 11 * 1024
+    assert (tmp_path / "metrics.jsonl.1").exists()
+    spans = metrics.load_spans(limit=150)
+    assert [s["i"] for s in spans] == list(range(250, 400))
+
+
+def test_tail_read_returns_last_lines_of_large_file(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(metrics, "metrics_path", lambda: str(path))
+    path.write_text("".join(f'{{"stage": "s", "i": {i}}}\n' for i in range(20000)))
+    spans = metrics.load_spans(limit=3)
+    assert [s["i"] for s in spans] == [19997, 19998, 19999]
@@ -0,0 +1,41 @@
+import time
+import uuid
+
+import pandas as pd
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.eda_agent import pipeline, render
+from src.eda_agent.agents import codegen_agent
+from src.eda_agent.pipeline import PipelineRun
+from src.eda_agent.state import DatasetMemory
+
+CODE = "```python\nplt.plot(df['a'])\nRESULT_TEXT = 'soma=' + str(int(df['a'].sum()))\n```"
+
+
+def test_critic_starts_before_figures_are_encoded(monkeypatch):
+    events = []
+    monkeypatch.setattr(codegen_agent, "build_llm", lambda *a, **k: FakeListChatModel(responses=[CODE]))
+    encode = render.encode_figure
+
+    def slow_encode(fig, *a, **k):
+        time.sleep(0.3)
+        events.append(("encoded", time.perf_counter()))
+        return encode(fig, *a, **k)
+
+    async def fake_critic(*, result_text, on_token=None, **kwargs):
+        events.append(("critic", time.perf_counter()))
+        if on_token is not None:
+            on_token("- crítica de " + result_text)
+        return "- crítica de " + result_text
+
+    monkeypatch.setattr(render, "encode_figure", slow_encode)
+    monkeypatch.setattr(pipeline, "astream_critic", fake_critic)
+    shown = []
+    out = PipelineRun().run("some a coluna a", pd.DataFrame({"a": range(10)}),
+                            DatasetMemory.load(f"test-{uuid.uuid4().hex[:8]}"), use_cache=False,
+                            on_result=lambda r: shown.append("result"),
+                            on_critic_token=lambda t: shown.append("critic"))
+    assert out["text"] == "soma=45" and out["critic"] == "- crítica de soma=45"
+    order = [name for name, _ in sorted(events, key=lambda e: e[1])]
+    assert order == ["critic", "encoded"]
+    assert shown == ["result", "critic"]  # tokens do crítico só depois do resultado
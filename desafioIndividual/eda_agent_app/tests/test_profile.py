@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from src.eda_agent.profile import answer_from_profile, compute_profile
+
+
+@pytest.fixture(scope="module")
+def profile():
+    df = pd.DataFrame({
+        "idade": [20, 30, 40, 50],
+        "sexo": ["masculino", "feminino", "masculino", "feminino"],
+        "renda": [1000.0, None, 3000.0, 4000.0],
+    })
+    return compute_profile(df)
+
+
+@pytest.mark.parametrize("question", [
+    "Qual a média de idade?",
+    "média da coluna idade",
+    "Qual o desvio padrão de renda?",
+    "Quantos valores nulos existem?",
+    "Quais são os tipos de dados?",
+    "Quantas linhas?",
+])
+def test_simple_questions_are_answered(profile, question):
+    out = answer_from_profile(question, profile)
+    assert out is not None and out["source"] == "profile"
+
+
+@pytest.mark.parametrize("question", [
+    "qual a média de idade dos homens?",
+    "qual a média de idade das mulheres?",
+    "média de idade para clientes ativos",
+    "média de idade com renda alta",
+    "média de idade do sexo masculino",
+    "média de idade em 2020",
+    "quantos nulos em renda nas mulheres?",
+    "quantas linhas têm sexo feminino?",
+])
+def test_filtered_questions_go_to_codegen(profile, question):
+    assert answer_from_profile(question, profile) is None
+
+
+def test_mean_uses_whole_column(profile):
+    out = answer_from_profile("Qual a média de idade?", profile)
+    assert "média = 35" in out["text"]
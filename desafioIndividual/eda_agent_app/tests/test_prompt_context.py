@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from src.eda_agent.agents.codegen_agent import build_schema_hint
+from src.eda_agent.profile import compute_profile
+from src.eda_agent.prompt_context import (
+    WIDE_COLUMNS, ColumnIndex, build_prompt_context, count_tokens,
+)
+
+
+def _wide_frame(n_cols=200):
+    rng = np.random.default_rng(0)
+    data = {f"sensor_{i}": rng.normal(size=50) for i in range(n_cols)}
+    data.update({"cpuTemp_12": rng.normal(size=50), "fanSpeed": rng.normal(size=50),
+                 "regiao": ["Norte", "Sul"] * 25})
+    return pd.DataFrame(data)
+
+
+def test_rank_matches_split_fuzzy_and_value_tokens():
+    profile = compute_profile(_wide_frame(20))
+    idx = ColumnIndex(profile)
+    assert idx.rank("qual a média do cpu temp 12?")[0] == "cpuTemp_12"
+    assert idx.rank("velocidade do fanspeed")[0] == "fanSpeed"
+    assert idx.rank("compare o Norte com o Sul")[0] == "regiao"
+
+
+def test_wide_dataset_prompt_keeps_relevant_columns_within_budget():
+    df = _wide_frame()
+    assert df.shape[1] > WIDE_COLUMNS
+    hint, profile = build_schema_hint(df), compute_profile(df)
+    ctx = build_prompt_context("distribuição de fanSpeed por regiao", hint, "wide-ds", profile, [], budget=1500)
+    assert {"fanSpeed", "regiao"} <= set(ctx["columns"])
+    assert len(ctx["columns"]) < df.shape[1]
+    assert ctx["schema"]["omitted_columns"] == df.shape[1] - len(ctx["columns"])
+    assert count_tokens(str(ctx["schema"])) + count_tokens(ctx["profile"]) <= 1500
+
+
+def test_history_keeps_the_most_recent_turns_that_fit():
+    df = _wide_frame(3)
+    hint, profile = build_schema_hint(df), compute_profile(df)
+    turns = [{"question": f"pergunta {i}", "result_text": "x" * 400} for i in range(30)]
+    ctx = build_prompt_context("média", hint, "narrow-ds", profile, turns, budget=600)
+    assert "pergunta 29" in ctx["history"] and "pergunta 0\n" not in ctx["history"]
+    assert ctx["history"].index("pergunta 28") < ctx["history"].index("pergunta 29")
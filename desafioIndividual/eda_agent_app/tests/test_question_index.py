@@ -0,0 +1,49 @@
+import uuid
+
+from src.eda_agent.question_index import QuestionIndex, canonical
+from src.eda_agent.state import DatasetMemory
+
+COLUMNS = ["Amount", "Time", "Class"]
+
+
+def _index():
+    idx = QuestionIndex()
+    idx.add(1, "Qual a média da coluna Amount?", "RESULT_TEXT = str(df['Amount'].mean())")
+    idx.add(2, "Mostre os 10 maiores valores de Amount", "RESULT_TEXT = str(df['Amount'].nlargest(10))")
+    return idx
+
+
+def test_canonical_folds_accents_and_synonyms():
+    assert canonical("Mostre a DISTRIBUIÇÃO de Amount") == canonical("histograma de amount")
+
+
+def test_reuses_rephrased_question():
+    hit = _index().search("qual é a media de amount", COLUMNS)
+    assert hit is not None and hit["turn_id"] == 1
+
+
+def test_rejects_different_numbers():
+    idx = _index()
+    assert idx.search("Mostre os 10 maiores valores de Amount", COLUMNS)["turn_id"] == 2
+    assert idx.search("Mostre os 20 maiores valores de Amount", COLUMNS) is None
+
+
+def test_rejects_different_columns_and_guard_words():
+    idx = _index()
+    assert idx.search("Qual a média da coluna Time?", COLUMNS) is None
+    assert idx.search("Mostre os 10 menores valores de Amount", COLUMNS) is None
+
+
+def test_profile_answers_without_code_are_not_indexed():
+    idx = QuestionIndex()
+    idx.add(1, "Qual a média de Amount?", "")
+    assert idx.search("Qual a média de Amount?", COLUMNS) is None
+
+
+def test_memory_index_follows_new_turns():
+    mem = DatasetMemory.load(f"test-{uuid.uuid4().hex[:8]}")
+    assert mem.find_similar_turn("média de Amount", COLUMNS) is None
+    mem.add_turn("Qual a média de Amount?", "88.3", "RESULT_TEXT = str(df['Amount'].mean())")
+    hit = mem.find_similar_turn("qual a media de amount", COLUMNS)
+    assert hit is not None and "mean()" in hit["code"]
+    assert mem.find_similar_turn("qual a media de time", COLUMNS) is None
@@ -0,0 +1,63 @@
+import os
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from src.eda_agent.render import aggregate_oversized, render_figures
+
+
+def test_long_numeric_line_is_decimated():
+    fig, ax = plt.subplots()
+    y = np.sin(np.linspace(0, 50, 20_000))
+    line, = ax.plot(np.arange(len(y)), y)
+    assert aggregate_oversized(fig, max_points=1000) == 1
+    kept = line.get_ydata()
+    assert len(kept) < len(y)
+    assert kept.max() == y.max() and kept.min() == y.min()
+    plt.close(fig)
+
+
+def test_non_numeric_line_is_left_alone():
+    fig, ax = plt.subplots()
+    labels = [f"c{i % 5}" for i in range(40)]
+    line, = ax.plot(np.arange(40), labels)
+    dots, = ax.plot(np.arange(40), labels, "o")
+    aggregate_oversized(fig, max_points=10)
+    assert len(line.get_ydata()) == 40
+    assert dots in ax.get_lines()
+    plt.close(fig)
+
+
+def test_render_figures_encodes_each_figure():
+    figs = []
+    for k in range(3):
+        fig, ax = plt.subplots()
+        ax.plot([0, 1, 2], [k, k + 1, k])
+        figs.append(fig)
+    images = render_figures(figs, fmt="png")
+    assert len(images) == 3
+    assert all(img[:8] == b"\x89PNG\r\n\x1a\n" for img in images)
+
+
+def test_random_snippet_skips_figure_cache():
+    from src.eda_agent import render
+    from src.eda_agent.executor import run_generated_code
+
+    code = "x = np.random.rand(5)\nplt.plot(x)\nRESULT_TEXT = str(x[0])"
+    env = {"np": np, "plt": plt, "pd": __import__("pandas")}
+    first = run_generated_code(code, dict(env), dataset_id="fig-rand")
+    second = run_generated_code(code, dict(env), dataset_id="fig-rand")
+    assert first["text"] != second["text"]
+    assert first["images"] != second["images"]
+    cached = os.listdir(render.FIGURE_CACHE_DIR) if os.path.isdir(render.FIGURE_CACHE_DIR) else []
+    assert not any(name.startswith("fig-rand-") for name in cached)
+
+
+def test_deterministic_snippet_reuses_figure_cache():
+    from src.eda_agent import render
+    from src.eda_agent.executor import run_generated_code
+
+    code = "plt.plot([1, 2, 3])\nRESULT_TEXT = 'ok'"
+    run_generated_code(code, {"plt": plt}, dataset_id="fig-det", memo=False)
+    assert any(name.startswith("fig-det-") for name in os.listdir(render.FIGURE_CACHE_DIR))
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from src.eda_agent import sampling
+from src.eda_agent.agents.codegen_agent import execute_progressive
+from src.eda_agent.sampling import get_sample, sample_id, wants_preview
+
+
+def test_preview_only_for_frames_much_larger_than_the_sample():
+    assert not wants_preview(pd.DataFrame({"a": range(150)}), n=100)
+    assert wants_preview(pd.DataFrame({"a": range(201)}), n=100)
+
+
+def test_sample_is_uniform_ordered_and_reused():
+    df = pd.DataFrame({"a": range(10_000)})
+    sid, sample = get_sample("samp-ds", df, n=500)
+    assert sid == sample_id("samp-ds", 500) and len(sample) == 500
+    assert sample.index.is_monotonic_increasing
+    assert sample["a"].max() > 9_000  # não é só o começo do frame
+    again = get_sample("samp-ds", df, n=500)[1]
+    assert again is sample
+
+
+def test_progressive_shows_preview_then_full_result():
+    df = pd.DataFrame({"a": range(4 * sampling.PREVIEW_ROWS)})
+    previews = []
+    full = execute_progressive("RESULT_TEXT = str(len(df))", df, "prog-ds", previews.append)
+    assert full["text"] == str(len(df))
+    assert len(previews) == 1 and previews[0]["approx"] is True
+    assert previews[0]["total_rows"] == len(df)
+    assert previews[0]["sample_rows"] == sampling.PREVIEW_ROWS
+    assert previews[0]["text"] == str(sampling.PREVIEW_ROWS)
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from src.eda_agent import dataset_store, shared_frames
+from src.eda_agent.shared_frames import DatasetLease, frame_ref, resolve_frame
+
+
+def _df():
+    return pd.DataFrame({"a": range(100), "b": [i * 0.5 for i in range(100)]})
+
+
+def test_lease_release_removes_the_shared_file():
+    lease = DatasetLease("frames-sample-s50", _df())
+    assert frame_ref("frames-sample-s50", None)[0] == "shared"
+    lease.release()
+    assert not os.path.exists(lease.path)
+    assert frame_ref("frames-sample-s50", _df())[0] == "inline"
+
+
+def test_unleased_dataset_is_not_written_to_disk():
+    kind, _, value = frame_ref("frames-no-lease", _df())
+    assert kind == "inline" and isinstance(value, pd.DataFrame)
+    assert not os.path.exists(shared_frames.frame_path("frames-no-lease"))
+
+
+def test_sweep_removes_frames_of_dead_processes():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    dead = os.path.join(shared_frames.FRAMES_DIR, str(proc.pid))
+    os.makedirs(dead, exist_ok=True)
+    open(os.path.join(dead, "x.arrow"), "wb").close()
+    lease = DatasetLease("frames-alive", _df())
+    shared_frames.sweep_orphans()
+    assert not os.path.exists(dead)
+    assert os.path.exists(lease.path)
+    lease.release()
+
+
+def test_store_eviction_does_not_break_a_leased_frame():
+    df = _df()
+    assert dataset_store.save_dataset("frames-stored", df) is not None
+    lease = DatasetLease("frames-stored", df)
+    assert lease.path != dataset_store.store_path("frames-stored")
+    os.remove(dataset_store.store_path("frames-stored"))  # como faria a evicção LRU do store
+    out = resolve_frame(frame_ref("frames-stored", None))
+    pd.testing.assert_frame_equal(out, df)
+    lease.release()
@@ -0,0 +1,71 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from src.eda_agent import speculative
+from src.eda_agent.agents.codegen_agent import execute_code
+from src.eda_agent.speculative import SpeculativeCodegen, candidate_temperatures
+
+DF = pd.DataFrame({"a": range(10)})
+CTX = {"schema": {}, "profile": "", "history": ""}
+MISSING_COLUMN = "RESULT_TEXT = str(df['nao_existe'].sum())"
+OK = "RESULT_TEXT = 'soma=' + str(int(df['a'].sum()))"
+
+
+def _fake_llm(monkeypatch, by_temperature, repair_code=None):
+    repairs = []
+
+    async def fake_generate(question, schema, profile, history, *, llm_model, temperature, on_token=None):
+        await asyncio.sleep(0.05 if temperature == 0.0 else 0.01)
+        return by_temperature[temperature]
+
+    async def fake_repair(question, schema, profile, history, code, stage, error, *, llm_model,
+                          temperature, on_token=None):
+        repairs.append((code, stage, error))
+        return repair_code
+
+    monkeypatch.setattr(speculative, "agenerate_code", fake_generate)
+    monkeypatch.setattr(speculative, "arepair_code", fake_repair)
+    return repairs
+
+
+def _codegen(**kwargs):
+    return SpeculativeCodegen("some a", CTX, DF, lambda code: asyncio.to_thread(execute_code, code, DF),
+                              serial_exec=True, **kwargs)
+
+
+def test_first_successful_candidate_wins(monkeypatch):
+    temps = candidate_temperatures(0.0, 3)
+    _fake_llm(monkeypatch, {temps[0]: MISSING_COLUMN, temps[1]: "import os", temps[2]: OK})
+    gen = _codegen(candidates=3)
+    won = asyncio.run(gen.run())
+    assert won["exec_result"]["text"] == "soma=45" and won["candidate"] == 2 and not won["repaired"]
+    marker = gen.marker(won)
+    assert marker["winner"] == 2
+    # o candidato 0 (mais lento) é cancelado quando o 2 vence: só a falha de validação aparece
+    assert [(f["candidate"], f["stage"]) for f in marker["failures"]] == [(1, "validação")]
+
+
+def test_repair_starts_from_furthest_failure(monkeypatch):
+    temps = candidate_temperatures(0.0, 2)
+    repairs = _fake_llm(monkeypatch, {temps[0]: "import os", temps[1]: MISSING_COLUMN}, repair_code=OK)
+    won = asyncio.run(_codegen(candidates=2).run())
+    assert won["repaired"] and won["exec_result"]["text"] == "soma=45"
+    code, stage, error = repairs[0]
+    assert code == MISSING_COLUMN and stage == "execução" and error.startswith("KeyError")
+
+
+def test_failed_repair_reraises_original_error(monkeypatch):
+    _fake_llm(monkeypatch, {0.0: MISSING_COLUMN}, repair_code="RESULT_TEXT = 1/0")
+    gen = _codegen(candidates=1)
+    with pytest.raises(KeyError, match="nao_existe"):
+        asyncio.run(gen.run())
+    assert [a["error"].split(":")[0] for a in gen.attempts] == ["KeyError", "ZeroDivisionError"]
+
+
+def test_without_repair_the_original_error_surfaces(monkeypatch):
+    repairs = _fake_llm(monkeypatch, {0.0: MISSING_COLUMN}, repair_code=OK)
+    with pytest.raises(KeyError):
+        asyncio.run(_codegen(candidates=1, repair=False).run())
+    assert repairs == []
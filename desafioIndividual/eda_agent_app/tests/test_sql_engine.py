@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from src.eda_agent import sql_engine
+from src.eda_agent.sql_engine import run_sql
+
+DF = pd.DataFrame({"g": ["a", "b", "a", "c"], "v": [1, 2, 3, 4]})
+
+
+def test_select_and_cte_are_allowed():
+    out = run_sql(None, DF, "WITH t AS (SELECT g, sum(v) AS s FROM df GROUP BY g) SELECT * FROM t ORDER BY g")
+    assert out.to_dict("list") == {"g": ["a", "b", "c"], "s": [4, 2, 4]}
+
+
+@pytest.mark.parametrize("query", [
+    "COPY (SELECT * FROM df) TO '/tmp/eda_agent_sql_test.csv'",
+    "COPY df TO '/tmp/eda_agent_sql_test.parquet' (FORMAT parquet)",
+    "ATTACH '/tmp/eda_agent_sql_test.db' AS other",
+    "INSTALL httpfs",
+    "LOAD httpfs",
+    "SET enable_external_access = true",
+    "SET threads = 1",
+    "PRAGMA threads = 1",
+    "CREATE TABLE t AS SELECT * FROM df",
+    "DROP VIEW df",
+    "INSERT INTO df VALUES ('z', 9)",
+    "SELECT 1; SELECT 2",
+    "SELECT * FROM df; DROP VIEW df",
+])
+def test_non_select_and_multi_statement_are_rejected(query):
+    with pytest.raises(ValueError, match="apenas uma consulta SELECT"):
+        run_sql(None, DF, query)
+
+
+def test_select_cannot_read_external_files(tmp_path):
+    path = tmp_path / "segredo.csv"
+    path.write_text("x\n1\n")
+    with pytest.raises(Exception) as err:
+        run_sql(None, DF, f"SELECT * FROM read_csv_auto('{path}')")
+    assert "permission" in str(err.value).lower() or "disabled" in str(err.value).lower()
+
+
+def test_row_cap(monkeypatch):
+    monkeypatch.setattr(sql_engine, "SQL_MAX_ROWS", 100)
+    big = pd.DataFrame({"v": range(5000)})
+    with pytest.raises(ValueError, match="excede"):
+        run_sql(None, big, "SELECT * FROM df")
+    assert len(run_sql(None, big, "SELECT v FROM df LIMIT 100")) == 100
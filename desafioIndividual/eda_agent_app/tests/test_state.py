@@ -0,0 +1,49 @@
+import uuid
+
+from src.eda_agent.state import ROLLING_SUMMARY_KEY, DatasetMemory
+
+
+def _new_id():
+    return f"test-{uuid.uuid4().hex[:8]}"
+
+
+def test_chat_history_assignment_writes_through_add_turn():
+    mem = DatasetMemory.load(_new_id())
+    mem.add_turn("antiga", "x", "print(1)")
+    mem.chat_history = [
+        {"ts": 1_600_000_000, "question": "média de a?", "result_text": "1.5", "code_preview": "df['a'].mean()"},
+        {"ts": 1_600_000_060, "question": "linhas?", "result_text": "10", "code": "len(df)"},
+    ]
+    again = DatasetMemory.load(mem.dataset_id)
+    assert [t["question"] for t in again.chat_history] == ["média de a?", "linhas?"]
+    assert [t["ts"] for t in again.chat_history] == [1_600_000_000, 1_600_000_060]
+    assert again.chat_history[1]["code_preview"] == "len(df)"
+    assert again.find_similar_turn("antiga", ["a"]) is None
+
+
+def test_constructor_still_accepts_chat_history():
+    dataset_id = _new_id()
+    mem = DatasetMemory(dataset_id, conclusions=["c1"],
+                        chat_history=[{"ts": 1_700_000_000, "question": "q", "result_text": "r"}])
+    assert mem.conclusions == ["c1"]
+    assert DatasetMemory.load(dataset_id).chat_history == [
+        {"ts": 1_700_000_000, "question": "q", "result_text": "r", "code_preview": ""}]
+
+
+def test_save_keeps_rows_written_by_another_session():
+    dataset_id = _new_id()
+    a = DatasetMemory.load(dataset_id)
+    a.add_conclusion("primeira conclusão sobre a coluna a")
+    a.add_conclusion("segunda conclusão sobre a coluna b")
+    b = DatasetMemory.load(dataset_id)
+    b.add_conclusion("terceira conclusão vinda da outra sessão")
+    b.set_summary(ROLLING_SUMMARY_KEY, {"text": "resumo da sessão b"})
+
+    a.conclusions.remove("primeira conclusão sobre a coluna a")
+    a.summaries["nota"] = "x"
+    a.save()
+
+    again = DatasetMemory.load(dataset_id)
+    assert again.conclusions == ["segunda conclusão sobre a coluna b", "terceira conclusão vinda da outra sessão"]
+    assert again.summaries[ROLLING_SUMMARY_KEY] == {"text": "resumo da sessão b"}
+    assert again.summaries["nota"] == "x"
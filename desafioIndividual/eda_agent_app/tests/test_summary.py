@@ -0,0 +1,57 @@
+import uuid
+
+from langchain_core.messages import AIMessage
+
+from src.eda_agent.agents import summary_agent
+from src.eda_agent.state import DatasetMemory
+
+
+class _FakeLLM:
+    def __init__(self, prompts):
+        self.prompts = prompts
+
+    def invoke(self, msgs):
+        self.prompts.append(msgs[-1].content)
+        return AIMessage(content=f"resumo {len(self.prompts)}")
+
+
+def _memory_with(n):
+    mem = DatasetMemory.load(f"test-{uuid.uuid4().hex[:8]}")
+    texts = [f"achado {i} sobre a variável v{i} com valor {i * 7}" for i in range(n)]
+    for t in texts:
+        assert mem.add_conclusion(t)
+    return mem, texts
+
+
+def test_first_summary_is_seeded_in_one_call(monkeypatch):
+    prompts = []
+    monkeypatch.setattr(summary_agent, "build_llm", lambda model=None, temperature=0.0: _FakeLLM(prompts))
+    mem, texts = _memory_with(300)
+
+    assert summary_agent.summarize_memory(mem, max_conclusions=30) == "resumo 1"
+    assert len(prompts) == 1
+    assert texts[270] in prompts[0] and texts[299] in prompts[0] and texts[269] not in prompts[0]
+
+    # nada novo: devolve o resumo salvo sem chamar a LLM
+    assert summary_agent.summarize_memory(mem, max_conclusions=30) == "resumo 1"
+    assert len(prompts) == 1
+
+
+def test_summary_folds_new_rows_in_order_with_a_batch_cap(monkeypatch):
+    prompts = []
+    monkeypatch.setattr(summary_agent, "build_llm", lambda model=None, temperature=0.0: _FakeLLM(prompts))
+    mem, _ = _memory_with(1)
+    summary_agent.summarize_memory(mem, max_conclusions=30)
+    texts = [f"novidade {i} na coluna c{i} igual a {i * 3}" for i in range(70)]
+    for t in texts:
+        assert mem.add_conclusion(t)
+
+    summary_agent.summarize_memory(mem, max_conclusions=30, max_batches=2)
+    assert len(prompts) == 3  # semente + 30 + 30; as 10 restantes ficam para a próxima
+    assert texts[59] in prompts[-1] and texts[60] not in "\n".join(prompts)
+
+    summary_agent.summarize_memory(mem, max_conclusions=30, max_batches=2)
+    assert len(prompts) == 4 and texts[60] in prompts[-1] and texts[69] in prompts[-1]
+    folded = "\n".join(prompts)
+    assert all(t in folded for t in texts)
+    assert folded.index(texts[0]) < folded.index(texts[69])
@@ -0,0 +1,52 @@
+import ast
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.eda_agent.vectorize import rewrite
+
+
+def _rewrite(code):
+    return rewrite(code, ast.parse(code))
+
+
+def _run(code, df):
+    env = {"df": df, "pd": pd, "np": np}
+    exec(code, env)
+    return env["out"]
+
+
+@pytest.mark.parametrize("lam", [
+    "lambda x: not x",
+    "lambda x: x or 0",
+    "lambda x: x and 1",
+    "lambda x: (x > 1) and x",
+    "lambda x: not (x + 1)",
+])
+def test_non_boolean_operands_are_not_rewritten(lam):
+    code = f"out = df['a'].apply({lam})"
+    new, done = _rewrite(code)
+    assert new == code and done == []
+
+
+@pytest.mark.parametrize("lam", [
+    "lambda x: x > 0 and x < 2",
+    "lambda x: not (x > 1)",
+    "lambda x: x == 0 or x == 2",
+    "lambda x: not (x > 0 and x < 2)",
+])
+def test_boolean_expressions_keep_semantics(lam):
+    df = pd.DataFrame({"a": [0, 1, 2, 3]})
+    code = f"out = df['a'].apply({lam})"
+    new, done = _rewrite(code)
+    assert done and "apply" not in new
+    assert _run(new, df).tolist() == _run(code, df).tolist()
+
+
+def test_arithmetic_lambda_is_rewritten():
+    df = pd.DataFrame({"a": [1.5, 2.0, -3.0]})
+    code = "out = df['a'].map(lambda x: abs(x) * 2 + 1)"
+    new, done = _rewrite(code)
+    assert [d["pattern"] for d in done] == ["series_apply"]
+    assert _run(new, df).tolist() == _run(code, df).tolist()
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from src.eda_agent.worker_pool import WorkerPool
+
+DF = pd.DataFrame({"a": [1, 2, 3]})
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(size=1, timeout_s=3, memory_mb=256)
+    yield pool
+    pool.close()
+
+
+def test_runs_snippet_in_worker(pool):
+    out = pool.run("RESULT_TEXT = str(int(df['a'].sum()))\nprint('oi')", DF)
+    assert out["text"] == "6" and out["stdout"] == "oi\n"
+    assert out["usage"]["pid"] > 0
+
+
+def test_timeout_kills_and_replaces_worker(pool):
+    pid = pool.run("RESULT_TEXT = 'antes'", DF)["usage"]["pid"]
+    with pytest.raises(TimeoutError):
+        pool.run("while True:\n    pass", DF, timeout_s=1)
+    assert pool.replaced >= 1
+    out = pool.run("RESULT_TEXT = 'depois'", DF)
+    assert out["text"] == "depois" and out["usage"]["pid"] != pid
+
+
+def test_memory_cap_raises_memory_error_and_pool_recovers(pool):
+    with pytest.raises(MemoryError):
+        pool.run("x = np.ones(10**9)\nRESULT_TEXT = str(x.sum())", DF)
+    assert pool.run("RESULT_TEXT = 'ok'", DF)["text"] == "ok"
+
+
+def test_worker_that_never_gets_ready_is_replaced(pool, monkeypatch):
+    from src.eda_agent import worker_pool
+    stuck = pool._idle.queue[0]
+    original = worker_pool._Worker.wait_ready
+
+    def wait_ready(self, timeout):
+        if self is stuck:
+            raise TimeoutError("Worker de execução não inicializou a tempo.")
+        return original(self, timeout)
+
+    monkeypatch.setattr(worker_pool._Worker, "wait_ready", wait_ready)
+    with pytest.raises(TimeoutError):
+        pool.run("RESULT_TEXT = 'x'", DF)
+    assert pool._idle.queue[0] is not stuck
+    assert pool.run("RESULT_TEXT = 'ok'", DF)["text"] == "ok"